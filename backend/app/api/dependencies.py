@@ -1,5 +1,21 @@
+import hmac
+import os
+from typing import Optional
+from fastapi import Header, HTTPException
 from app.services.supabase_service import get_supabase_client
 
 def get_db():
     """Dependency for getting Supabase client"""
     return get_supabase_client()
+
+
+def require_debug_token(x_debug_token: Optional[str] = Header(default=None)):
+    """
+    Guard for /api/debug: disabled (404) unless DEBUG_API_TOKEN is set, and then
+    only served to requests sending it in the X-Debug-Token header
+    """
+    token = os.getenv("DEBUG_API_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_debug_token or not hmac.compare_digest(x_debug_token.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid debug token")
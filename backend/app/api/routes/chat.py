@@ -1,15 +1,21 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Optional
 from app.models.chat import ChatMessage, ChatResponse
-from app.models.journal import AIJournalCreate
 from app.services.gemini_service import get_gemini_service
 from app.services.memory_service import get_memory_service
-from app.services.journal_service import get_journal_service
-from app.services.supabase_service import get_supabase_client
+from app.services.post_turn import enqueue_post_turn
+from app.repositories.conversation_repository import TURN_KEY, ConversationRepository
+from app.services.supabase_service import ensure_user_exists_async
+from app.utils.metrics import StageTimeout, StageTimings, get_stage_stats
+from app.utils.pagination import InvalidCursor, decode_cursor, encode_cursor, paged_response
 from app.utils.prompt_builder import TYMON_SYSTEM_PROMPT
+from app.utils.sse import format_sse, iterate_in_thread
 from datetime import datetime
+import asyncio
 import logging
 import os
+import time
 import traceback
 import uuid
 
@@ -19,110 +25,164 @@ def _is_production() -> bool:
     return os.getenv("VERCEL_ENV") == "production" or os.getenv("ENVIRONMENT") == "production"
 
 router = APIRouter()
+conversations = ConversationRepository()
+
+
+# Per-stage deadlines (seconds) for the pre-generation fan-out
+USER_STAGE_TIMEOUT_S = float(os.getenv("CHAT_USER_STAGE_TIMEOUT_S", "3.0"))
+MEMORY_STAGE_TIMEOUT_S = float(os.getenv("CHAT_MEMORY_STAGE_TIMEOUT_S", "1.5"))
+HISTORY_STAGE_TIMEOUT_S = float(os.getenv("CHAT_HISTORY_STAGE_TIMEOUT_S", "3.0"))
+
+
+def _new_timings() -> StageTimings:
+    return StageTimings(get_stage_stats("chat"))
+
+
+async def _ensure_user(user_id: str) -> None:
+    if not await ensure_user_exists_async(user_id):
+        raise HTTPException(status_code=500, detail="Failed to ensure user exists")
+
+
+async def _prepare_turn(user_id: str, user_message: str, conversation_id: str, timings: StageTimings):
+    """
+    Load what the model needs for a turn: relevant memories and this conversation's history.
+    
+    The user check, memory retrieval and history query are independent round trips,
+    so they run concurrently, each under its own deadline. Memories are optional:
+    if retrieval is slow or fails the turn continues without them (recorded in
+    ``timings.skipped``). The user and history stages are required.
+    """
+    memory_service = get_memory_service()
+    
+    stages = [
+        asyncio.ensure_future(timings.run("user", _ensure_user(user_id), USER_STAGE_TIMEOUT_S)),
+        asyncio.ensure_future(timings.run(
+            "memories",
+            memory_service.get_relevant_memories_async(user_id, user_message, limit=5),
+            MEMORY_STAGE_TIMEOUT_S,
+            required=False,
+            default=[]
+        )),
+        # Last 10 turns of this conversation (indexed on user_id, conversation_id, timestamp)
+        asyncio.ensure_future(timings.run(
+            "history",
+            conversations.last_turns(user_id, conversation_id, 10, "message, response, timestamp"),
+            HISTORY_STAGE_TIMEOUT_S
+        )),
+    ]
+    try:
+        _, memories, rows = await asyncio.gather(*stages)
+    except BaseException:
+        # A required stage failed; don't leave the others running
+        for stage in stages:
+            stage.cancel()
+        raise
+    
+    if "memories" in timings.skipped:
+        logger.warning(
+            "chat user=%s: memory retrieval skipped (%s) after %.1fms",
+            user_id, timings.skipped["memories"], timings.durations.get("memories", 0.0)
+        )
+    
+    conversation_history = []
+    for conv in rows:
+        conversation_history.append({"role": "user", "content": conv["message"]})
+        conversation_history.append({"role": "assistant", "content": conv["response"]})
+    
+    return memories, conversation_history
+
+
+async def _finish_turn(
+    user_id: str,
+    conversation_id: str,
+    user_message: str,
+    ai_response: str,
+    conversation_history: List[Dict[str, str]],
+    memories_used: int
+) -> None:
+    """Store the turn, then queue memory extraction and the AI journal in the background."""
+    conv_data = {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "conversation_id": conversation_id,
+        "message": user_message,
+        "response": ai_response,
+        "timestamp": datetime.now().isoformat(),
+        "metadata": {
+            "conversation_id": conversation_id,
+            "memories_used": memories_used
+        }
+    }
+    
+    await conversations.insert_turn(conv_data)
+    
+    try:
+        context = "\n".join([
+            f"{h['role']}: {h['content']}"
+            for h in conversation_history[-5:]
+        ])
+        await enqueue_post_turn(
+            user_id=user_id,
+            conversation_id=conversation_id,
+            user_message=user_message,
+            ai_response=ai_response,
+            context=context
+        )
+    except Exception as e:
+        # Don't fail the request if the post-turn work can't be queued
+        logger.exception("Failed to enqueue post-turn work: %s", e)
 
 
 @router.post("/", response_model=ChatResponse)
-async def chat(message_data: ChatMessage):
+async def chat(message_data: ChatMessage, response: Response):
     """
     Main chat endpoint - handles conversation with Tymon
+    
+    Per-stage timings (pre-generation fan-out, model call, persist) are returned
+    in the ``Server-Timing`` header.
     """
+    timings = _new_timings()
     try:
-        supabase = get_supabase_client()
         gemini = get_gemini_service()
-        memory_service = get_memory_service()
-        journal_service = get_journal_service()
         
         user_id = message_data.user_id
         user_message = message_data.message
         conversation_id = message_data.conversation_id or str(uuid.uuid4())
         
-        # Ensure user exists before proceeding
-        from app.services.supabase_service import ensure_user_exists
-        if not ensure_user_exists(user_id):
-            raise HTTPException(status_code=500, detail="Failed to ensure user exists")
-        
-        # Get relevant memories
-        memories = memory_service.get_relevant_memories(user_id, user_message, limit=5)
-        memory_texts = [mem.content for mem in memories]
-        
-        # Get conversation history for this specific conversation (filter in Python to avoid JSONB filter syntax issues)
-        history_query = supabase.table("conversations")\
-            .select("message, response, timestamp, metadata")\
-            .eq("user_id", user_id)\
-            .order("timestamp", desc=False)\
-            .limit(100)
-        history_result = history_query.execute()
-        
-        rows = history_result.data or []
-        if conversation_id:
-            rows = [r for r in rows if (r.get("metadata") or {}).get("conversation_id") == conversation_id]
-        rows = rows[-10:]
-        
-        conversation_history = []
-        for conv in rows:
-            conversation_history.append({"role": "user", "content": conv["message"]})
-            conversation_history.append({"role": "assistant", "content": conv["response"]})
+        started = time.perf_counter()
+        memories, conversation_history = await _prepare_turn(user_id, user_message, conversation_id, timings)
+        timings.record("prepare", (time.perf_counter() - started) * 1000)
         
-        # Generate response from Gemini
-        ai_response = gemini.generate_response(
+        # Generate response from Gemini (in a thread: the key pool may block waiting for rate budget)
+        started = time.perf_counter()
+        ai_response = await asyncio.to_thread(
+            gemini.generate_response,
             user_message=user_message,
             system_prompt=TYMON_SYSTEM_PROMPT,
             conversation_history=conversation_history,
-            memories=memory_texts
+            memories=[mem.content for mem in memories]
         )
+        timings.record("generate", (time.perf_counter() - started) * 1000)
         
-        # Store conversation
-        conv_data = {
-            "id": str(uuid.uuid4()),
-            "user_id": user_id,
-            "message": user_message,
-            "response": ai_response,
-            "timestamp": datetime.now().isoformat(),
-            "metadata": {
-                "conversation_id": conversation_id,
-                "memories_used": len(memories)
-            }
-        }
-        
-        supabase.table("conversations").insert(conv_data).execute()
-        
-        # Extract and store new memories from this conversation
-        conversation_text = f"User: {user_message}\nTymon: {ai_response}"
-        memory_service.extract_and_store_memories(user_id, conversation_text)
-        
-        # Generate AI journal entry (async, don't wait)
-        try:
-            # Get full conversation context for journal
-            full_context = "\n".join([
-                f"{h['role']}: {h['content']}" 
-                for h in conversation_history[-5:]
-            ]) + f"\nUser: {user_message}\nTymon: {ai_response}"
-            
-            ai_journal_data = gemini.generate_ai_journal(
-                conversation=full_context,
-                user_message=user_message,
-                ai_response=ai_response
-            )
-            
-            journal_service.create_ai_journal(
-                AIJournalCreate(
-                    user_id=user_id,
-                    conversation_id=conversation_id,
-                    reflection=ai_journal_data.get("reflection", ""),
-                    learnings=ai_journal_data.get("learnings", []),
-                    questions_raised=ai_journal_data.get("questions_raised", [])
-                )
-            )
-        except Exception as e:
-            print(f"Error creating AI journal: {e}")
-            # Don't fail the request if journal creation fails
+        started = time.perf_counter()
+        await _finish_turn(
+            user_id, conversation_id, user_message, ai_response,
+            conversation_history, len(memories)
+        )
+        timings.record("persist", (time.perf_counter() - started) * 1000)
         
+        response.headers["Server-Timing"] = timings.server_timing()
         return ChatResponse(
             response=ai_response,
             conversation_id=conversation_id,
             timestamp=datetime.now()
         )
     
+    except HTTPException:
+        raise
+    except StageTimeout as e:
+        logger.error("Chat POST stage timeout: %s", e)
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.exception("Chat POST error: %s", e)
         detail = str(e)
@@ -131,21 +191,130 @@ async def chat(message_data: ChatMessage):
         raise HTTPException(status_code=500, detail=detail)
 
 
+@router.post("/stream")
+async def chat_stream(message_data: ChatMessage):
+    """
+    Streaming chat endpoint (Server-Sent Events)
+    
+    Events: ``meta`` (conversation_id), ``token`` (text delta), then ``done``
+    (ttft_ms / total_ms / per-stage timings) or ``error``. The turn is stored once the stream completes;
+    if the client disconnects first, upstream generation is cancelled and nothing is stored.
+    """
+    started = time.perf_counter()
+    timings = _new_timings()
+    try:
+        gemini = get_gemini_service()
+        
+        user_id = message_data.user_id
+        user_message = message_data.message
+        conversation_id = message_data.conversation_id or str(uuid.uuid4())
+        
+        memories, conversation_history = await _prepare_turn(user_id, user_message, conversation_id, timings)
+        timings.record("prepare", (time.perf_counter() - started) * 1000)
+    except HTTPException:
+        raise
+    except StageTimeout as e:
+        logger.error("Chat stream stage timeout: %s", e)
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.exception("Chat stream setup error: %s", e)
+        detail = str(e)
+        if not _is_production():
+            detail = f"{detail} | traceback: {traceback.format_exc()}"
+        raise HTTPException(status_code=500, detail=detail)
+    
+    def open_stream():
+        return gemini.open_response_stream(
+            user_message=user_message,
+            system_prompt=TYMON_SYSTEM_PROMPT,
+            conversation_history=conversation_history,
+            memories=[mem.content for mem in memories]
+        )
+    
+    async def events():
+        yield format_sse({"conversation_id": conversation_id}, event="meta")
+        chunks: List[str] = []
+        ttft_ms: Optional[float] = None
+        completed = False
+        try:
+            generate_started = time.perf_counter()
+            async for text in iterate_in_thread(open_stream):
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - started) * 1000
+                chunks.append(text)
+                yield format_sse({"text": text}, event="token")
+            timings.record("generate", (time.perf_counter() - generate_started) * 1000)
+            completed = True
+        except Exception as e:
+            logger.exception("Chat stream error: %s", e)
+            yield format_sse({"detail": str(e)}, event="error")
+            return
+        finally:
+            total_ms = (time.perf_counter() - started) * 1000
+            logger.info(
+                "chat stream user=%s conversation=%s ttft_ms=%s total_ms=%.1f completed=%s",
+                user_id, conversation_id,
+                f"{ttft_ms:.1f}" if ttft_ms is not None else "-", total_ms, completed
+            )
+        
+        ai_response = "".join(chunks)
+        try:
+            persist_started = time.perf_counter()
+            await _finish_turn(
+                user_id, conversation_id, user_message, ai_response,
+                conversation_history, len(memories)
+            )
+            timings.record("persist", (time.perf_counter() - persist_started) * 1000)
+        except Exception as e:
+            logger.exception("Chat stream persist error: %s", e)
+            yield format_sse({"detail": f"Failed to store conversation: {e}"}, event="error")
+            return
+        yield format_sse({
+            "conversation_id": conversation_id,
+            "timestamp": datetime.now().isoformat(),
+            "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            "timings": timings.as_dict()
+        }, event="done")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/history/{user_id}")
-async def get_conversation_history(user_id: str, conversation_id: Optional[str] = None, limit: int = 50):
-    """Get conversation history for a user, optionally filtered by conversation_id"""
+async def get_conversation_history(
+    user_id: str,
+    response: Response,
+    conversation_id: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None
+):
+    """
+    Get conversation history for a user, optionally filtered by conversation_id.
+
+    Turns are always oldest first. With conversation_id the page is the latest
+    turns and next_cursor pages back to older ones; without it the page starts
+    at the user's first turn and next_cursor pages forward (see paged_response).
+    """
     try:
-        supabase = get_supabase_client()
-        query = supabase.table("conversations")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .order("timestamp", desc=False)\
-            .limit(limit * 3 if conversation_id else limit)
-        result = query.execute()
-        data = result.data or []
+        key = decode_cursor(cursor, len(TURN_KEY)) if cursor else None
+        # One extra turn tells whether there is a next page
         if conversation_id:
-            data = [r for r in data if (r.get("metadata") or {}).get("conversation_id") == conversation_id][:limit]
-        return data
+            rows = await conversations.last_turns(user_id, conversation_id, limit + 1, before=key)
+            page = rows[-limit:] if limit > 0 else []
+        else:
+            rows = await conversations.first_turns(user_id, limit + 1, after=key)
+            page = rows[:limit]
+        next_cursor = None
+        if page and len(rows) > limit:
+            edge = page[0] if conversation_id else page[-1]
+            next_cursor = encode_cursor(*(edge[column] for column in TURN_KEY))
+        return paged_response(response, page, next_cursor, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.exception("get_conversation_history error: %s", e)
         detail = str(e)
@@ -154,64 +323,93 @@ async def get_conversation_history(user_id: str, conversation_id: Optional[str]
         raise HTTPException(status_code=500, detail=detail)
 
 
-@router.get("/conversations/{user_id}")
-async def get_conversations(user_id: str):
-    """Get list of all conversations for a user, grouped by conversation_id, with pinned status"""
+async def _group_conversations_from_messages(user_id: str) -> List[Dict]:
+    """Legacy sidebar list built from every message (used until conversation_summaries exists)"""
+    rows = await conversations.all_for_sidebar(user_id)
+    
+    if not rows:
+        return []
+    
+    # Fetch pinned conversations (skip if table not yet created - e.g. migration not run)
+    pinned_ids = set()
     try:
-        supabase = get_supabase_client()
-        result = supabase.table("conversations")\
-            .select("id, message, response, timestamp, metadata")\
-            .eq("user_id", user_id)\
-            .order("timestamp", desc=True)\
-            .execute()
+        pinned_ids = await conversations.pinned_ids(user_id)
+    except Exception as pin_err:
+        logger.warning("pinned_conversations table not found or error: %s - run supabase_migration_pinned.sql", pin_err)
+    
+    conversations_dict = {}
+    for conv in rows:
+        conv_id = conv.get("conversation_id") or (conv.get("metadata") or {}).get("conversation_id")
+        if not conv_id:
+            continue
         
-        if not result.data:
-            return []
+        if conv_id not in conversations_dict:
+            conversations_dict[conv_id] = {
+                "conversation_id": conv_id,
+                "first_message": conv.get("message", "")[:50] + "..." if len(conv.get("message", "")) > 50 else conv.get("message", ""),
+                "last_message_time": conv.get("timestamp"),
+                "message_count": 0,
+                "pinned": conv_id in pinned_ids
+            }
         
-        # Fetch pinned conversations (skip if table not yet created - e.g. migration not run)
-        pinned_ids = set()
+        conversations_dict[conv_id]["message_count"] += 1
+        if conv.get("timestamp") > conversations_dict[conv_id]["last_message_time"]:
+            conversations_dict[conv_id]["last_message_time"] = conv.get("timestamp")
+            conversations_dict[conv_id]["first_message"] = conv.get("message", "")[:50] + "..." if len(conv.get("message", "")) > 50 else conv.get("message", "")
+    
+    conversations_list = list(conversations_dict.values())
+    
+    def _sort_key(x):
+        pinned = 0 if x.get("pinned") else 1
+        ts = x.get("last_message_time") or ""
         try:
-            pinned_result = supabase.table("pinned_conversations")\
-                .select("conversation_id")\
-                .eq("user_id", user_id)\
-                .execute()
-            pinned_ids = {r["conversation_id"] for r in (pinned_result.data or [])}
-        except Exception as pin_err:
-            logger.warning("pinned_conversations table not found or error: %s - run supabase_migration_pinned.sql", pin_err)
-        
-        conversations_dict = {}
-        for conv in result.data:
-            conv_id = conv.get("metadata", {}).get("conversation_id") if conv.get("metadata") else None
-            if not conv_id:
-                continue
-            
-            if conv_id not in conversations_dict:
-                conversations_dict[conv_id] = {
-                    "conversation_id": conv_id,
-                    "first_message": conv.get("message", "")[:50] + "..." if len(conv.get("message", "")) > 50 else conv.get("message", ""),
-                    "last_message_time": conv.get("timestamp"),
-                    "message_count": 0,
-                    "pinned": conv_id in pinned_ids
-                }
-            
-            conversations_dict[conv_id]["message_count"] += 1
-            if conv.get("timestamp") > conversations_dict[conv_id]["last_message_time"]:
-                conversations_dict[conv_id]["last_message_time"] = conv.get("timestamp")
-                conversations_dict[conv_id]["first_message"] = conv.get("message", "")[:50] + "..." if len(conv.get("message", "")) > 50 else conv.get("message", "")
-        
-        conversations_list = list(conversations_dict.values())
-        
-        def _sort_key(x):
-            pinned = 0 if x.get("pinned") else 1
-            ts = x.get("last_message_time") or ""
-            try:
-                ts_val = datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
-            except (ValueError, TypeError):
-                ts_val = 0
-            return (pinned, -ts_val)
-        
-        conversations_list.sort(key=_sort_key)
-        return conversations_list
+            ts_val = datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+        except (ValueError, TypeError):
+            ts_val = 0
+        return (pinned, -ts_val)
+    
+    conversations_list.sort(key=_sort_key)
+    return conversations_list
+
+
+def _conversation_offset(cursor: str) -> int:
+    offset, = decode_cursor(cursor, 1)
+    if not isinstance(offset, int) or offset < 0:
+        raise InvalidCursor("Invalid cursor")
+    return offset
+
+
+@router.get("/conversations/{user_id}")
+async def get_conversations(
+    user_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    cursor: Optional[str] = None
+):
+    """
+    Get a user's conversations (pinned first, then most recent): all of them,
+    or a page of ``limit`` whose next_cursor (a position in this order) gets
+    the next one (see paged_response).
+    """
+    try:
+        if cursor:
+            offset = _conversation_offset(cursor)
+        # One extra conversation tells whether there is a next page
+        fetch = None if limit is None else max(limit, 0) + 1
+        try:
+            rows = await conversations.summaries(user_id, fetch, offset)
+        except Exception as summary_err:
+            logger.warning("conversation_summaries table not found or error: %s - run supabase_migration_conversation_summaries.sql", summary_err)
+            rows = (await _group_conversations_from_messages(user_id))[offset:]
+            rows = rows if fetch is None else rows[:fetch]
+        if limit is None:
+            return paged_response(response, rows, None, cursor)
+        page = rows[:max(limit, 0)]
+        next_cursor = encode_cursor(offset + len(page)) if page and len(rows) > len(page) else None
+        return paged_response(response, page, next_cursor, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.exception("get_conversations error: %s", e)
         detail = str(e)
@@ -224,33 +422,15 @@ async def get_conversations(user_id: str):
 async def delete_conversation(user_id: str, conversation_id: str):
     """Delete a conversation and all its messages from Supabase"""
     try:
-        supabase = get_supabase_client()
-        result = supabase.table("conversations")\
-            .select("id, metadata")\
-            .eq("user_id", user_id)\
-            .execute()
-        
-        rows = result.data or []
-        ids_to_delete = [
-            r["id"] for r in rows
-            if (r.get("metadata") or {}).get("conversation_id") == conversation_id
-        ]
-        
-        if ids_to_delete:
-            for row_id in ids_to_delete:
-                supabase.table("conversations").delete().eq("id", row_id).execute()
+        deleted = await conversations.delete_conversation(user_id, conversation_id)
         
         # Remove from pinned_conversations if present (ignore if table not yet created)
         try:
-            supabase.table("pinned_conversations")\
-                .delete()\
-                .eq("user_id", user_id)\
-                .eq("conversation_id", conversation_id)\
-                .execute()
+            await conversations.unpin(user_id, conversation_id)
         except Exception:
             pass
         
-        return {"ok": True, "deleted": len(ids_to_delete)}
+        return {"ok": True, "deleted": deleted}
     except Exception as e:
         logger.exception("delete_conversation error: %s", e)
         detail = str(e)
@@ -263,11 +443,7 @@ async def delete_conversation(user_id: str, conversation_id: str):
 async def pin_conversation(user_id: str, conversation_id: str):
     """Pin a conversation"""
     try:
-        supabase = get_supabase_client()
-        supabase.table("pinned_conversations").upsert(
-            {"user_id": user_id, "conversation_id": conversation_id, "pinned_at": datetime.now().isoformat()},
-            on_conflict="user_id,conversation_id"
-        ).execute()
+        await conversations.pin(user_id, conversation_id, datetime.now().isoformat())
         return {"ok": True, "pinned": True}
     except Exception as e:
         logger.exception("pin_conversation error: %s", e)
@@ -281,12 +457,7 @@ async def pin_conversation(user_id: str, conversation_id: str):
 async def unpin_conversation(user_id: str, conversation_id: str):
     """Unpin a conversation"""
     try:
-        supabase = get_supabase_client()
-        supabase.table("pinned_conversations")\
-            .delete()\
-            .eq("user_id", user_id)\
-            .eq("conversation_id", conversation_id)\
-            .execute()
+        await conversations.unpin(user_id, conversation_id)
         return {"ok": True, "pinned": False}
     except Exception as e:
         logger.exception("unpin_conversation error: %s", e)
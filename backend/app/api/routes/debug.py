@@ -0,0 +1,81 @@
+from typing import Optional
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from app.api.dependencies import require_debug_token
+from app.services.access_tracker import get_access_tracker
+from app.services.gemini_service import get_gemini_service
+from app.services.llm_telemetry import get_llm_telemetry
+from app.services.memory_maintenance import prune_stats
+from app.services.memory_service import get_memory_service
+from app.services.work_queue import get_work_queue
+from app.utils.metrics import all_batch_stats, all_stage_stats
+
+# Per-key usage, error classes and token counts: admin only (see require_debug_token)
+router = APIRouter(dependencies=[Depends(require_debug_token)])
+
+
+@router.get("/queue")
+async def get_queue_stats():
+    """Background work queue depth, counters and job latency"""
+    return get_work_queue().stats()
+
+
+@router.get("/stages")
+async def get_stage_stats():
+    """Per-stage request latency (p50/p95/max) and skip counts, e.g. the chat pre-generation fan-out"""
+    return all_stage_stats()
+
+
+@router.get("/batches")
+async def get_batch_stats():
+    """Bulk write batch sizes and database round trips saved (e.g. memory writes per extraction)"""
+    return all_batch_stats()
+
+
+@router.get("/memory-access")
+async def get_memory_access_stats():
+    """Buffered memory hits awaiting the write-behind flush, plus flush counters"""
+    return get_access_tracker().stats()
+
+
+@router.get("/memory-prune")
+async def get_memory_prune_stats():
+    """Rows examined and deleted by memory pruning jobs, plus the last periodic sweep"""
+    return prune_stats()
+
+
+@router.get("/memory-cache")
+async def get_memory_cache_stats():
+    """Per-user memory working-set cache: size, hits/misses, evictions, invalidations"""
+    return get_memory_service().indexes.stats()
+
+
+@router.get("/gemini-keys")
+async def get_gemini_key_stats():
+    """Per-key Gemini usage, remaining RPM/TPM budget, cooldowns and throttle counters"""
+    return get_gemini_service().key_pool.stats()
+
+
+@router.get("/llm")
+async def get_llm_telemetry_records(
+    limit: int = 100,
+    outcome: Optional[str] = None,
+    key: Optional[str] = None,
+    operation: Optional[str] = None
+):
+    """Summary plus the most recent Gemini attempts (filter by outcome, key suffix or operation)"""
+    telemetry = get_llm_telemetry()
+    return {
+        "summary": telemetry.summary(),
+        "attempts": telemetry.query(limit=limit, outcome=outcome, key=key, operation=operation)
+    }
+
+
+@router.get("/llm/export")
+async def export_llm_telemetry():
+    """All buffered Gemini attempts as JSON lines"""
+    return StreamingResponse(
+        get_llm_telemetry().export_jsonl(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=llm_telemetry.jsonl"}
+    )
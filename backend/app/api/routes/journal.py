@@ -1,48 +1,88 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Response
+from typing import List, Optional, Union
+import logging
 from app.models.journal import (
+    JournalExtractionStatus,
     UserJournal,
     UserJournalCreate,
     AIJournal,
-    AIJournalCreate
+    AIJournalCreate,
+    JournalSearchPage,
+    TagCount
 )
+from app.models.page import Page
+from app.repositories.journal_repository import TAG_MODES
+from app.services.journal_ingest import enqueue_journal_extraction, enqueue_journal_retirement
 from app.services.journal_service import get_journal_service
+from app.utils.pagination import InvalidCursor, paged_response
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 @router.post("/user", response_model=UserJournal)
 async def create_user_journal(journal_data: UserJournalCreate):
-    """Create a new user journal entry"""
+    """Create a new user journal entry; its memories are extracted in the background"""
     try:
         journal_service = get_journal_service()
-        return journal_service.create_user_journal(journal_data)
+        journal = await journal_service.create_user_journal_async(journal_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    try:
+        await enqueue_journal_extraction(journal.user_id, journal.id)
+    except Exception as e:
+        # The entry is stored; only its memory extraction is lost
+        logger.exception("Failed to enqueue journal extraction: %s", e)
+    return journal
 
 
-@router.get("/user/{user_id}", response_model=List[UserJournal])
+@router.get("/user/{user_id}", response_model=Union[List[UserJournal], Page[UserJournal]])
 async def get_user_journals(
     user_id: str,
+    response: Response,
     limit: int = 50,
     offset: int = 0,
-    tags: Optional[str] = None
+    tags: Optional[str] = None,
+    tag_mode: str = "all",
+    cursor: Optional[str] = None
 ):
-    """Get user journals with optional tag filtering"""
+    """
+    Get user journals, optionally with all (tag_mode=all) or any (tag_mode=any)
+    of the comma-separated tags (keyset-paged with ?cursor=, see paged_response)
+    """
+    if tag_mode not in TAG_MODES:
+        raise HTTPException(status_code=400, detail=f"tag_mode must be one of {', '.join(TAG_MODES)}")
     try:
         journal_service = get_journal_service()
-        tag_list = tags.split(",") if tags else None
-        return journal_service.get_user_journals(user_id, limit, offset, tag_list)
+        tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()] if tags else None
+        journals, next_cursor = await journal_service.get_user_journals_async(
+            user_id, limit, offset, tag_list, cursor, tag_mode
+        )
+        return paged_response(response, journals, next_cursor, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/user/{user_id}/search")
-async def search_user_journals(user_id: str, q: str, limit: int = 20):
-    """Search user journals"""
+@router.get("/user/{user_id}/search", response_model=JournalSearchPage)
+async def search_user_journals(user_id: str, q: str, limit: int = 20, cursor: Optional[str] = None):
+    """Search user journals (best matches first; pass next_cursor back as cursor for the next page)"""
     try:
         journal_service = get_journal_service()
-        return journal_service.search_user_journals(user_id, q, limit)
+        return await journal_service.search_user_journals_async(user_id, q, max(1, min(limit, 100)), cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/user/{user_id}/tags", response_model=List[TagCount])
+async def get_user_journal_tags(user_id: str):
+    """Tag facet counts for a user's journals, most used first"""
+    try:
+        journal_service = get_journal_service()
+        return await journal_service.get_user_journal_tags_async(user_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -52,7 +92,7 @@ async def get_user_journal(journal_id: str, user_id: str):
     """Get a specific user journal entry"""
     try:
         journal_service = get_journal_service()
-        journal = journal_service.get_user_journal(journal_id, user_id)
+        journal = await journal_service.get_user_journal_async(journal_id, user_id)
         if not journal:
             raise HTTPException(status_code=404, detail="Journal not found")
         return journal
@@ -62,6 +102,21 @@ async def get_user_journal(journal_id: str, user_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/user/entry/{journal_id}/extraction", response_model=JournalExtractionStatus)
+async def get_user_journal_extraction(journal_id: str, user_id: str):
+    """Memory extraction progress of a user journal entry (pending/processing/done/failed)"""
+    try:
+        journal_service = get_journal_service()
+        status = await journal_service.get_extraction_status_async(journal_id, user_id)
+        if not status:
+            raise HTTPException(status_code=404, detail="Journal not found")
+        return status
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.put("/user/entry/{journal_id}")
 async def update_user_journal(
     journal_id: str,
@@ -69,41 +124,62 @@ async def update_user_journal(
     content: str,
     tags: Optional[str] = None
 ):
-    """Update a user journal entry"""
+    """Update a user journal entry; memories of new or changed paragraphs are extracted in the background"""
     try:
         journal_service = get_journal_service()
         tag_list = tags.split(",") if tags else None
-        journal = journal_service.update_user_journal(journal_id, user_id, content, tag_list)
+        journal = await journal_service.update_user_journal_async(journal_id, user_id, content, tag_list)
         if not journal:
             raise HTTPException(status_code=404, detail="Journal not found")
-        return journal
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    try:
+        await enqueue_journal_extraction(journal.user_id, journal.id)
+    except Exception as e:
+        logger.exception("Failed to enqueue journal extraction: %s", e)
+    return journal
 
 
 @router.delete("/user/entry/{journal_id}")
 async def delete_user_journal(journal_id: str, user_id: str):
-    """Delete a user journal entry"""
+    """Delete a user journal entry; the memories only it linked to are retired in the background"""
     try:
         journal_service = get_journal_service()
-        success = journal_service.delete_user_journal(journal_id, user_id)
+        # Read before the delete cascades the links
+        memory_ids = await journal_service.get_journal_memory_ids_async(journal_id)
+        success = await journal_service.delete_user_journal_async(journal_id, user_id)
         if not success:
             raise HTTPException(status_code=404, detail="Journal not found")
-        return {"success": True}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if memory_ids:
+        try:
+            await enqueue_journal_retirement(user_id, memory_ids)
+        except Exception as e:
+            # The entry is deleted; only its memories keep their weight
+            logger.exception("Failed to enqueue journal memory retirement: %s", e)
+    return {"success": True}
 
 
-@router.get("/ai/{user_id}", response_model=List[AIJournal])
-async def get_ai_journals(user_id: str, limit: int = 50, offset: int = 0):
-    """Get AI journals for a user"""
+@router.get("/ai/{user_id}", response_model=Union[List[AIJournal], Page[AIJournal]])
+async def get_ai_journals(
+    user_id: str,
+    response: Response,
+    limit: int = 50,
+    offset: int = 0,
+    cursor: Optional[str] = None
+):
+    """Get AI journals for a user (keyset-paged with ?cursor=, see paged_response)"""
     try:
         journal_service = get_journal_service()
-        return journal_service.get_ai_journals(user_id, limit, offset)
+        journals, next_cursor = await journal_service.get_ai_journals_async(user_id, limit, offset, cursor)
+        return paged_response(response, journals, next_cursor, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -113,7 +189,7 @@ async def get_ai_journal(journal_id: str, user_id: str):
     """Get a specific AI journal entry"""
     try:
         journal_service = get_journal_service()
-        journal = journal_service.get_ai_journal(journal_id, user_id)
+        journal = await journal_service.get_ai_journal_async(journal_id, user_id)
         if not journal:
             raise HTTPException(status_code=404, detail="Journal not found")
         return journal
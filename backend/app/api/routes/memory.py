@@ -11,7 +11,7 @@ async def get_all_memories(user_id: str):
     """Get all memories for a user"""
     try:
         memory_service = get_memory_service()
-        return memory_service.get_all_memories(user_id)
+        return await memory_service.get_all_memories_async(user_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -21,7 +21,7 @@ async def get_relevant_memories(user_id: str, query: str, limit: int = 5):
     """Get relevant memories for a query"""
     try:
         memory_service = get_memory_service()
-        memories = memory_service.get_relevant_memories(user_id, query, limit)
+        memories = await memory_service.get_relevant_memories_async(user_id, query, limit)
         return MemoryRetrieval(memories=memories, count=len(memories))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -32,7 +32,7 @@ async def delete_memory(memory_id: str, user_id: str):
     """Delete a memory"""
     try:
         memory_service = get_memory_service()
-        success = memory_service.delete_memory(memory_id, user_id)
+        success = await memory_service.delete_memory_async(memory_id, user_id)
         if not success:
             raise HTTPException(status_code=404, detail="Memory not found")
         return {"success": True}
@@ -1,8 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import chat, journal, memory
+from app.api.routes import chat, debug, journal, memory
+from app.services.access_tracker import get_access_tracker
+from app.services.journal_ingest import register_journal_handlers
+from app.services.llm_telemetry import get_llm_telemetry
+from app.services.memory_maintenance import MemoryPruneSweeper, register_memory_maintenance_handlers
+from app.services.post_turn import register_post_turn_handlers
+from app.services.supabase_service import close_async_supabase_client
+from app.services.work_queue import get_work_queue
+from app.utils.pagination import NEXT_CURSOR_HEADER
 
-app = FastAPI(title="Tymon AI Chatbot API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background work queue: start workers (and replay spooled jobs), drain on shutdown
+    queue = get_work_queue()
+    register_post_turn_handlers(queue)
+    register_memory_maintenance_handlers(queue)
+    register_journal_handlers(queue)
+    await queue.start()
+    # Periodic memory pruning (expired rows); extraction only prunes when over budget
+    sweeper = MemoryPruneSweeper()
+    sweeper.start()
+    yield
+    await sweeper.stop()
+    await queue.stop()
+    get_access_tracker().close()
+    await close_async_supabase_client()
+    get_llm_telemetry().close()
+
+
+app = FastAPI(title="Tymon AI Chatbot API", version="1.0.0", lifespan=lifespan)
 
 # CORS: cho phép tất cả nguồn để frontend (VD: Vercel) gọi API không bị chặn
 app.add_middleware(
@@ -11,12 +40,14 @@ app.add_middleware(
     allow_credentials=False,  # phải False khi dùng allow_origins=["*"] theo chuẩn CORS
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include routers
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(journal.router, prefix="/api/journal", tags=["journal"])
 app.include_router(memory.router, prefix="/api/memory", tags=["memory"])
+app.include_router(debug.router, prefix="/api/debug", tags=["debug"])
 
 
 @app.get("/")
@@ -1,14 +1,26 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List
 from datetime import datetime
+from app.models.page import Page
+from app.models.records import Record
 
 
 class UserJournal(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: Optional[str] = None
     user_id: str
     content: str
     created_at: Optional[datetime] = None
     tags: Optional[List[str]] = None
+    extraction_status: Optional[str] = None
+    paragraph_hashes: Optional[List[str]] = None
+
+
+class UserJournalRecord(Record):
+    """Unvalidated UserJournal over a trusted database row (see app.models.records)"""
+    __slots__ = ()
+    model = UserJournal
 
 
 class UserJournalCreate(BaseModel):
@@ -18,6 +30,8 @@ class UserJournalCreate(BaseModel):
 
 
 class AIJournal(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: Optional[str] = None
     user_id: str
     conversation_id: str
@@ -27,9 +41,41 @@ class AIJournal(BaseModel):
     created_at: Optional[datetime] = None
 
 
+class AIJournalRecord(Record):
+    """Unvalidated AIJournal over a trusted database row (see app.models.records)"""
+    __slots__ = ()
+    model = AIJournal
+
+
 class AIJournalCreate(BaseModel):
     user_id: str
     conversation_id: str
     reflection: str
     learnings: List[str]
     questions_raised: List[str]
+
+
+class JournalSearchHit(BaseModel):
+    id: str
+    created_at: Optional[datetime] = None
+    tags: Optional[List[str]] = None
+    rank: float
+    headline: str
+
+
+class JournalSearchPage(Page[JournalSearchHit]):
+    pass
+
+
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+
+class JournalExtractionStatus(BaseModel):
+    journal_id: str
+    status: str
+    chunks: Optional[int] = None
+    memories: Optional[int] = None
+    error: Optional[str] = None
+    updated_at: Optional[datetime] = None
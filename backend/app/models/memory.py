@@ -1,9 +1,12 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List
 from datetime import datetime
+from app.models.records import Record
 
 
 class Memory(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: Optional[str] = None
     user_id: str
     content: str
@@ -18,6 +21,13 @@ class Memory(BaseModel):
     is_pinned: Optional[bool] = None
     memory_type: Optional[str] = None
     source: Optional[str] = None
+    stability: Optional[float] = None
+
+
+class MemoryRecord(Record):
+    """Unvalidated Memory over a trusted database row (see app.models.records)"""
+    __slots__ = ()
+    model = Memory
 
 
 class MemoryCreate(BaseModel):
@@ -31,6 +41,7 @@ class MemoryCreate(BaseModel):
     is_pinned: Optional[bool] = None
     memory_type: Optional[str] = None
     source: Optional[str] = None
+    stability: Optional[float] = None
 
 
 class MemoryRetrieval(BaseModel):
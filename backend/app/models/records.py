@@ -0,0 +1,102 @@
+"""
+Compact read models for rows that come from our own database
+
+Constructing a Pydantic model validates and converts every field of every row.
+For trusted rows that is wasted work: services often read a few fields of
+hundreds of rows. A Record wraps the row dict as-is (``__slots__``, no copy)
+and parses datetime fields only when they are first read. Validation happens
+at the API boundary instead: the Pydantic models set ``from_attributes`` so
+FastAPI's response_model (or e.g. ``MemoryRetrieval(memories=records)``)
+validates records like any other object.
+"""
+
+import typing
+from datetime import datetime
+from typing import Any, ClassVar, Dict, Iterator, Tuple, Type
+
+from pydantic import BaseModel
+
+
+def _is_datetime(annotation: Any) -> bool:
+    return annotation is datetime or datetime in typing.get_args(annotation)
+
+
+def parse_datetime(value: str) -> datetime:
+    """PostgREST timestamp (ISO 8601, possibly with a Z suffix) -> datetime"""
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+def _field(name: str, default: Any, is_datetime: bool) -> property:
+    if is_datetime:
+        def get(self):
+            value = self._row.get(name, default)
+            if value.__class__ is str:
+                value = self._row[name] = parse_datetime(value)
+            return value
+    else:
+        def get(self):
+            return self._row.get(name, default)
+
+    def set(self, value):
+        self._row[name] = value
+
+    return property(get, set)
+
+
+class Record:
+    """
+    Read-only-by-convention view over one database row, shaped like ``model``.
+
+    Subclasses only set ``model``; each model field becomes a property reading
+    the row (datetime strings are parsed on first read and cached in the row).
+    Missing optional fields read as the model's default.
+    """
+
+    __slots__ = ("_row",)
+
+    model: ClassVar[Type[BaseModel]]
+    _fields: ClassVar[Tuple[str, ...]] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = cls.model.model_fields
+        cls._fields = tuple(fields)
+        for name, info in fields.items():
+            default = None if info.is_required() else info.default
+            setattr(cls, name, _field(name, default, _is_datetime(info.annotation)))
+
+    def __init__(self, row: Dict[str, Any]):
+        self._row = row
+
+    # Mapping protocol, so dict(record) / jsonable_encoder work on routes without a response_model
+    def keys(self) -> Tuple[str, ...]:
+        return self._fields
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._fields:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return getattr(self, name) if name in self._fields else default
+
+    def model_dump(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self._fields}
+
+    def to_model(self) -> BaseModel:
+        """The fully validated Pydantic model"""
+        return self.model.model_validate(self.model_dump())
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Record):
+            return type(other) is type(self) and other.model_dump() == self.model_dump()
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={self._row[name]!r}" for name in self._fields if name in self._row)
+        return f"{type(self).__name__}({fields})"
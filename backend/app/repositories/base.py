@@ -0,0 +1,17 @@
+"""
+Async data access over the shared, pooled Supabase client
+"""
+
+from app.services.supabase_service import get_async_supabase_client
+
+
+class AsyncRepository:
+    table_name: str = ""
+
+    async def _table(self, table_name: str = ""):
+        client = await get_async_supabase_client()
+        return client.table(table_name or self.table_name)
+
+    async def _rpc(self, fn: str, params: dict):
+        client = await get_async_supabase_client()
+        return client.rpc(fn, params)
@@ -0,0 +1,158 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.repositories.base import AsyncRepository
+from app.utils.pagination import keyset_filter
+
+logger = logging.getLogger(__name__)
+
+# Sort key of history pages, backed by the (user_id[, conversation_id], timestamp, id) indexes
+TURN_KEY = ("timestamp", "id")
+# Where conversation_id lived before supabase_migration_conversation_id.sql (still written there)
+METADATA_CONVERSATION_ID = "metadata->>conversation_id"
+
+
+def _missing_conversation_column(error: Exception) -> bool:
+    message = str(error)
+    return "conversation_id" in message and ("does not exist" in message or "schema cache" in message)
+
+
+class ConversationRepository(AsyncRepository):
+    table_name = "conversations"
+
+    def __init__(self):
+        # False once conversations.conversation_id turns out to be missing
+        self._conversation_column = True
+
+    async def _by_conversation(self, run: Callable[[str], Awaitable[Any]]) -> Any:
+        """
+        ``run("conversation_id")``, or ``run`` with the metadata JSON path once the
+        column turns out to be missing: supabase_migration_conversation_id.sql has
+        not been run yet, and reads and writes should keep working until it is.
+        """
+        if not self._conversation_column:
+            return await run(METADATA_CONVERSATION_ID)
+        try:
+            return await run("conversation_id")
+        except Exception as e:
+            if not _missing_conversation_column(e):
+                raise
+            self._conversation_column = False
+            logger.warning(
+                "conversations.conversation_id is missing (%s) - run supabase_migration_conversation_id.sql; "
+                "filtering on metadata instead", e
+            )
+            return await run(METADATA_CONVERSATION_ID)
+
+    async def insert_turn(self, conv_data: Dict[str, Any]) -> None:
+        async def insert(column: str) -> None:
+            row = conv_data if column == "conversation_id" else {
+                k: v for k, v in conv_data.items() if k != "conversation_id"
+            }
+            table = await self._table()
+            await table.insert(row).execute()
+
+        await self._by_conversation(insert)
+
+    async def last_turns(
+        self,
+        user_id: str,
+        conversation_id: str,
+        limit: int,
+        columns: str = "*",
+        before: Optional[List[Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Last `limit` turns of one conversation (older than a (timestamp, id) keyset if given), oldest first"""
+        async def select(column: str) -> Any:
+            table = await self._table()
+            query = table\
+                .select(columns)\
+                .eq("user_id", user_id)\
+                .eq(column, conversation_id)
+            if before:
+                query = query.or_(keyset_filter(TURN_KEY, before, descending=True))
+            return await query\
+                .order("timestamp", desc=True)\
+                .order("id", desc=True)\
+                .limit(limit)\
+                .execute()
+
+        result = await self._by_conversation(select)
+        return list(reversed(result.data or []))
+
+    async def first_turns(self, user_id: str, limit: int, after: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        """First `limit` turns of a user (newer than a (timestamp, id) keyset if given), oldest first"""
+        table = await self._table()
+        query = table\
+            .select("*")\
+            .eq("user_id", user_id)
+        if after:
+            query = query.or_(keyset_filter(TURN_KEY, after, descending=False))
+        result = await query\
+            .order("timestamp", desc=False)\
+            .order("id", desc=False)\
+            .limit(limit)\
+            .execute()
+        return result.data or []
+
+    async def all_for_sidebar(self, user_id: str) -> List[Dict[str, Any]]:
+        """Every turn of a user, newest first (conversation_id may only be in metadata)"""
+        async def select(column: str) -> Any:
+            columns = "id, conversation_id, message, timestamp, metadata" if column == "conversation_id" \
+                else "id, message, timestamp, metadata"
+            table = await self._table()
+            return await table\
+                .select(columns)\
+                .eq("user_id", user_id)\
+                .order("timestamp", desc=True)\
+                .execute()
+
+        result = await self._by_conversation(select)
+        return result.data or []
+
+    async def delete_conversation(self, user_id: str, conversation_id: str) -> int:
+        async def delete(column: str) -> Any:
+            table = await self._table()
+            return await table\
+                .delete()\
+                .eq("user_id", user_id)\
+                .eq(column, conversation_id)\
+                .execute()
+
+        result = await self._by_conversation(delete)
+        return len(result.data or [])
+
+    async def summaries(self, user_id: str, limit: Optional[int], offset: int = 0) -> List[Dict[str, Any]]:
+        """conversation_summaries from ``offset`` (up to ``limit``, or all), pinned first then most recent"""
+        table = await self._table("conversation_summaries")
+        query = table\
+            .select("conversation_id, first_message, last_message_time, message_count, pinned")\
+            .eq("user_id", user_id)\
+            .order("pinned", desc=True)\
+            .order("last_message_time", desc=True)\
+            .order("conversation_id", desc=True)
+        if limit is not None:
+            query = query.range(offset, offset + limit - 1)
+        elif offset:
+            query = query.offset(offset)
+        result = await query.execute()
+        return result.data or []
+
+    async def pinned_ids(self, user_id: str) -> set:
+        table = await self._table("pinned_conversations")
+        result = await table.select("conversation_id").eq("user_id", user_id).execute()
+        return {r["conversation_id"] for r in (result.data or [])}
+
+    async def pin(self, user_id: str, conversation_id: str, pinned_at: str) -> None:
+        table = await self._table("pinned_conversations")
+        await table.upsert(
+            {"user_id": user_id, "conversation_id": conversation_id, "pinned_at": pinned_at},
+            on_conflict="user_id,conversation_id"
+        ).execute()
+
+    async def unpin(self, user_id: str, conversation_id: str) -> None:
+        table = await self._table("pinned_conversations")
+        await table\
+            .delete()\
+            .eq("user_id", user_id)\
+            .eq("conversation_id", conversation_id)\
+            .execute()
@@ -0,0 +1,124 @@
+from typing import Any, Dict, List, Optional
+from app.repositories.base import AsyncRepository
+from app.utils.pagination import keyset_query
+
+# all: journals with every given tag (tags @> ...); any: with at least one (tags && ...)
+TAG_MODES = ("all", "any")
+
+# Sort key of journal listings (newest first), backed by (user_id, created_at DESC, id DESC) indexes
+JOURNAL_KEY = ("created_at", "id")
+
+
+def filter_tags(query: Any, tags: Optional[List[str]], tag_mode: str = "all") -> Any:
+    """One containment (all) or overlap (any) filter on the GIN-indexed tags column"""
+    if not tags:
+        return query
+    if tag_mode not in TAG_MODES:
+        raise ValueError(f"tag_mode must be one of {', '.join(TAG_MODES)}")
+    return query.contains("tags", tags) if tag_mode == "all" else query.overlaps("tags", tags)
+
+
+class UserJournalRepository(AsyncRepository):
+    table_name = "user_journals"
+
+    async def insert(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        table = await self._table()
+        result = await table.insert(data).execute()
+        return result.data[0] if result.data else None
+
+    async def list_for_user(
+        self,
+        user_id: str,
+        limit: int,
+        offset: int,
+        tags: Optional[List[str]] = None,
+        after: Optional[List[Any]] = None,
+        tag_mode: str = "all"
+    ) -> List[Dict[str, Any]]:
+        """Newest first by (created_at, id), up to limit + 1 rows (after a keyset or from offset)"""
+        table = await self._table()
+        query = filter_tags(table.select("*").eq("user_id", user_id), tags, tag_mode)
+        result = await keyset_query(query, JOURNAL_KEY, limit, offset, after).execute()
+        return result.data or []
+
+    async def get(self, journal_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        table = await self._table()
+        result = await table\
+            .select("*")\
+            .eq("id", journal_id)\
+            .eq("user_id", user_id)\
+            .execute()
+        return result.data[0] if result.data else None
+
+    async def update(self, journal_id: str, user_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        table = await self._table()
+        result = await table\
+            .update(updates)\
+            .eq("id", journal_id)\
+            .eq("user_id", user_id)\
+            .execute()
+        return result.data[0] if result.data else None
+
+    async def delete(self, journal_id: str, user_id: str) -> bool:
+        table = await self._table()
+        result = await table\
+            .delete()\
+            .eq("id", journal_id)\
+            .eq("user_id", user_id)\
+            .execute()
+        return len(result.data or []) > 0
+
+    async def linked_memory_ids(self, journal_id: str) -> List[str]:
+        """Memories extracted from a journal's paragraphs (journal_memory_links)"""
+        table = await self._table("journal_memory_links")
+        result = await table.select("memory_id").eq("journal_id", journal_id).execute()
+        return sorted({row["memory_id"] for row in result.data or []})
+
+    async def tag_counts(self, user_id: str) -> List[Dict[str, Any]]:
+        """Trigger-maintained per-user tag counts (user_journal_tags), most used first"""
+        table = await self._table("user_journal_tags")
+        result = await table\
+            .select("tag, journal_count")\
+            .eq("user_id", user_id)\
+            .order("journal_count", desc=True)\
+            .order("tag")\
+            .execute()
+        return result.data or []
+
+    async def all_tags(self, user_id: str) -> List[List[str]]:
+        """The tags of every journal of a user (fallback until user_journal_tags exists)"""
+        table = await self._table()
+        result = await table.select("tags").eq("user_id", user_id).execute()
+        return [row.get("tags") or [] for row in result.data or []]
+
+    async def search(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Ranked full-text search (search_user_journals RPC)"""
+        rpc = await self._rpc("search_user_journals", params)
+        result = await rpc.execute()
+        return result.data or []
+
+
+class AIJournalRepository(AsyncRepository):
+    table_name = "ai_journals"
+
+    async def list_for_user(
+        self,
+        user_id: str,
+        limit: int,
+        offset: int,
+        after: Optional[List[Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Newest first by (created_at, id), up to limit + 1 rows (after a keyset or from offset)"""
+        table = await self._table()
+        query = table.select("*").eq("user_id", user_id)
+        result = await keyset_query(query, JOURNAL_KEY, limit, offset, after).execute()
+        return result.data or []
+
+    async def get(self, journal_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        table = await self._table()
+        result = await table\
+            .select("*")\
+            .eq("id", journal_id)\
+            .eq("user_id", user_id)\
+            .execute()
+        return result.data[0] if result.data else None
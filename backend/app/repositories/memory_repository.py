@@ -0,0 +1,28 @@
+from typing import Any, Dict, List
+from app.repositories.base import AsyncRepository
+
+
+class MemoryRepository(AsyncRepository):
+    table_name = "memories"
+
+    async def list_for_user(self, user_id: str) -> List[Dict[str, Any]]:
+        table = await self._table()
+        result = await table\
+            .select("*")\
+            .eq("user_id", user_id)\
+            .order("created_at", desc=True)\
+            .execute()
+        return result.data or []
+
+    async def update(self, memory_id: str, updates: Dict[str, Any]) -> None:
+        table = await self._table()
+        await table.update(updates).eq("id", memory_id).execute()
+
+    async def delete(self, memory_id: str, user_id: str) -> bool:
+        table = await self._table()
+        result = await table\
+            .delete()\
+            .eq("id", memory_id)\
+            .eq("user_id", user_id)\
+            .execute()
+        return len(result.data or []) > 0
@@ -0,0 +1,16 @@
+from typing import Any, Dict
+from app.repositories.base import AsyncRepository
+
+
+class UserRepository(AsyncRepository):
+    table_name = "users"
+
+    async def exists(self, user_id: str) -> bool:
+        table = await self._table()
+        result = await table.select("id").eq("id", user_id).execute()
+        return bool(result.data)
+
+    async def upsert(self, user_data: Dict[str, Any]) -> None:
+        """Insert the user; a row with the same id is left untouched."""
+        table = await self._table()
+        await table.upsert(user_data, on_conflict="id", ignore_duplicates=True).execute()
@@ -0,0 +1,136 @@
+"""
+Write-behind memory access tracking: hits are merged per memory id in memory
+and flushed periodically as one atomic bulk increment (record_memory_access RPC)
+"""
+
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.services.supabase_service import get_supabase_client
+
+MEMORY_ACCESS_FLUSH_S = float(os.getenv("MEMORY_ACCESS_FLUSH_S", "5"))
+# Distinct memory ids buffered before a flush is forced (and the cap kept while the RPC fails)
+MEMORY_ACCESS_MAX_PENDING = int(os.getenv("MEMORY_ACCESS_MAX_PENDING", "10000"))
+
+
+class AccessTracker:
+    """
+    Buffer of memory hits not yet written to the database.
+
+    ``record`` only updates an in-memory dict (id -> hit count, latest access
+    time), so retrieval never writes. A daemon thread flushes the buffer every
+    ``flush_interval_s`` through ``record_memory_access``, which adds the counts
+    in SQL (``access_count = access_count + n``), so concurrent instances do not
+    lose increments. A failed flush puts its hits back for the next attempt.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any] = get_supabase_client,
+        flush_interval_s: float = MEMORY_ACCESS_FLUSH_S,
+        max_pending: int = MEMORY_ACCESS_MAX_PENDING
+    ):
+        self._client_factory = client_factory
+        self.flush_interval_s = flush_interval_s
+        self.max_pending = max_pending
+        self._pending: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._flusher: Optional[threading.Thread] = None
+        self._counters = {"recorded": 0, "flushed": 0, "batches": 0, "flush_errors": 0, "dropped": 0}
+
+    def record(self, memory_ids: Iterable[str], accessed_at: Optional[datetime] = None) -> None:
+        """Count one access for each id (no I/O)."""
+        when = (accessed_at or datetime.now(timezone.utc)).isoformat()
+        with self._lock:
+            for memory_id in memory_ids:
+                if not memory_id:
+                    continue
+                self._counters["recorded"] += 1
+                self._merge(memory_id, 1, when)
+            full = len(self._pending) >= self.max_pending
+            if self._flusher is None and not self._stopped:
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, name="memory-access-flush", daemon=True
+                )
+                self._flusher.start()
+        if full:
+            self._wake.set()
+
+    def _merge(self, memory_id: str, count: int, when: str) -> None:
+        entry = self._pending.get(memory_id)
+        if entry is not None:
+            entry[0] += count
+            entry[1] = max(entry[1], when)
+        elif len(self._pending) < self.max_pending:
+            self._pending[memory_id] = [count, when]
+        else:
+            self._counters["dropped"] += count
+
+    def pending(self) -> Dict[str, int]:
+        with self._lock:
+            return {memory_id: entry[0] for memory_id, entry in self._pending.items()}
+
+    def flush(self) -> int:
+        """Write buffered hits in one RPC; returns how many memories were updated."""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+            if not batch:
+                return 0
+            hits = [
+                {"id": memory_id, "n": count, "accessed_at": when}
+                for memory_id, (count, when) in batch.items()
+            ]
+            try:
+                self._client_factory().rpc("record_memory_access", {"hits": hits}).execute()
+            except Exception as e:
+                with self._lock:
+                    self._counters["flush_errors"] += 1
+                    for memory_id, (count, when) in batch.items():
+                        self._merge(memory_id, count, when)
+                print(f"Memory access flush failed: {e} - run supabase_migration_memory_access.sql")
+                return 0
+            with self._lock:
+                self._counters["batches"] += 1
+                self._counters["flushed"] += sum(count for count, _ in batch.values())
+            return len(batch)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._counters,
+                "pending_memories": len(self._pending),
+                "pending_hits": sum(entry[0] for entry in self._pending.values()),
+            }
+
+    def _flush_loop(self) -> None:
+        while not self._stopped:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the flusher and write out whatever is left (on app shutdown)."""
+        self._stopped = True
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        self.flush()
+
+
+# Singleton instance
+_access_tracker: Optional[AccessTracker] = None
+
+
+def get_access_tracker() -> AccessTracker:
+    """Get or create memory access tracker singleton"""
+    global _access_tracker
+    if _access_tracker is None:
+        _access_tracker = AccessTracker()
+    return _access_tracker
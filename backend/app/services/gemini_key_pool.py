@@ -0,0 +1,269 @@
+"""
+Gemini API key pool: one client per key, per-key RPM/TPM budgets and 429 cooldowns
+"""
+
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from google.api_core.exceptions import ResourceExhausted
+
+# Per-key quota (defaults match the gemini-2.5-flash free tier)
+KEY_RPM = float(os.getenv("GEMINI_KEY_RPM", "10"))
+KEY_TPM = float(os.getenv("GEMINI_KEY_TPM", "250000"))
+# How long a request may wait for a key with budget before giving up
+KEY_MAX_WAIT_S = float(os.getenv("GEMINI_KEY_MAX_WAIT_S", "10"))
+# Cooldown after a 429 that carries no retry delay; doubles per consecutive 429
+KEY_COOLDOWN_S = float(os.getenv("GEMINI_KEY_COOLDOWN_S", "15"))
+KEY_MAX_COOLDOWN_S = float(os.getenv("GEMINI_KEY_MAX_COOLDOWN_S", "120"))
+# Output tokens reserved per request until the real usage is known
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "512"))
+
+_RETRY_IN_RE = re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE)
+_RETRY_DELAY_RE = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)")
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Rough token estimate (~4 chars per token) plus the expected output."""
+    return len(prompt) // 4 + 1 + EXPECTED_OUTPUT_TOKENS
+
+
+def response_total_tokens(response: Any) -> Optional[int]:
+    """total_token_count from a Gemini response's usage metadata, if present."""
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    return total if isinstance(total, int) and total > 0 else None
+
+
+def parse_retry_delay(error: Exception) -> Optional[float]:
+    """Server-suggested retry delay (seconds) from a ResourceExhausted error, if any."""
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if isinstance(delay, timedelta):
+            return delay.total_seconds()
+        if delay is not None and hasattr(delay, "seconds"):
+            return delay.seconds + getattr(delay, "nanos", 0) / 1e9
+    text = str(error)
+    for pattern in (_RETRY_IN_RE, _RETRY_DELAY_RE):
+        match = pattern.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def _default_client_factory(api_key: str):
+    from google.ai import generativelanguage as glm
+    return glm.GenerativeServiceClient(client_options={"api_key": api_key})
+
+
+class TokenBucket:
+    """Continuously refilling budget; may go negative when actual usage exceeds the reservation."""
+
+    def __init__(self, capacity: float, per_seconds: float, now: float):
+        self.capacity = capacity
+        self.refill_per_s = capacity / per_seconds
+        self.tokens = capacity
+        self._updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_s)
+        self._updated = now
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.tokens
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` can be taken (amount is capped at capacity)."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.refill_per_s)
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= amount
+
+    def give_back(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class KeyState:
+    def __init__(self, api_key: str, rpm: float, tpm: float, now: float):
+        self.api_key = api_key
+        self.suffix = api_key[-4:] if len(api_key) >= 4 else "?"
+        self.requests = TokenBucket(rpm, 60.0, now)
+        self.tokens = TokenBucket(tpm, 60.0, now)
+        self.client = None
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.consecutive_throttles = 0
+        self.counters: Dict[str, int] = {
+            "requests": 0,
+            "successes": 0,
+            "throttled": 0,
+            "errors": 0,
+            "tokens_used": 0,
+        }
+
+
+class KeyLease:
+    """One request's hold on a key; release it exactly once."""
+
+    def __init__(self, pool: "GeminiKeyPool", state: KeyState, reserved_tokens: int, attempt: int):
+        self._pool = pool
+        self.state = state
+        self.reserved_tokens = reserved_tokens
+        self.attempt = attempt
+        self.client = state.client
+        self._released = False
+
+    @property
+    def key_suffix(self) -> str:
+        return self.state.suffix
+
+    def release(self, response: Any = None, error: Optional[Exception] = None) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self, response, error)
+
+    def record_usage(self, response: Any) -> None:
+        """Settle the TPM reservation against real usage (e.g. once a stream has finished)."""
+        self._pool._settle_tokens(self, response_total_tokens(response))
+
+
+class GeminiKeyPool:
+    """
+    Thread-safe scheduler over several Gemini API keys.
+
+    Each key has its own client (no global ``genai.configure``), token buckets for
+    requests/minute and tokens/minute, and a cooldown window after a 429. A
+    request takes the least-loaded key that has budget, waiting up to
+    ``max_wait_s`` for one to free up instead of spending a call on a 429.
+    """
+
+    def __init__(
+        self,
+        api_keys: Iterable[str],
+        rpm: float = KEY_RPM,
+        tpm: float = KEY_TPM,
+        max_wait_s: float = KEY_MAX_WAIT_S,
+        client_factory: Callable[[str], Any] = _default_client_factory,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self._clock = clock
+        self._sleep = sleep
+        self._client_factory = client_factory
+        self.max_wait_s = max_wait_s
+        now = clock()
+        self._keys: List[KeyState] = [KeyState(key, rpm, tpm, now) for key in api_keys]
+        if not self._keys:
+            raise ValueError("GeminiKeyPool needs at least one API key")
+        self._lock = threading.Lock()
+        self._pool_counters: Dict[str, int] = {"local_waits": 0, "exhausted": 0}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def acquire(self, estimated_tokens: int, exclude: Iterable[str] = (), attempt: int = 0) -> KeyLease:
+        """
+        Reserve the least-loaded key with RPM/TPM budget and no active cooldown.
+
+        Raises ResourceExhausted if no key (other than ``exclude``) frees up within
+        ``max_wait_s``.
+        """
+        excluded = set(exclude)
+        deadline = self._clock() + self.max_wait_s
+        while True:
+            with self._lock:
+                now = self._clock()
+                candidates = [s for s in self._keys if s.api_key not in excluded]
+                ready = [s for s in candidates if self._wait_time(s, estimated_tokens, now) == 0.0]
+                if ready:
+                    state = min(
+                        ready,
+                        key=lambda s: (s.in_flight, -s.requests.available(now) / s.requests.capacity)
+                    )
+                    state.requests.take(1, now)
+                    state.tokens.take(estimated_tokens, now)
+                    state.in_flight += 1
+                    state.counters["requests"] += 1
+                    if state.client is None:
+                        state.client = self._client_factory(state.api_key)
+                    return KeyLease(self, state, estimated_tokens, attempt)
+
+                wait = min((self._wait_time(s, estimated_tokens, now) for s in candidates), default=None)
+                if wait is None or now + wait > deadline:
+                    self._pool_counters["exhausted"] += 1
+                    raise ResourceExhausted("Gemini API rate limit exceeded for all keys")
+                self._pool_counters["local_waits"] += 1
+            self._sleep(wait)
+
+    def _wait_time(self, state: KeyState, estimated_tokens: int, now: float) -> float:
+        return max(
+            state.cooldown_until - now,
+            state.requests.wait_time(1, now),
+            state.tokens.wait_time(estimated_tokens, now),
+            0.0
+        )
+
+    def _release(self, lease: KeyLease, response: Any, error: Optional[Exception]) -> None:
+        state = lease.state
+        with self._lock:
+            now = self._clock()
+            state.in_flight = max(0, state.in_flight - 1)
+            if error is None:
+                state.counters["successes"] += 1
+                state.consecutive_throttles = 0
+            elif isinstance(error, ResourceExhausted):
+                state.counters["throttled"] += 1
+                state.consecutive_throttles += 1
+                delay = parse_retry_delay(error)
+                if delay is None:
+                    delay = min(
+                        KEY_MAX_COOLDOWN_S,
+                        KEY_COOLDOWN_S * 2 ** (state.consecutive_throttles - 1)
+                    )
+                state.cooldown_until = max(state.cooldown_until, now + delay)
+                # The rejected call did not spend its token reservation
+                state.tokens.give_back(lease.reserved_tokens, now)
+            else:
+                state.counters["errors"] += 1
+        if error is None and response is not None:
+            self._settle_tokens(lease, response_total_tokens(response))
+
+    def _settle_tokens(self, lease: KeyLease, actual_tokens: Optional[int]) -> None:
+        if actual_tokens is None:
+            return
+        state = lease.state
+        with self._lock:
+            now = self._clock()
+            state.counters["tokens_used"] += actual_tokens
+            difference = actual_tokens - lease.reserved_tokens
+            if difference > 0:
+                state.tokens.take(difference, now)
+            elif difference < 0:
+                state.tokens.give_back(-difference, now)
+            lease.reserved_tokens = actual_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-key usage, remaining budget and throttle counters (keys shown by suffix)."""
+        with self._lock:
+            now = self._clock()
+            keys = [
+                {
+                    "key": f"...{s.suffix}",
+                    "in_flight": s.in_flight,
+                    "rpm_available": round(s.requests.available(now), 2),
+                    "tpm_available": round(s.tokens.available(now)),
+                    "cooldown_remaining_s": round(max(0.0, s.cooldown_until - now), 1),
+                    **s.counters,
+                }
+                for s in self._keys
+            ]
+            return {"keys": keys, **self._pool_counters}
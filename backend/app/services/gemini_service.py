@@ -1,23 +1,102 @@
 import json
 import os
+import threading
 import time
 import google.generativeai as genai
-from typing import List, Dict, Optional, AsyncGenerator, Iterator
+from typing import Any, Callable, List, Dict, Optional, Iterator, Tuple
 from dotenv import load_dotenv
 from google.api_core.exceptions import ResourceExhausted
+from app.services.gemini_key_pool import GeminiKeyPool, KeyLease, estimate_tokens
+from app.services.llm_telemetry import LLMAttempt, get_llm_telemetry, usage_counts
 
 load_dotenv()
 
-_LOG_PATH = r"d:\AI_talk\.cursor\debug.log"
+MEMORY_CATEGORIES = ["personal_info", "preference", "fact", "relationship", "goal", "other"]
+MEMORY_TYPES = ["fact", "preference", "goal", "relationship", "constraint"]
+
+# Response schemas for Gemini's JSON mode (OpenAPI subset)
+MEMORY_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "content": {"type": "string"},
+        "importance_score": {"type": "number"},
+        "category": {"type": "string", "enum": MEMORY_CATEGORIES},
+        "memory_type": {"type": "string", "enum": MEMORY_TYPES},
+        "stability": {"type": "number"},
+        "ttl_days": {"type": "integer"}
+    },
+    "required": ["content", "importance_score", "category", "memory_type", "stability"]
+}
+MEMORY_LIST_SCHEMA = {"type": "array", "items": MEMORY_ITEM_SCHEMA}
+_REFLECTION_PROPERTIES = {
+    "reflection": {"type": "string"},
+    "learnings": {"type": "array", "items": {"type": "string"}},
+    "questions_raised": {"type": "array", "items": {"type": "string"}}
+}
+AI_JOURNAL_SCHEMA = {
+    "type": "object",
+    "properties": _REFLECTION_PROPERTIES,
+    "required": ["reflection", "learnings", "questions_raised"]
+}
+TURN_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {"memories": MEMORY_LIST_SCHEMA, **_REFLECTION_PROPERTIES},
+    "required": ["memories", "reflection", "learnings", "questions_raised"]
+}
+
+_MEMORY_INSTRUCTIONS = """For each important piece of information, provide:
+1. The memory content (what to remember)
+2. Importance score (0.0 to 1.0, where 1.0 is very important)
+3. Category (one of: personal_info, preference, fact, relationship, goal, other)
+4. Memory type (one of: fact, preference, goal, relationship, constraint)
+5. Stability score (0.0 to 1.0, where 1.0 means stable/long-term)
+6. TTL in days (optional; if unsure, omit or set to 0)
+
+Only extract truly important information. Skip greetings, small talk, or trivial details.
+If nothing important, return an empty list."""
+
+_REFLECTION_INSTRUCTIONS = """Provide:
+- reflection: your honest reflection on the conversation - what went well, what could be improved, how you felt about it
+- learnings: key learnings
+- questions_raised: questions you asked
+
+Be honest and thoughtful. If you challenged the user or asked clarifying questions, mention that."""
+
+
+class ResponseStream:
+    """Text chunks of a streaming Gemini response; cancel() may be called from another thread."""
+
+    def __init__(self, response, on_complete: Optional[Callable[[object], None]] = None):
+        self._response = response
+        self._on_complete = on_complete
+        self._cancelled = threading.Event()
+
+    def __iter__(self) -> Iterator[str]:
+        for chunk in self._response:
+            if self._cancelled.is_set():
+                return
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk without text parts (e.g. finish/safety metadata only)
+                continue
+            if text:
+                yield text
+        if self._on_complete is not None:
+            # Usage metadata is final once the last chunk has arrived
+            self._on_complete(self._response)
+
+    def cancel(self) -> None:
+        """Stop consuming and cancel the upstream gRPC stream so generation stops."""
+        self._cancelled.set()
+        upstream = getattr(self._response, "_iterator", None)
+        cancel = getattr(upstream, "cancel", None)
+        if callable(cancel):
+            try:
+                cancel()
+            except Exception:
+                pass
 
-def _dbg(loc: str, msg: str, data: dict, hid: str) -> None:
-    # #region agent log
-    try:
-        with open(_LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(json.dumps({"timestamp": int(time.time() * 1000), "location": loc, "message": msg, "data": data, "sessionId": "debug-session", "hypothesisId": hid}, ensure_ascii=False) + "\n")
-    except Exception:
-        pass
-    # #endregion
 
 class GeminiService:
     def __init__(self):
@@ -25,76 +104,108 @@ class GeminiService:
         self.api_keys = [key.strip() for key in keys_env.split(",") if key.strip()]
         if not self.api_keys:
             raise ValueError("GEMINI_API_KEYS must be set in environment variables")
-        self.key_index = 0
+        self.key_pool = GeminiKeyPool(self.api_keys)
         self.model_name = "gemini-2.5-flash"
 
-    def _configure_client(self, api_key: str) -> None:
-        genai.configure(api_key=api_key)
+    def _model_for(self, lease: KeyLease):
+        model = genai.GenerativeModel(self.model_name)
+        # Bind the leased key's own client instead of the process-wide genai.configure() state
+        model._client = lease.client
+        return model
 
-    def _rotate_key(self) -> str:
-        self.key_index = (self.key_index + 1) % len(self.api_keys)
-        return self.api_keys[self.key_index]
+    def _record_attempt(
+        self,
+        operation: str,
+        lease: Optional[KeyLease],
+        attempt: int,
+        outcome: str,
+        started: float,
+        stream: bool,
+        error: Optional[Exception] = None,
+        response=None
+    ) -> None:
+        get_llm_telemetry().record(LLMAttempt(
+            ts=time.time(),
+            operation=operation,
+            key=f"...{lease.key_suffix}" if lease else "-",
+            attempt=attempt,
+            outcome=outcome,
+            latency_ms=round((time.perf_counter() - started) * 1000, 1),
+            stream=stream,
+            error_class=type(error).__name__ if error else None,
+            error=str(error)[:200] if error else None,
+            **usage_counts(response)
+        ))
+
+    def _generate(
+        self,
+        prompt: str,
+        stream: bool = False,
+        operation: str = "generate",
+        generation_config: Optional[genai.GenerationConfig] = None
+    ) -> Tuple[object, KeyLease]:
+        """
+        Run one generate_content call on a pooled key, moving to another key on 429.
 
-    def _generate_content_with_retry(self, prompt: str, stream: bool = False):
-        attempts = len(self.api_keys)
+        The lease is already released when this returns; for streams the caller
+        settles token usage via ``lease.record_usage`` once the stream completes.
+        Every attempt is recorded in the LLM telemetry buffer.
+        """
+        estimated_tokens = estimate_tokens(prompt)
+        tried: List[str] = []
         last_error: Optional[Exception] = None
-        for attempt in range(attempts):
-            api_key = self.api_keys[self.key_index]
-            self._configure_client(api_key)
-            # #region agent log
-            _dbg("gemini_service._generate_content_with_retry:loop", "attempt_start", {"attempt": attempt, "key_index": self.key_index, "num_keys": len(self.api_keys), "key_suffix": api_key[-4:] if len(api_key) >= 4 else "?"}, "H2")
-            _dbg("gemini_service._generate_content_with_retry:loop", "num_keys_check", {"attempts": attempts}, "H3")
-            # #endregion
-            model = genai.GenerativeModel(self.model_name)
+        for attempt in range(len(self.key_pool)):
+            started = time.perf_counter()
+            try:
+                lease = self.key_pool.acquire(estimated_tokens, exclude=tried, attempt=attempt)
+            except ResourceExhausted as e:
+                self._record_attempt(operation, None, attempt, "pool_exhausted", started, stream, e)
+                raise last_error or e
+            tried.append(lease.state.api_key)
+            model = self._model_for(lease)
             try:
-                out = model.generate_content(prompt, stream=stream)
-                # #region agent log
-                _dbg("gemini_service._generate_content_with_retry:success", "generate_content_ok", {"attempt": attempt}, "H1")
-                # #endregion
-                return out
+                out = model.generate_content(prompt, stream=stream, generation_config=generation_config)
             except ResourceExhausted as e:
                 last_error = e
-                # #region agent log
-                _dbg("gemini_service._generate_content_with_retry:catch", "ResourceExhausted_caught", {"attempt": attempt, "key_index_before_rotate": self.key_index, "err": str(e)[:200]}, "H1")
-                # #endregion
-                self._rotate_key()
-                # #region agent log
-                _dbg("gemini_service._generate_content_with_retry:after_rotate", "key_rotated", {"key_index_after": self.key_index}, "H2")
-                # #endregion
+                lease.release(error=e)
+                self._record_attempt(operation, lease, attempt, "throttled", started, stream, e)
                 continue
             except Exception as e:
-                last_error = e
-                # #region agent log
-                _dbg("gemini_service._generate_content_with_retry:catch_other", "non_ResourceExhausted", {"attempt": attempt, "etype": type(e).__name__, "err": str(e)[:200], "has_429": "429" in str(e), "has_exhausted": "exhausted" in str(e).lower() or "resource" in str(e).lower()}, "H4")
-                # #endregion
+                lease.release(error=e)
+                self._record_attempt(operation, lease, attempt, "error", started, stream, e)
                 raise
-        if last_error:
-            # #region agent log
-            _dbg("gemini_service._generate_content_with_retry:raise", "raising_last_error", {"etype": type(last_error).__name__}, "H1")
-            # #endregion
-            raise last_error
-        # #region agent log
-        _dbg("gemini_service._generate_content_with_retry:raise", "raising_all_keys_exhausted", {}, "H3")
-        # #endregion
-        raise ResourceExhausted("Gemini API rate limit exceeded for all keys")
+            lease.release(response=None if stream else out)
+            # For streams this is time to first chunk; token counts come with "stream_done"
+            self._record_attempt(operation, lease, attempt, "ok", started, stream, response=None if stream else out)
+            return out, lease
+        raise last_error or ResourceExhausted("Gemini API rate limit exceeded for all keys")
+
+    def _stream_completion_callback(self, operation: str, lease: KeyLease) -> Callable[[object], None]:
+        started = time.perf_counter()
+
+        def on_complete(response) -> None:
+            lease.record_usage(response)
+            self._record_attempt(operation, lease, lease.attempt, "stream_done", started, True, response=response)
+
+        return on_complete
+
+    def _generate_content_with_retry(
+        self,
+        prompt: str,
+        stream: bool = False,
+        operation: str = "generate",
+        generation_config: Optional[genai.GenerationConfig] = None
+    ):
+        out, _ = self._generate(prompt, stream=stream, operation=operation, generation_config=generation_config)
+        return out
     
-    def generate_response(
+    def _build_chat_prompt(
         self,
         user_message: str,
         system_prompt: str,
         conversation_history: Optional[List[Dict[str, str]]] = None,
         memories: Optional[List[str]] = None
     ) -> str:
-        """
-        Generate response from Gemini
-        
-        Args:
-            user_message: Current user message
-            system_prompt: System prompt with Tymon personality
-            conversation_history: Previous messages in format [{"role": "user", "content": "..."}, ...]
-            memories: List of relevant memories as strings
-        """
-        # Build full prompt
         full_prompt = system_prompt
         
         # Add memories if available
@@ -114,100 +225,97 @@ class GeminiService:
         
         # Add current message
         full_prompt += f"\n\n=== Current Message ===\nUser: {user_message}\n\nTymon:"
+        return full_prompt
+    
+    def generate_response(
+        self,
+        user_message: str,
+        system_prompt: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        memories: Optional[List[str]] = None
+    ) -> str:
+        """
+        Generate response from Gemini
+        
+        Args:
+            user_message: Current user message
+            system_prompt: System prompt with Tymon personality
+            conversation_history: Previous messages in format [{"role": "user", "content": "..."}, ...]
+            memories: List of relevant memories as strings
+        """
+        full_prompt = self._build_chat_prompt(user_message, system_prompt, conversation_history, memories)
         
         try:
-            response = self._generate_content_with_retry(full_prompt)
+            response = self._generate_content_with_retry(full_prompt, operation="chat")
             return response.text
         except ResourceExhausted as e:
             raise e
         except Exception as e:
             raise Exception(f"Gemini API error: {str(e)}")
     
+    def open_response_stream(
+        self,
+        user_message: str,
+        system_prompt: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        memories: Optional[List[str]] = None
+    ) -> "ResponseStream":
+        """
+        Start a streaming response from Gemini (blocks until the first chunk arrives)
+        """
+        full_prompt = self._build_chat_prompt(user_message, system_prompt, conversation_history, memories)
+        
+        try:
+            response, lease = self._generate(full_prompt, stream=True, operation="chat_stream")
+            return ResponseStream(response, on_complete=self._stream_completion_callback("chat_stream", lease))
+        except ResourceExhausted as e:
+            raise e
+        except Exception as e:
+            raise Exception(f"Gemini API error: {str(e)}")
+    
     def generate_streaming_response(
         self,
         user_message: str,
         system_prompt: str,
         conversation_history: Optional[List[Dict[str, str]]] = None,
         memories: Optional[List[str]] = None
-    ) -> AsyncGenerator[str, None]:
+    ) -> Iterator[str]:
         """
         Generate streaming response from Gemini
         """
-        # Build full prompt (same as generate_response)
-        full_prompt = system_prompt
-        
-        if memories:
-            memory_context = "\n\n=== Relevant Memories ===\n"
-            for i, memory in enumerate(memories, 1):
-                memory_context += f"{i}. {memory}\n"
-            full_prompt += memory_context
-        
-        if conversation_history:
-            full_prompt += "\n\n=== Conversation History ===\n"
-            for msg in conversation_history[-10:]:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                full_prompt += f"{role.capitalize()}: {content}\n"
-        
-        full_prompt += f"\n\n=== Current Message ===\nUser: {user_message}\n\nTymon:"
-        
+        stream = self.open_response_stream(user_message, system_prompt, conversation_history, memories)
         try:
-            response = self._generate_content_with_retry(full_prompt, stream=True)
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
+            yield from stream
         except ResourceExhausted as e:
             raise e
         except Exception as e:
             raise Exception(f"Gemini API error: {str(e)}")
     
-    def extract_memories(self, conversation: str) -> List[Dict[str, str]]:
+    def _generate_json(self, prompt: str, schema: Dict[str, Any], operation: str) -> Any:
+        """Generate with Gemini's JSON mode constrained to ``schema`` and return the parsed value"""
+        config = genai.GenerationConfig(response_mime_type="application/json", response_schema=schema)
+        response = self._generate_content_with_retry(prompt, operation=operation, generation_config=config)
+        return json.loads(response.text)
+    
+    def extract_memories(self, conversation: str, strict: bool = False) -> List[Dict[str, str]]:
         """
         Extract potential memories from conversation using Gemini
         Returns list of dicts with 'content' and 'importance_score'
+        (errors are logged and give [] unless ``strict``, which re-raises them)
         """
         prompt = f"""Analyze the following conversation and extract important information that should be remembered long-term.
 
 Conversation:
 {conversation}
 
-For each important piece of information, provide:
-1. The memory content (what to remember)
-2. Importance score (0.0 to 1.0, where 1.0 is very important)
-3. Category (one of: personal_info, preference, fact, relationship, goal, other)
-4. Memory type (one of: fact, preference, goal, relationship, constraint)
-5. Stability score (0.0 to 1.0, where 1.0 means stable/long-term)
-6. TTL in days (optional; if unsure, omit or set to 0)
-
-Format as JSON array:
-[
-  {{
-    "content": "memory text",
-    "importance_score": 0.8,
-    "category": "preference",
-    "memory_type": "preference",
-    "stability": 0.7,
-    "ttl_days": 180
-  }}
-]
-
-Only extract truly important information. Skip greetings, small talk, or trivial details.
-If nothing important, return empty array: []
+{_MEMORY_INSTRUCTIONS}
 """
         try:
-            response = self._generate_content_with_retry(prompt)
-            import json
-            # Try to parse JSON from response
-            text = response.text.strip()
-            # Remove markdown code blocks if present
-            if text.startswith("```"):
-                text = text.split("```")[1]
-                if text.startswith("json"):
-                    text = text[4:]
-            text = text.strip()
-            memories = json.loads(text)
+            memories = self._generate_json(prompt, MEMORY_LIST_SCHEMA, "extract_memories")
             return memories if isinstance(memories, list) else []
         except Exception as e:
+            if strict:
+                raise
             print(f"Error extracting memories: {e}")
             return []
     
@@ -229,26 +337,10 @@ Tymon: {ai_response}
 Full conversation context:
 {conversation}
 
-Provide a self-reflection in JSON format:
-{{
-  "reflection": "Your honest reflection on the conversation - what went well, what could be improved, how you felt about it",
-  "learnings": ["key learning 1", "key learning 2", ...],
-  "questions_raised": ["question you asked 1", "question you asked 2", ...]
-}}
-
-Be honest and thoughtful. If you challenged the user or asked clarifying questions, mention that.
+{_REFLECTION_INSTRUCTIONS}
 """
         try:
-            response = self._generate_content_with_retry(prompt)
-            import json
-            text = response.text.strip()
-            if text.startswith("```"):
-                text = text.split("```")[1]
-                if text.startswith("json"):
-                    text = text[4:]
-            text = text.strip()
-            journal = json.loads(text)
-            return journal
+            return _normalize_reflection(self._generate_json(prompt, AI_JOURNAL_SCHEMA, "ai_journal"))
         except Exception as e:
             print(f"Error generating AI journal: {e}")
             return {
@@ -256,6 +348,52 @@ Be honest and thoughtful. If you challenged the user or asked clarifying questio
                 "learnings": [],
                 "questions_raised": []
             }
+    
+    def analyze_turn(
+        self,
+        conversation: str,
+        user_message: str,
+        ai_response: str
+    ) -> Dict[str, Any]:
+        """
+        Extract memories and write Tymon's reflection for one chat turn in a single call
+        
+        Returns a dict with ``memories`` (same shape as extract_memories) plus
+        ``reflection``, ``learnings`` and ``questions_raised``. API errors are raised
+        so the background job can retry.
+        """
+        prompt = f"""You are Tymon, an AI assistant. Analyze this conversation turn and do two things.
+
+Full conversation context:
+{conversation}
+
+Latest exchange:
+User: {user_message}
+Tymon: {ai_response}
+
+1. Memories: extract important information about the user that should be remembered long-term.
+{_MEMORY_INSTRUCTIONS}
+
+2. Reflection: reflect on the conversation as Tymon.
+{_REFLECTION_INSTRUCTIONS}
+"""
+        analysis = self._generate_json(prompt, TURN_ANALYSIS_SCHEMA, "analyze_turn")
+        memories = analysis.get("memories") if isinstance(analysis, dict) else None
+        return {
+            "memories": memories if isinstance(memories, list) else [],
+            **_normalize_reflection(analysis if isinstance(analysis, dict) else {})
+        }
+
+
+def _normalize_reflection(data: Dict[str, Any]) -> Dict[str, Any]:
+    def strings(value) -> List[str]:
+        return [str(item) for item in value] if isinstance(value, list) else []
+
+    return {
+        "reflection": str(data.get("reflection") or ""),
+        "learnings": strings(data.get("learnings")),
+        "questions_raised": strings(data.get("questions_raised"))
+    }
 
 
 # Singleton instance
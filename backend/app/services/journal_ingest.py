@@ -0,0 +1,50 @@
+"""
+Memory extraction for user journal entries.
+
+Runs on the background work queue so POST and PUT /api/journal/user... return
+as soon as the entry is stored; an edit only extracts new or changed paragraphs.
+Progress is tracked on the journal row (extraction_status) and served by
+GET /api/journal/user/entry/{id}/extraction. Deleting an entry queues the
+retirement of the memories only it linked to.
+"""
+
+from typing import Any, Dict, List
+
+from app.services.journal_service import get_journal_service
+from app.services.work_queue import WorkQueue, get_work_queue
+
+EXTRACT_JOURNAL_JOB = "journal.extract_memories"
+RETIRE_JOURNAL_MEMORIES_JOB = "journal.retire_memories"
+
+
+def extract_journal_memories(payload: Dict[str, Any]) -> None:
+    """Extract the memories of one new or edited journal entry (skipped if it was deleted meanwhile)."""
+    journal_service = get_journal_service()
+    journal = journal_service.get_user_journal(payload["journal_id"], payload["user_id"])
+    if not journal:
+        return
+    journal_service.extract_journal_memories(journal)
+
+
+def retire_journal_memories(payload: Dict[str, Any]) -> None:
+    """Downweight the memories of a deleted journal entry that no other entry links to."""
+    get_journal_service().retire_journal_memories(payload["user_id"], payload["memory_ids"])
+
+
+def register_journal_handlers(queue: WorkQueue) -> None:
+    queue.register(EXTRACT_JOURNAL_JOB, extract_journal_memories)
+    queue.register(RETIRE_JOURNAL_MEMORIES_JOB, retire_journal_memories)
+
+
+async def enqueue_journal_extraction(user_id: str, journal_id: str) -> None:
+    """Queue memory extraction for a created or updated journal entry."""
+    queue = get_work_queue()
+    register_journal_handlers(queue)
+    await queue.enqueue(EXTRACT_JOURNAL_JOB, user_id, {"user_id": user_id, "journal_id": journal_id})
+
+
+async def enqueue_journal_retirement(user_id: str, memory_ids: List[str]) -> None:
+    """Queue retirement of the memories of a deleted journal entry."""
+    queue = get_work_queue()
+    register_journal_handlers(queue)
+    await queue.enqueue(RETIRE_JOURNAL_MEMORIES_JOB, user_id, {"user_id": user_id, "memory_ids": memory_ids})
@@ -1,17 +1,42 @@
-from typing import List, Optional
-from datetime import datetime
+from collections import Counter
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type
+import os
+from datetime import datetime, timezone
+from app.repositories.journal_repository import (
+    JOURNAL_KEY,
+    AIJournalRepository,
+    UserJournalRepository,
+    filter_tags
+)
 from app.services.supabase_service import get_supabase_client
-from app.models.journal import UserJournal, UserJournalCreate, AIJournal, AIJournalCreate
+from app.models.journal import (
+    AIJournalCreate,
+    AIJournalRecord,
+    JournalExtractionStatus,
+    JournalSearchPage,
+    TagCount,
+    UserJournalCreate,
+    UserJournalRecord
+)
+from app.models.records import Record
 from app.services.memory_service import get_memory_service
+from app.utils.chunking import pack_paragraphs, paragraph_hash, split_paragraphs
+from app.utils.pagination import decode_cursor, keyset_page, keyset_query
+
+# Max characters per extraction chunk (entries are split at paragraph boundaries)
+JOURNAL_CHUNK_CHARS = int(os.getenv("JOURNAL_CHUNK_CHARS", "4000"))
 
 
 class JournalService:
     def __init__(self):
         self.supabase = get_supabase_client()
+        self.user_journals = UserJournalRepository()
+        self.ai_journals = AIJournalRepository()
     
     # User Journal methods
-    def create_user_journal(self, journal_data: UserJournalCreate) -> UserJournal:
-        """Create a new user journal entry"""
+    def create_user_journal(self, journal_data: UserJournalCreate) -> UserJournalRecord:
+        """Create a new user journal entry and extract its memories inline (background jobs and tests)"""
         data = {
             "user_id": journal_data.user_id,
             "content": journal_data.content,
@@ -21,47 +46,237 @@ class JournalService:
         
         result = self.supabase.table("user_journals").insert(data).execute()
         if result.data:
-            journal = UserJournal(**result.data[0])
+            journal = UserJournalRecord(result.data[0])
             try:
-                memory_service = get_memory_service()
-                journal_text = f"User journal entry:\n{journal_data.content}"
-                memory_service.extract_and_store_memories(
-                    journal_data.user_id,
-                    journal_text,
-                    source="journal"
-                )
+                self.extract_journal_memories(journal)
             except Exception as e:
                 print(f"Error extracting memories from journal: {e}")
             return journal
         raise Exception("Failed to create user journal")
     
+    async def create_user_journal_async(self, journal_data: UserJournalCreate) -> UserJournalRecord:
+        """
+        Store a new user journal entry. Memory extraction is not done here: the
+        caller queues it (app.services.journal_ingest) and the entry is 'pending'.
+        """
+        data = {
+            "user_id": journal_data.user_id,
+            "content": journal_data.content,
+            "tags": journal_data.tags or [],
+            "created_at": datetime.now().isoformat()
+        }
+        
+        row = await self.user_journals.insert(data)
+        if not row:
+            raise Exception("Failed to create user journal")
+        return UserJournalRecord(row)
+    
+    def extract_journal_memories(self, journal: UserJournalRecord) -> Dict[str, int]:
+        """
+        Extract and store the memories of a new or edited journal entry,
+        tracking progress in its extraction_* columns.
+
+        Only paragraphs whose hash is not in ``paragraph_hashes`` (the version
+        extracted last time) are sent to Gemini, packed into chunks of up to
+        JOURNAL_CHUNK_CHARS that are extracted concurrently. Memories created
+        by a journal are linked to the paragraphs they came from; those left
+        without a link once their paragraphs are removed are downweighted.
+        Memories that deduped into one learned elsewhere (e.g. from chat) are
+        never linked, so never downweighted.
+        """
+        paragraphs: Dict[str, str] = {}
+        for paragraph in split_paragraphs(journal.content):
+            paragraphs.setdefault(paragraph_hash(paragraph), paragraph)
+        previous = set(journal.paragraph_hashes or [])
+        added = [h for h in paragraphs if h not in previous]
+        removed = sorted(previous - paragraphs.keys())
+
+        self.set_extraction_status(journal.id, "processing")
+        try:
+            memory_service = get_memory_service()
+            packed = pack_paragraphs([paragraphs[h] for h in added], JOURNAL_CHUNK_CHARS)
+            memories = []
+            if packed:
+                extracted = memory_service.extract_from_chunks([chunk for chunk, _ in packed])
+                stored = memory_service.store_journal_memories(journal.user_id, extracted)
+                memories = [memory for memory, _ in stored]
+                # A merge keeps "journal" as the source, so only links prove journal provenance
+                linked = self._linked({memory.id for memory, provenance in stored if provenance == "journal"}) or set()
+                self._link_memories(journal, [
+                    (memory.id, added[index])
+                    for mem, (memory, provenance) in zip(extracted, stored)
+                    if provenance is None or memory.id in linked
+                    for chunk in mem.get("chunks", range(len(packed)))
+                    for index in packed[chunk][1]
+                ])
+            orphaned = self._unlink_paragraphs(journal, removed)
+            downweighted = memory_service.downweight_memories(journal.user_id, orphaned) if orphaned else 0
+        except Exception as e:
+            self.set_extraction_status(journal.id, "failed", extraction_error=str(e)[:500])
+            raise
+        stats = {
+            "chunks": len(packed),
+            "memories": len(memories),
+            "paragraphs_extracted": len(added),
+            "paragraphs_removed": len(removed),
+            "downweighted": downweighted
+        }
+        self.set_extraction_status(
+            journal.id,
+            "done",
+            extraction_chunks=stats["chunks"],
+            extracted_memories=stats["memories"],
+            extraction_error=None,
+            paragraph_hashes=list(paragraphs)
+        )
+        return stats
+    
+    def _link_memories(self, journal: UserJournalRecord, links: List[Tuple[str, str]]) -> None:
+        """Record which paragraphs (hashes) the memories of a journal came from (best effort)"""
+        rows = [
+            {"journal_id": journal.id, "memory_id": memory_id, "paragraph_hash": digest, "user_id": journal.user_id}
+            for memory_id, digest in dict.fromkeys(links)
+        ]
+        if not rows:
+            return
+        try:
+            self.supabase.table("journal_memory_links")\
+                .upsert(rows, on_conflict="journal_id,paragraph_hash,memory_id", ignore_duplicates=True)\
+                .execute()
+        except Exception as e:
+            print(f"Could not link journal memories: {e} - run supabase_migration_journal_memory_links.sql")
+    
+    def _unlink_paragraphs(self, journal: UserJournalRecord, hashes: List[str]) -> List[str]:
+        """
+        Drop the links of removed paragraphs; returns the memories that no
+        longer come from any journal paragraph (best effort)
+        """
+        if not hashes:
+            return []
+        try:
+            result = self.supabase.table("journal_memory_links")\
+                .delete()\
+                .eq("journal_id", journal.id)\
+                .in_("paragraph_hash", hashes)\
+                .execute()
+        except Exception as e:
+            print(f"Could not unlink journal memories: {e} - run supabase_migration_journal_memory_links.sql")
+            return []
+        return self._orphaned(sorted({row["memory_id"] for row in result.data or []}))
+    
+    def _linked(self, memory_ids: Iterable[str]) -> Optional[Set[str]]:
+        """The given memories that some journal paragraph links to (None if that cannot be read)"""
+        memory_ids = sorted(memory_ids)
+        if not memory_ids:
+            return set()
+        try:
+            result = self.supabase.table("journal_memory_links")\
+                .select("memory_id")\
+                .in_("memory_id", memory_ids)\
+                .execute()
+        except Exception as e:
+            print(f"Could not read journal memory links: {e} - run supabase_migration_journal_memory_links.sql")
+            return None
+        return {row["memory_id"] for row in result.data or []}
+    
+    def _orphaned(self, memory_ids: List[str]) -> List[str]:
+        """The given memories that no journal paragraph links to anymore (best effort)"""
+        still_linked = self._linked(memory_ids)
+        if still_linked is None:
+            return []
+        return [memory_id for memory_id in memory_ids if memory_id not in still_linked]
+    
+    def retire_journal_memories(self, user_id: str, memory_ids: List[str]) -> int:
+        """
+        Downweight the memories of a deleted journal entry (its ``memory_ids``,
+        read before the delete cascaded its links) that no other entry links to
+        """
+        orphaned = self._orphaned(memory_ids)
+        return get_memory_service().downweight_memories(user_id, orphaned) if orphaned else 0
+    
+    def get_journal_memory_ids(self, journal_id: str) -> List[str]:
+        """Memories extracted from a journal entry (best effort)"""
+        try:
+            result = self.supabase.table("journal_memory_links")\
+                .select("memory_id")\
+                .eq("journal_id", journal_id)\
+                .execute()
+        except Exception as e:
+            print(f"Could not read journal memory links: {e} - run supabase_migration_journal_memory_links.sql")
+            return []
+        return sorted({row["memory_id"] for row in result.data or []})
+    
+    async def get_journal_memory_ids_async(self, journal_id: str) -> List[str]:
+        """Async variant of get_journal_memory_ids"""
+        try:
+            return await self.user_journals.linked_memory_ids(journal_id)
+        except Exception as e:
+            print(f"Could not read journal memory links: {e} - run supabase_migration_journal_memory_links.sql")
+            return []
+    
+    def set_extraction_status(self, journal_id: str, status: str, **fields: Any) -> None:
+        """Record extraction progress on the journal row (best effort)"""
+        updates = {
+            "extraction_status": status,
+            "extraction_updated_at": datetime.now(timezone.utc).isoformat(),
+            **fields
+        }
+        try:
+            self.supabase.table("user_journals").update(updates).eq("id", journal_id).execute()
+        except Exception as e:
+            print(
+                f"Could not record journal extraction status: {e} - run "
+                "supabase_migration_journal_extraction.sql and supabase_migration_journal_memory_links.sql"
+            )
+    
+    async def get_extraction_status_async(self, journal_id: str, user_id: str) -> Optional[JournalExtractionStatus]:
+        """Extraction progress of one journal entry (None if there is no such entry)"""
+        row = await self.user_journals.get(journal_id, user_id)
+        if not row:
+            return None
+        return JournalExtractionStatus(
+            journal_id=row["id"],
+            status=row.get("extraction_status") or "unknown",
+            chunks=row.get("extraction_chunks"),
+            memories=row.get("extracted_memories"),
+            error=row.get("extraction_error"),
+            updated_at=row.get("extraction_updated_at")
+        )
+    
     def get_user_journals(
         self,
         user_id: str,
         limit: int = 50,
         offset: int = 0,
-        tags: Optional[List[str]] = None
-    ) -> List[UserJournal]:
-        """Get user journals with optional tag filtering"""
+        tags: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+        tag_mode: str = "all"
+    ) -> Tuple[List[UserJournalRecord], Optional[str]]:
+        """
+        One page of user journals, newest first, and the next page's cursor.
+        Tag filtering keeps journals with all (tag_mode="all") or any of the tags.
+        """
         query = self.supabase.table("user_journals")\
             .select("*")\
-            .eq("user_id", user_id)\
-            .order("created_at", desc=True)\
-            .range(offset, offset + limit - 1)
-        
-        if tags:
-            # Filter by tags (Supabase array contains)
-            for tag in tags:
-                query = query.contains("tags", [tag])
-        
-        result = query.execute()
-        
-        if not result.data:
-            return []
-        
-        return [UserJournal(**journal) for journal in result.data]
+            .eq("user_id", user_id)
+        query = filter_tags(query, tags, tag_mode)
+        result = keyset_query(query, JOURNAL_KEY, limit, offset, _after(cursor)).execute()
+        return _journal_page(UserJournalRecord, result.data or [], limit)
     
-    def get_user_journal(self, journal_id: str, user_id: str) -> Optional[UserJournal]:
+    async def get_user_journals_async(
+        self,
+        user_id: str,
+        limit: int = 50,
+        offset: int = 0,
+        tags: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+        tag_mode: str = "all"
+    ) -> Tuple[List[UserJournalRecord], Optional[str]]:
+        """Async variant of get_user_journals"""
+        rows = await self.user_journals.list_for_user(user_id, limit, offset, tags, _after(cursor), tag_mode)
+        return _journal_page(UserJournalRecord, rows, limit)
+    
+    def get_user_journal(self, journal_id: str, user_id: str) -> Optional[UserJournalRecord]:
         """Get a specific user journal entry"""
         result = self.supabase.table("user_journals")\
             .select("*")\
@@ -70,17 +285,22 @@ class JournalService:
             .execute()
         
         if result.data:
-            return UserJournal(**result.data[0])
+            return UserJournalRecord(result.data[0])
         return None
     
+    async def get_user_journal_async(self, journal_id: str, user_id: str) -> Optional[UserJournalRecord]:
+        """Async variant of get_user_journal"""
+        row = await self.user_journals.get(journal_id, user_id)
+        return UserJournalRecord(row) if row else None
+    
     def update_user_journal(
         self,
         journal_id: str,
         user_id: str,
         content: str,
         tags: Optional[List[str]] = None
-    ) -> Optional[UserJournal]:
-        """Update a user journal entry"""
+    ) -> Optional[UserJournalRecord]:
+        """Update a user journal entry and re-extract memories of its new or changed paragraphs inline"""
         update_data = {"content": content}
         if tags is not None:
             update_data["tags"] = tags
@@ -92,41 +312,99 @@ class JournalService:
             .execute()
         
         if result.data:
-            return UserJournal(**result.data[0])
+            journal = UserJournalRecord(result.data[0])
+            try:
+                self.extract_journal_memories(journal)
+            except Exception as e:
+                print(f"Error extracting memories from journal: {e}")
+            return journal
         return None
     
+    async def update_user_journal_async(
+        self,
+        journal_id: str,
+        user_id: str,
+        content: str,
+        tags: Optional[List[str]] = None
+    ) -> Optional[UserJournalRecord]:
+        """
+        Async variant of update_user_journal; memory re-extraction is left to
+        the caller (app.services.journal_ingest), like create_user_journal_async.
+        """
+        update_data = {"content": content}
+        if tags is not None:
+            update_data["tags"] = tags
+        row = await self.user_journals.update(journal_id, user_id, update_data)
+        return UserJournalRecord(row) if row else None
+    
     def delete_user_journal(self, journal_id: str, user_id: str) -> bool:
-        """Delete a user journal entry"""
+        """Delete a user journal entry and retire the memories only it linked to"""
+        memory_ids = self.get_journal_memory_ids(journal_id)
         result = self.supabase.table("user_journals")\
             .delete()\
             .eq("id", journal_id)\
             .eq("user_id", user_id)\
             .execute()
-        return len(result.data) > 0
+        deleted = len(result.data) > 0
+        if deleted and memory_ids:
+            self.retire_journal_memories(user_id, memory_ids)
+        return deleted
+    
+    async def delete_user_journal_async(self, journal_id: str, user_id: str) -> bool:
+        """
+        Async variant of delete_user_journal without the memory retirement: read
+        get_journal_memory_ids_async before the delete and queue it (journal_ingest)
+        """
+        return await self.user_journals.delete(journal_id, user_id)
+    
+    def get_user_journal_tags(self, user_id: str) -> List[TagCount]:
+        """How many journals carry each tag, most used first"""
+        result = self.supabase.table("user_journal_tags")\
+            .select("tag, journal_count")\
+            .eq("user_id", user_id)\
+            .order("journal_count", desc=True)\
+            .order("tag")\
+            .execute()
+        return [TagCount(tag=row["tag"], count=row["journal_count"]) for row in result.data or []]
+    
+    async def get_user_journal_tags_async(self, user_id: str) -> List[TagCount]:
+        """Async variant of get_user_journal_tags (counts tags over all journals until the migration is run)"""
+        try:
+            rows = await self.user_journals.tag_counts(user_id)
+        except Exception as e:
+            print(f"user_journal_tags not available: {e} - run supabase_migration_journal_tags.sql")
+            counts = Counter(tag for tags in await self.user_journals.all_tags(user_id) for tag in set(tags))
+            ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            return [TagCount(tag=tag, count=count) for tag, count in ranked]
+        return [TagCount(tag=row["tag"], count=row["journal_count"]) for row in rows]
     
     def search_user_journals(
         self,
         user_id: str,
         search_query: str,
-        limit: int = 20
-    ) -> List[UserJournal]:
-        """Search user journals by content"""
-        # Simple text search - could be enhanced with full-text search
-        result = self.supabase.table("user_journals")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .ilike("content", f"%{search_query}%")\
-            .order("created_at", desc=True)\
-            .limit(limit)\
-            .execute()
-        
-        if not result.data:
-            return []
-        
-        return [UserJournal(**journal) for journal in result.data]
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> JournalSearchPage:
+        """Full-text search: best matches first, with highlighted snippets"""
+        result = self.supabase.rpc(
+            "search_user_journals",
+            _search_params(user_id, search_query, limit, cursor)
+        ).execute()
+        return _search_page(result.data or [], limit)
+    
+    async def search_user_journals_async(
+        self,
+        user_id: str,
+        search_query: str,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> JournalSearchPage:
+        """Async variant of search_user_journals"""
+        rows = await self.user_journals.search(_search_params(user_id, search_query, limit, cursor))
+        return _search_page(rows, limit)
     
     # AI Journal methods
-    def create_ai_journal(self, journal_data: AIJournalCreate) -> AIJournal:
+    def create_ai_journal(self, journal_data: AIJournalCreate) -> AIJournalRecord:
         """Create a new AI journal entry"""
         data = {
             "user_id": journal_data.user_id,
@@ -139,29 +417,52 @@ class JournalService:
         
         result = self.supabase.table("ai_journals").insert(data).execute()
         if result.data:
-            return AIJournal(**result.data[0])
+            return AIJournalRecord(result.data[0])
         raise Exception("Failed to create AI journal")
     
+    def create_ai_journal_from_analysis(
+        self,
+        user_id: str,
+        conversation_id: str,
+        analysis: Dict[str, Any]
+    ) -> AIJournalRecord:
+        """Store the reflection part of GeminiService.analyze_turn as an AI journal entry"""
+        return self.create_ai_journal(
+            AIJournalCreate(
+                user_id=user_id,
+                conversation_id=conversation_id,
+                reflection=analysis.get("reflection", ""),
+                learnings=analysis.get("learnings", []),
+                questions_raised=analysis.get("questions_raised", [])
+            )
+        )
+    
     def get_ai_journals(
         self,
         user_id: str,
         limit: int = 50,
-        offset: int = 0
-    ) -> List[AIJournal]:
-        """Get AI journals for a user"""
-        result = self.supabase.table("ai_journals")\
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[AIJournalRecord], Optional[str]]:
+        """One page of AI journals for a user, newest first, and the next page's cursor"""
+        query = self.supabase.table("ai_journals")\
             .select("*")\
-            .eq("user_id", user_id)\
-            .order("created_at", desc=True)\
-            .range(offset, offset + limit - 1)\
-            .execute()
-        
-        if not result.data:
-            return []
-        
-        return [AIJournal(**journal) for journal in result.data]
+            .eq("user_id", user_id)
+        result = keyset_query(query, JOURNAL_KEY, limit, offset, _after(cursor)).execute()
+        return _journal_page(AIJournalRecord, result.data or [], limit)
     
-    def get_ai_journal(self, journal_id: str, user_id: str) -> Optional[AIJournal]:
+    async def get_ai_journals_async(
+        self,
+        user_id: str,
+        limit: int = 50,
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[AIJournalRecord], Optional[str]]:
+        """Async variant of get_ai_journals"""
+        rows = await self.ai_journals.list_for_user(user_id, limit, offset, _after(cursor))
+        return _journal_page(AIJournalRecord, rows, limit)
+    
+    def get_ai_journal(self, journal_id: str, user_id: str) -> Optional[AIJournalRecord]:
         """Get a specific AI journal entry"""
         result = self.supabase.table("ai_journals")\
             .select("*")\
@@ -170,8 +471,37 @@ class JournalService:
             .execute()
         
         if result.data:
-            return AIJournal(**result.data[0])
+            return AIJournalRecord(result.data[0])
         return None
+    
+    async def get_ai_journal_async(self, journal_id: str, user_id: str) -> Optional[AIJournalRecord]:
+        """Async variant of get_ai_journal"""
+        row = await self.ai_journals.get(journal_id, user_id)
+        return AIJournalRecord(row) if row else None
+
+
+def _after(cursor: Optional[str]) -> Optional[List[Any]]:
+    """Keyset (created_at, id) from a listing cursor; an empty cursor starts at the newest"""
+    return decode_cursor(cursor, len(JOURNAL_KEY)) if cursor else None
+
+
+def _journal_page(record: Type[Record], rows: List[Dict[str, Any]], limit: int) -> Tuple[List[Any], Optional[str]]:
+    page, next_cursor = keyset_page(rows, limit, itemgetter(*JOURNAL_KEY))
+    return [record(row) for row in page], next_cursor
+
+
+def _search_params(user_id: str, search_query: str, limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    # One extra row tells whether there is a next page
+    params = {"p_user_id": user_id, "p_query": search_query, "p_limit": limit + 1}
+    if cursor:
+        rank, created_at, journal_id = decode_cursor(cursor, 3)
+        params.update(p_after_rank=rank, p_after_created_at=created_at, p_after_id=journal_id)
+    return params
+
+
+def _search_page(rows: List[Dict[str, Any]], limit: int) -> JournalSearchPage:
+    items, next_cursor = keyset_page(rows, limit, lambda row: (row["rank"], row["created_at"], row["id"]))
+    return JournalSearchPage(items=items, next_cursor=next_cursor)
 
 
 # Singleton instance
@@ -0,0 +1,180 @@
+"""
+In-memory telemetry for Gemini calls: bounded ring buffer, optional background JSONL flush
+"""
+
+import json
+import os
+import threading
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from app.utils.metrics import percentile
+
+LLM_TELEMETRY_BUFFER = int(os.getenv("LLM_TELEMETRY_BUFFER", "2000"))
+# Optional JSONL file the background flusher appends to (unset = memory only)
+LLM_TELEMETRY_PATH = os.getenv("LLM_TELEMETRY_PATH", "")
+LLM_TELEMETRY_FLUSH_S = float(os.getenv("LLM_TELEMETRY_FLUSH_S", "5"))
+
+
+@dataclass
+class LLMAttempt:
+    ts: float
+    operation: str
+    key: str
+    attempt: int
+    outcome: str  # ok | throttled | error | pool_exhausted | stream_done
+    latency_ms: float
+    stream: bool = False
+    error_class: Optional[str] = None
+    error: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+
+
+def usage_counts(response: Any) -> Dict[str, Optional[int]]:
+    """Token counts from a Gemini response's usage metadata (None when absent)."""
+    usage = getattr(response, "usage_metadata", None)
+
+    def count(name: str) -> Optional[int]:
+        value = getattr(usage, name, None)
+        return value if isinstance(value, int) else None
+
+    return {
+        "prompt_tokens": count("prompt_token_count"),
+        "output_tokens": count("candidates_token_count"),
+        "total_tokens": count("total_token_count"),
+    }
+
+
+class LLMTelemetry:
+    """
+    Ring buffer of recent LLM attempts.
+
+    ``record`` only appends to in-memory deques, so it never does I/O on the
+    request path. When ``export_path`` is set, a daemon thread appends new
+    records to it as JSON lines every ``flush_interval_s``; the unflushed
+    backlog is bounded too, so a stuck disk drops the oldest records instead of
+    growing memory.
+    """
+
+    def __init__(
+        self,
+        capacity: int = LLM_TELEMETRY_BUFFER,
+        export_path: str = LLM_TELEMETRY_PATH,
+        flush_interval_s: float = LLM_TELEMETRY_FLUSH_S
+    ):
+        self._records: Deque[LLMAttempt] = deque(maxlen=capacity)
+        self._unflushed: Deque[LLMAttempt] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.export_path = export_path
+        self.flush_interval_s = flush_interval_s
+        self._wake = threading.Event()
+        self._stopped = False
+        self._flusher: Optional[threading.Thread] = None
+        self._flush_errors = 0
+
+    def record(self, attempt: LLMAttempt) -> None:
+        with self._lock:
+            self._records.append(attempt)
+            if self.export_path:
+                self._unflushed.append(attempt)
+                if self._flusher is None and not self._stopped:
+                    self._flusher = threading.Thread(
+                        target=self._flush_loop, name="llm-telemetry-flush", daemon=True
+                    )
+                    self._flusher.start()
+
+    def query(
+        self,
+        limit: int = 100,
+        outcome: Optional[str] = None,
+        key: Optional[str] = None,
+        operation: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Most recent attempts first, optionally filtered."""
+        with self._lock:
+            records = list(self._records)
+        matches = []
+        for record in reversed(records):
+            if outcome and record.outcome != outcome:
+                continue
+            if key and not record.key.endswith(key):
+                continue
+            if operation and record.operation != operation:
+                continue
+            matches.append(asdict(record))
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            records = list(self._records)
+            unflushed = len(self._unflushed)
+        calls = [r for r in records if r.outcome != "stream_done"]
+        latencies = sorted(r.latency_ms for r in calls if r.outcome == "ok")
+        return {
+            "buffered": len(records),
+            "unflushed": unflushed,
+            "flush_errors": self._flush_errors,
+            "export_path": self.export_path or None,
+            "by_outcome": dict(Counter(r.outcome for r in calls)),
+            "by_key": dict(Counter(r.key for r in calls)),
+            "by_error_class": dict(Counter(r.error_class for r in calls if r.error_class)),
+            "ok_latency_p50_ms": round(percentile(latencies, 0.50), 1) if latencies else None,
+            "ok_latency_p95_ms": round(percentile(latencies, 0.95), 1) if latencies else None,
+            "total_tokens": sum(r.total_tokens or 0 for r in records if r.outcome in ("ok", "stream_done")),
+        }
+
+    def export_jsonl(self) -> Iterator[str]:
+        """The buffered attempts as JSON lines, oldest first."""
+        with self._lock:
+            records = list(self._records)
+        for record in records:
+            yield json.dumps(asdict(record), ensure_ascii=False) + "\n"
+
+    def flush(self) -> int:
+        """Append unflushed records to ``export_path``; returns how many were written."""
+        if not self.export_path:
+            return 0
+        with self._lock:
+            batch = list(self._unflushed)
+            self._unflushed.clear()
+        if not batch:
+            return 0
+        try:
+            with open(self.export_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(asdict(r), ensure_ascii=False) + "\n" for r in batch)
+        except OSError as e:
+            self._flush_errors += 1
+            print(f"LLM telemetry flush to {self.export_path} failed: {e}")
+            return 0
+        return len(batch)
+
+    def _flush_loop(self) -> None:
+        while not self._stopped:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            self.flush()
+
+    def close(self) -> None:
+        """Stop the flusher and write out whatever is left (on app shutdown)."""
+        self._stopped = True
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        self.flush()
+
+
+# Singleton instance
+_llm_telemetry: Optional[LLMTelemetry] = None
+
+
+def get_llm_telemetry() -> LLMTelemetry:
+    """Get or create LLM telemetry singleton"""
+    global _llm_telemetry
+    if _llm_telemetry is None:
+        _llm_telemetry = LLMTelemetry()
+    return _llm_telemetry
@@ -0,0 +1,253 @@
+"""
+Per-user in-process memory indexes, kept in sync by MemoryService writes
+
+A user's index is built from one fetch of their memories and then updated
+incrementally on create / merge / delete / prune. It is the working set that
+retrieval, dedupe, listing and pruning all read, so a chat turn reads the
+memories table at most once.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.utils.bm25_index import BM25Index
+from app.utils.memory_filter import (
+    DECAY_FEATURES,
+    _now_utc,
+    compute_decay_scores,
+    decay_feature_matrix,
+    decay_features,
+    expired_mask
+)
+from app.utils.minhash import LSHIndex
+from app.utils.text_analyzer import analyze_for_dedupe
+from app.utils.vector_index import HashingEmbedder, VectorIndex
+
+# Rebuild a user's index after this long, to pick up writes from other instances
+MEMORY_INDEX_TTL_S = float(os.getenv("MEMORY_INDEX_TTL_S", "300"))
+MEMORY_INDEX_MAX_USERS = int(os.getenv("MEMORY_INDEX_MAX_USERS", "1000"))
+# Memory budget for all cached indexes (least recently used users are evicted past it)
+MEMORY_INDEX_MAX_MB = float(os.getenv("MEMORY_INDEX_MAX_MB", "512"))
+# Estimated bytes per memory besides its embedding row: row dict, BM25 postings, LSH bands
+# (measured at about 10 KB with tracemalloc)
+MEMORY_INDEX_ROW_BYTES = 10 * 1024
+MEMORY_EMBEDDING_DIM = int(os.getenv("MEMORY_EMBEDDING_DIM", "1024"))
+# Blend: weight * relevance + (1 - weight) * decay score (computed at query time)
+MEMORY_RELEVANCE_WEIGHT = float(os.getenv("MEMORY_RELEVANCE_WEIGHT", "0.75"))
+# Share of relevance from BM25 (normalized per query) vs embedding cosine
+MEMORY_LEXICAL_WEIGHT = float(os.getenv("MEMORY_LEXICAL_WEIGHT", "0.5"))
+# Cosine floor below which a memory is not considered relevant at all
+MEMORY_MIN_SIMILARITY = float(os.getenv("MEMORY_MIN_SIMILARITY", "0.15"))
+# Token-set Jaccard at or above which a new memory is merged into an existing one
+MEMORY_DEDUPE_JACCARD = float(os.getenv("MEMORY_DEDUPE_JACCARD", "0.6"))
+
+_embedder = HashingEmbedder(MEMORY_EMBEDDING_DIM)
+
+
+class UserMemoryIndex:
+    """One user's memory rows plus the retrieval structures over their content."""
+
+    def __init__(self, user_id: str, rows: Iterable[Dict[str, Any]]):
+        self.user_id = user_id
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.vectors = VectorIndex(MEMORY_EMBEDDING_DIM, attributes=len(DECAY_FEATURES))
+        self.lexical = BM25Index()
+        self.duplicates = LSHIndex()
+        self.built_at = time.monotonic()
+        self._lock = threading.RLock()
+        for row in rows:
+            self.upsert(row)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def nbytes(self) -> int:
+        """Estimated memory held by this index (embedding matrix + per-row structures)"""
+        return self.vectors.nbytes + len(self.rows) * MEMORY_INDEX_ROW_BYTES
+
+    def upsert(self, row: Dict[str, Any]) -> None:
+        memory_id = row.get("id")
+        if not memory_id:
+            return
+        with self._lock:
+            previous = self.rows.get(memory_id)
+            merged = {**previous, **row} if previous else dict(row)
+            self.rows[memory_id] = merged
+            if previous is None or previous.get("content") != merged.get("content"):
+                content = merged.get("content", "")
+                self.vectors.upsert(memory_id, _embedder.embed(content), attributes=decay_features(merged))
+                self.lexical.add(memory_id, content)
+                self.duplicates.add(memory_id, analyze_for_dedupe(content))
+            else:
+                self.vectors.set_attributes(memory_id, decay_features(merged))
+
+    def remove(self, memory_ids: Iterable[str]) -> None:
+        with self._lock:
+            for memory_id in memory_ids:
+                if self.rows.pop(memory_id, None) is not None:
+                    self.vectors.remove(memory_id)
+                    self.lexical.remove(memory_id)
+                    self.duplicates.remove(memory_id)
+
+    def all_rows(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self.rows.values()]
+
+    def find_duplicate(self, content: str, threshold: float = MEMORY_DEDUPE_JACCARD) -> Optional[Dict[str, Any]]:
+        """The existing memory whose token set is a near-duplicate of ``content``, if any"""
+        with self._lock:
+            match = self.duplicates.best_match(analyze_for_dedupe(content), threshold)
+            return dict(self.rows[match[0]]) if match else None
+
+    def search(self, query: str, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Top-k non-expired rows by BM25 + embedding relevance blended with decay, best first.
+
+        Decay and expiry are computed for the whole set at query time from each
+        row's importance, last access, type and stability; returned rows carry
+        the current ``decay_score``.
+        """
+        query_vector = _embedder.embed(query)
+        now = _now_utc()
+        with self._lock:
+            features = self.vectors.attributes()
+            bm25 = self.lexical.scores(query)
+            top_bm25 = max(bm25.values(), default=0.0)
+            lexical = {memory_id: score / top_bm25 for memory_id, score in bm25.items()} if top_bm25 > 0 else None
+            hits = self.vectors.search(
+                query_vector,
+                k,
+                relevance_weight=MEMORY_RELEVANCE_WEIGHT,
+                min_similarity=MEMORY_MIN_SIMILARITY,
+                lexical=lexical,
+                lexical_weight=MEMORY_LEXICAL_WEIGHT,
+                boost=compute_decay_scores(features, now),
+                exclude=expired_mask(features, now)
+            )
+            rows = [dict(self.rows[memory_id]) for memory_id, _, _ in hits]
+        for row, decay in zip(rows, compute_decay_scores(decay_feature_matrix(rows), now)):
+            row["decay_score"] = float(decay)
+        return [(row, score) for row, (_, score, _) in zip(rows, hits)]
+
+
+class MemoryIndexRegistry:
+    """
+    Per-user working set of memories: an LRU of UserMemoryIndex with a TTL,
+    bounded by user count and by the estimated bytes of all cached indexes.
+
+    Writes go through ``upsert`` / ``remove`` and only touch indexes already
+    loaded. Every write also bumps the user's version, so a build whose fetch
+    started before a concurrent write is handed to its caller but not cached
+    (``version`` before fetching, then ``build(..., version=...)``).
+    """
+
+    def __init__(
+        self,
+        max_users: int = MEMORY_INDEX_MAX_USERS,
+        ttl_s: float = MEMORY_INDEX_TTL_S,
+        max_bytes: int = int(MEMORY_INDEX_MAX_MB * 1024 * 1024)
+    ):
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._indexes: "OrderedDict[str, UserMemoryIndex]" = OrderedDict()
+        # user id -> write stamp of their latest write (bounded, oldest dropped first)
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._clock = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0, "misses": 0, "evictions": 0, "expirations": 0,
+            "invalidations": 0, "stale_builds": 0
+        }
+
+    def get(self, user_id: str) -> Optional[UserMemoryIndex]:
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                self._counters["misses"] += 1
+                return None
+            if time.monotonic() - index.built_at > self.ttl_s:
+                del self._indexes[user_id]
+                self._counters["expirations"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._indexes.move_to_end(user_id)
+            self._counters["hits"] += 1
+            return index
+
+    def version(self, user_id: str) -> int:
+        """The user's current write version; pass it to ``build`` after fetching rows"""
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def build(self, user_id: str, rows: Iterable[Dict[str, Any]], version: Optional[int] = None) -> UserMemoryIndex:
+        index = UserMemoryIndex(user_id, rows)
+        with self._lock:
+            if version is not None and self._versions.get(user_id, 0) != version:
+                # A write landed while the rows were being fetched
+                self._counters["stale_builds"] += 1
+                return index
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            self._evict()
+        return index
+
+    def upsert(self, user_id: str, row: Dict[str, Any]) -> None:
+        index = self._written(user_id)
+        if index is not None:
+            index.upsert(row)
+            with self._lock:
+                self._evict()
+
+    def remove(self, user_id: str, memory_ids: Iterable[str]) -> None:
+        index = self._written(user_id)
+        if index is not None:
+            index.remove(memory_ids)
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop the user's working set; the next read refetches it"""
+        with self._lock:
+            self._bump(user_id)
+            if self._indexes.pop(user_id, None) is not None:
+                self._counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "users": len(self._indexes),
+                "memories": sum(len(index) for index in self._indexes.values()),
+                "max_users": self.max_users,
+                "bytes": sum(index.nbytes() for index in self._indexes.values()),
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else None,
+            }
+
+    def _evict(self) -> None:
+        """Drop least recently used indexes until within max_users and max_bytes (the newest always stays)"""
+        total = sum(index.nbytes() for index in self._indexes.values())
+        while len(self._indexes) > 1 and (len(self._indexes) > self.max_users or total > self.max_bytes):
+            _, evicted = self._indexes.popitem(last=False)
+            total -= evicted.nbytes()
+            self._counters["evictions"] += 1
+
+    def _written(self, user_id: str) -> Optional[UserMemoryIndex]:
+        """Record a write for the user; returns their loaded index, if any"""
+        with self._lock:
+            self._bump(user_id)
+            index = self._indexes.get(user_id)
+            if index is not None and time.monotonic() - index.built_at > self.ttl_s:
+                return None
+            return index
+
+    def _bump(self, user_id: str) -> None:
+        self._clock += 1
+        self._versions[user_id] = self._clock
+        self._versions.move_to_end(user_id)
+        while len(self._versions) > self.max_users * 10:
+            self._versions.popitem(last=False)
@@ -0,0 +1,101 @@
+"""
+Memory pruning as a maintenance job.
+
+Extraction only prunes inline when a batch takes a user over budget; expired
+memories are removed by the database in one set-based statement
+(``prune_expired_memories``, supabase_migration_memory_prune.sql), scheduled
+with pg_cron or run by the periodic sweep below. The function takes an
+advisory lock, so with several API processes only one sweep does the work,
+and nothing is put on the work queue that chat turns share.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.services.memory_service import get_memory_service
+from app.services.supabase_service import get_supabase_client
+from app.services.work_queue import WorkQueue
+
+logger = logging.getLogger(__name__)
+
+# Per-user prune job; no longer queued by the sweep, kept so spooled jobs still run
+PRUNE_MEMORIES_JOB = "memory.prune"
+# Seconds between sweeps (0 disables the sweep, e.g. when pg_cron runs prune_expired_memories)
+MEMORY_PRUNE_SWEEP_S = float(os.getenv("MEMORY_PRUNE_SWEEP_S", "21600"))
+
+_totals = {"runs": 0, "examined": 0, "expired": 0, "over_budget": 0, "deleted": 0}
+_totals_lock = threading.Lock()
+_last_sweep: Dict[str, Any] = {}
+
+
+def prune_user_memories(payload: Dict[str, Any]) -> Dict[str, int]:
+    """Work queue handler: prune one user's memories and add to the running totals."""
+    stats = get_memory_service().prune_memories(payload["user_id"])
+    with _totals_lock:
+        _totals["runs"] += 1
+        for key, value in stats.items():
+            _totals[key] = _totals.get(key, 0) + value
+    if stats["deleted"]:
+        logger.info(
+            "Pruned memories for %s: examined=%d deleted=%d (expired=%d over_budget=%d)",
+            payload["user_id"], stats["examined"], stats["deleted"], stats["expired"], stats["over_budget"]
+        )
+    return stats
+
+
+def register_memory_maintenance_handlers(queue: WorkQueue) -> None:
+    queue.register(PRUNE_MEMORIES_JOB, prune_user_memories)
+
+
+def prune_stats() -> Dict[str, Any]:
+    with _totals_lock:
+        totals = dict(_totals)
+    return {**totals, "sweep_interval_s": MEMORY_PRUNE_SWEEP_S, "last_sweep": dict(_last_sweep)}
+
+
+def _prune_expired() -> int:
+    result = get_supabase_client().rpc("prune_expired_memories", {}).execute()
+    return int(result.data or 0)
+
+
+async def sweep_memories() -> int:
+    """Delete every user's expired memories in the database; returns how many were deleted."""
+    started = time.time()
+    deleted = await asyncio.to_thread(_prune_expired)
+    with _totals_lock:
+        _totals["expired"] += deleted
+        _totals["deleted"] += deleted
+    _last_sweep.update({"started_at": started, "deleted": deleted})
+    if deleted:
+        logger.info("Memory prune sweep deleted %d expired memories", deleted)
+    return deleted
+
+
+class MemoryPruneSweeper:
+    """Runs sweep_memories every ``interval_s`` seconds until stopped."""
+
+    def __init__(self, interval_s: float = MEMORY_PRUNE_SWEEP_S):
+        self.interval_s = interval_s
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval_s > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="memory-prune-sweep")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                await sweep_memories()
+            except Exception:
+                logger.exception("Memory prune sweep failed - run supabase_migration_memory_prune.sql")
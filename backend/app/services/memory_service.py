@@ -1,58 +1,152 @@
-from typing import List, Optional, Dict, Any
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timezone
+
+import numpy as np
+
+from app.repositories.memory_repository import MemoryRepository
+from app.services.access_tracker import get_access_tracker
+from app.services.memory_index import MEMORY_DEDUPE_JACCARD, MemoryIndexRegistry, UserMemoryIndex
 from app.services.supabase_service import get_supabase_client
 from app.services.gemini_service import get_gemini_service
-from app.models.memory import Memory, MemoryCreate
+from app.models.memory import MemoryCreate, MemoryRecord
+from app.models.records import parse_datetime
 from app.utils.memory_filter import (
+    DECAY_FEATURES,
     filter_unimportant_memories,
-    categorize_memory_content,
-    infer_memory_type,
     compute_ttl_days,
     compute_decay_score,
-    is_memory_expired,
+    compute_decay_scores,
+    decay_feature_matrix,
+    expired_mask,
     clamp,
     _now_utc,
     _ensure_aware
 )
+from app.utils.memory_categories import get_memory_categorizer
+from app.utils.metrics import get_batch_stats
+from app.utils.minhash import jaccard
+from app.utils.text_analyzer import analyze_for_dedupe
+
+# Columns written when a new memory is merged into an existing one (see _merged_fields)
+_MERGE_FIELDS = ("importance_score", "ttl_days", "category", "memory_type", "source", "stability")
+
+# Columns written by downweight_memories
+_DOWNWEIGHT_FIELDS = ("importance_score", "ttl_days", "decay_score")
+# Importance multiplier for memories whose source paragraphs were removed from a journal
+MEMORY_ORPHAN_WEIGHT = float(os.getenv("MEMORY_ORPHAN_WEIGHT", "0.5"))
+
+# Only what prune_memories needs to rank rows (see DECAY_FEATURES)
+_PRUNE_COLUMNS = "id, importance_score, memory_type, stability, last_accessed, created_at, ttl_days, access_count, is_pinned"
+# Ids per DELETE ... WHERE id IN (...) request (keeps the URL short)
+MEMORY_PRUNE_DELETE_BATCH = int(os.getenv("MEMORY_PRUNE_DELETE_BATCH", "100"))
+
+# Chunks of one long text extracted at the same time (also capped by the number of Gemini keys)
+MEMORY_EXTRACT_CONCURRENCY = int(os.getenv("MEMORY_EXTRACT_CONCURRENCY", "4"))
+
+_write_batches = get_batch_stats("memory_writes")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 
 class MemoryService:
     def __init__(self):
         self.supabase = get_supabase_client()
+        self.repository = MemoryRepository()
         self.gemini = get_gemini_service()
         self.max_memories_per_user = 500
-        self.max_relevance_pool = 25
+        self.indexes = MemoryIndexRegistry()
+        self.access = get_access_tracker()
+        # False once a write showed the stability column is missing (see _stability_fallback)
+        self._stability_column = True
     
     def extract_and_store_memories(
         self,
         user_id: str,
         conversation_text: str,
         source: str = "chat"
-    ) -> List[Memory]:
+    ) -> List[MemoryRecord]:
         """
         Extract memories from conversation and store them
         """
         # Use Gemini to extract memories
         extracted = self.gemini.extract_memories(conversation_text)
-        
-        stored_memories = []
-        for mem_data in extracted:
+        return self.store_extracted_memories(user_id, extracted, source)
+    
+    def extract_from_chunks(self, chunks: List[str], label: str = "User journal entry") -> List[Dict[str, Any]]:
+        """
+        Extract memories from the chunks of one long text concurrently and merge them.
+
+        Up to MEMORY_EXTRACT_CONCURRENCY chunks (at most one per Gemini key) are
+        in flight at once; each call still waits for its key's rate budget.
+        Memories repeated across chunks are merged (highest importance kept);
+        near-duplicates are merged again by store_extracted_memories. Each
+        memory lists the indexes of the chunks it came from in ``chunks``.
+        A failed chunk raises, so the caller can retry the whole text.
+        """
+        if not chunks:
+            return []
+        total = len(chunks)
+        texts = [
+            f"{label} (part {i} of {total}):\n{chunk}" if total > 1 else f"{label}:\n{chunk}"
+            for i, chunk in enumerate(chunks, 1)
+        ]
+        workers = max(1, min(MEMORY_EXTRACT_CONCURRENCY, total, len(self.gemini.key_pool) or 1))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="memory-extract") as pool:
+            results = list(pool.map(lambda text: self.gemini.extract_memories(text, strict=True), texts))
+        return _merge_chunk_memories(results)
+
+    def store_extracted_memories(
+        self,
+        user_id: str,
+        extracted: List[Dict[str, Any]],
+        source: str = "chat"
+    ) -> List[MemoryRecord]:
+        """
+        Score, dedupe and store memories already extracted by Gemini
+        (from extract_memories or the ``memories`` of analyze_turn)
+
+        All new memories are written with one bulk insert and all merges with
+        one bulk upsert; the result follows the order of ``extracted``.
+        """
+        return [memory for memory, _ in self._store_extracted(user_id, extracted, source)]
+
+    def store_journal_memories(
+        self,
+        user_id: str,
+        extracted: List[Dict[str, Any]]
+    ) -> List[Tuple[MemoryRecord, Optional[str]]]:
+        """
+        store_extracted_memories with source="journal", pairing each stored memory
+        with its provenance: None when this batch created it, else the source it
+        had before the batch merged into it (e.g. "chat")
+        """
+        return self._store_extracted(user_id, extracted, "journal")
+
+    def _store_extracted(
+        self,
+        user_id: str,
+        extracted: List[Dict[str, Any]],
+        source: str
+    ) -> List[Tuple[MemoryRecord, Optional[str]]]:
+        creates: List[Dict[str, Any]] = []
+        create_tokens: List[set] = []
+        merges: Dict[str, Dict[str, Any]] = {}
+        # Source of each merged memory before this batch touched it
+        prior_sources: Dict[str, str] = {}
+        # ("create", index into creates) or ("merge", memory id), one per stored memory
+        slots: List[Tuple[str, Any]] = []
+        # Missing categories/types inferred for the whole batch (one keyword scan per memory)
+        classified = get_memory_categorizer().classify_many(extracted)
+        for mem_data, (category, memory_type) in zip(extracted, classified):
             content = mem_data.get("content", "").strip()
             if not content:
                 continue
             importance = float(mem_data.get("importance_score", 0.5))
             importance = clamp(importance, 0, 1)
-            category = mem_data.get("category", "other")
-            memory_type = mem_data.get("memory_type") or ""
             stability = float(mem_data.get("stability", 0.5))
             stability = clamp(stability, 0, 1)
-            
-            # If category not provided, try to infer
-            if category == "other":
-                category = categorize_memory_content(content)
-
-            if not memory_type:
-                memory_type = infer_memory_type(content, category)
 
             adjusted_importance = self._apply_importance_rules(
                 importance,
@@ -71,23 +165,35 @@ class MemoryService:
 
             now = _now_utc()
             decay_score = compute_decay_score(adjusted_importance, now, memory_type, stability, now)
-            
+            merge_args = dict(
+                adjusted_importance=adjusted_importance,
+                category=category,
+                memory_type=memory_type,
+                ttl_days=ttl_days,
+                stability=stability,
+                source=source
+            )
+
+            # A memory created earlier in this batch is not in the index yet
+            tokens = set(analyze_for_dedupe(content))
+            pending = next(
+                (i for i, other in enumerate(create_tokens) if jaccard(tokens, other) >= MEMORY_DEDUPE_JACCARD),
+                None
+            )
+            if pending is not None:
+                creates[pending].update(self._merged_fields(creates[pending], **merge_args))
+                slots.append(("create", pending))
+                continue
+
             # Check if similar memory already exists
             existing = self._find_similar_memory(user_id, content)
             if existing:
-                updated = self._merge_with_existing(
-                    existing=existing,
-                    adjusted_importance=adjusted_importance,
-                    category=category,
-                    memory_type=memory_type,
-                    ttl_days=ttl_days,
-                    decay_score=decay_score,
-                    source=source
-                )
-                stored_memories.append(Memory(**updated))
+                prior_sources.setdefault(existing["id"], existing.get("source") or "chat")
+                base = merges.get(existing["id"], existing)
+                merges[existing["id"]] = {**base, **self._merged_fields(base, **merge_args)}
+                slots.append(("merge", existing["id"]))
             else:
-                # Create new memory
-                memory = self.create_memory(
+                creates.append(self._new_memory_row(
                     MemoryCreate(
                         user_id=user_id,
                         content=content,
@@ -98,16 +204,98 @@ class MemoryService:
                         last_used_in_chat=now,
                         is_pinned=False,
                         memory_type=memory_type,
-                        source=source
+                        source=source,
+                        stability=stability
                     )
-                )
-                stored_memories.append(memory)
-        
-        self.prune_memories(user_id)
+                ))
+                create_tokens.append(tokens)
+                slots.append(("create", len(creates) - 1))
+
+        created = self._insert_memories(user_id, creates)
+        merged = self._upsert_memories(user_id, list(merges.values()))
+        round_trips = int(bool(creates)) + int(bool(merges))
+        if round_trips:
+            _write_batches.observe(len(creates) + len(merges), round_trips)
+
+        stored_memories = [
+            (MemoryRecord(created[key]), None) if kind == "create"
+            else (MemoryRecord(merged[key]), prior_sources[key])
+            for kind, key in slots
+        ]
+        merged_hits = [memory for memory, provenance in stored_memories if provenance is not None]
+        if merged_hits:
+            self._record_access(self._load_index(user_id), merged_hits)
+        # Prune only when this batch takes the user over budget; expired rows are
+        # left to the periodic sweep (memory_maintenance)
+        index = self.indexes.get(user_id)
+        if creates and index is not None and len(index) > self.max_memories_per_user:
+            self.prune_memories(user_id)
         return stored_memories
+
+    def _stability_fallback(self, run: Callable[[bool], Any]) -> Any:
+        """
+        ``run(True)``, or ``run(False)`` (without memories.stability) once the
+        column turns out to be missing: supabase_migration_memory_decay.sql
+        has not been run yet, and writes should keep working until it is.
+        """
+        if not self._stability_column:
+            return run(False)
+        try:
+            return run(True)
+        except Exception as e:
+            if "stability" not in str(e):
+                raise
+            self._stability_column = False
+            print(f"memories.stability is missing ({e}) - run supabase_migration_memory_decay.sql; writing without it")
+            return run(False)
+
+    def _insert_memories(self, user_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert new memory rows in one request; returns the stored rows in input order"""
+        if not rows:
+            return []
+        result = self._stability_fallback(
+            lambda keep: self.supabase.table("memories").insert(_with_stability(rows, keep)).execute()
+        )
+        if not result.data or len(result.data) != len(rows):
+            # Unknown what was stored; refetch on next read
+            self.indexes.invalidate(user_id)
+            raise Exception("Failed to create memories")
+        for row in result.data:
+            self.indexes.upsert(user_id, row)
+        return result.data
+
+    def _upsert_memories(self, user_id: str, rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Write merged memory rows in one upsert on id; returns them keyed by id"""
+        if not rows:
+            return {}
+        payload = [{"id": row["id"], "user_id": row.get("user_id") or user_id, "content": row["content"],
+                    **{field: row.get(field) for field in _MERGE_FIELDS}} for row in rows]
+        self._stability_fallback(lambda keep: self._upsert_rows(_with_stability(payload, keep)))
+        for row in rows:
+            self.indexes.upsert(user_id, row)
+        return {row["id"]: row for row in rows}
+
+    def _upsert_rows(self, payload: List[Dict[str, Any]]) -> Any:
+        """Upsert memory rows on id (INSERT ... ON CONFLICT DO UPDATE: needs the UPDATE policy with the anon key)"""
+        try:
+            return self.supabase.table("memories").upsert(payload, on_conflict="id").execute()
+        except Exception as e:
+            if "row-level security" in str(e):
+                print(f"Could not update memories: {e} - run supabase_migration_memory_update_policy.sql")
+            raise
     
-    def create_memory(self, memory_data: MemoryCreate) -> Memory:
+    def create_memory(self, memory_data: MemoryCreate) -> MemoryRecord:
         """Create a new memory"""
+        data = self._new_memory_row(memory_data)
+        result = self._stability_fallback(
+            lambda keep: self.supabase.table("memories").insert(_with_stability([data], keep)[0]).execute()
+        )
+        if result.data:
+            self.indexes.upsert(memory_data.user_id, result.data[0])
+            return MemoryRecord(result.data[0])
+        raise Exception("Failed to create memory")
+
+    def _new_memory_row(self, memory_data: MemoryCreate) -> Dict[str, Any]:
         now = _now_utc().isoformat()
         decay_score = memory_data.decay_score
         if decay_score is None:
@@ -116,10 +304,10 @@ class MemoryService:
                 memory_data.importance_score,
                 now_dt,
                 memory_data.memory_type or "fact",
-                0.5,
+                memory_data.stability if memory_data.stability is not None else 0.5,
                 now_dt
             )
-        data = {
+        return {
             "user_id": memory_data.user_id,
             "content": memory_data.content,
             "importance_score": memory_data.importance_score,
@@ -132,143 +320,100 @@ class MemoryService:
             "last_used_in_chat": memory_data.last_used_in_chat or now,
             "is_pinned": memory_data.is_pinned if memory_data.is_pinned is not None else False,
             "memory_type": memory_data.memory_type or "fact",
-            "source": memory_data.source or "chat"
+            "source": memory_data.source or "chat",
+            "stability": memory_data.stability if memory_data.stability is not None else 0.5
         }
-        
-        result = self.supabase.table("memories").insert(data).execute()
-        if result.data:
-            return Memory(**result.data[0])
-        raise Exception("Failed to create memory")
+    
+    def _load_index(self, user_id: str) -> UserMemoryIndex:
+        """The user's memory working set, built from one fetch of their memories if not cached"""
+        index = self.indexes.get(user_id)
+        if index is None:
+            version = self.indexes.version(user_id)
+            result = self.supabase.table("memories")\
+                .select("*")\
+                .eq("user_id", user_id)\
+                .execute()
+            index = self.indexes.build(user_id, result.data or [], version=version)
+        return index
+    
+    async def _load_index_async(self, user_id: str) -> UserMemoryIndex:
+        index = self.indexes.get(user_id)
+        if index is None:
+            version = self.indexes.version(user_id)
+            rows = await self.repository.list_for_user(user_id)
+            # Embedding, BM25 and LSH indexing is CPU-bound (~100 ms for 500 memories): keep it off the event loop
+            index = await asyncio.to_thread(self.indexes.build, user_id, rows, version=version)
+        return index
+
+    def invalidate_memories(self, user_id: str) -> None:
+        """Drop the cached working set for a user whose memories changed outside this service"""
+        self.indexes.invalidate(user_id)
     
     def get_relevant_memories(
         self,
         user_id: str,
         query: str,
         limit: int = 5
-    ) -> List[Memory]:
+    ) -> List[MemoryRecord]:
         """
         Retrieve relevant memories for a conversation
-        Uses simple keyword matching - could be enhanced with embeddings
+        Ranks the user's whole memory set by embedding similarity blended with decay score
         """
-        # Get all memories for user
-        result = self.supabase.table("memories")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .order("importance_score", desc=True)\
-            .order("last_accessed", desc=True)\
-            .limit(self.max_relevance_pool)\
-            .execute()
-        
-        if not result.data:
-            return []
-        
-        now = _now_utc()
-        memories = [Memory(**mem) for mem in result.data]
-        
-        # Filter by relevance (simple keyword matching)
-        query_lower = query.lower()
-        relevant = []
-        for mem in memories:
-            if is_memory_expired(mem, now):
-                continue
-            content_lower = mem.content.lower()
-            # Check if query keywords appear in memory
-            query_words = query_lower.split()
-            matches = sum(1 for word in query_words if word in content_lower)
-            if matches > 0:
-                relevant.append(mem)
-                # Update access info
-                self._update_memory_access(mem.id)
-        
-        # Sort by relevance (matches) and importance
-        relevant.sort(key=lambda m: (
-            sum(1 for word in query_lower.split() if word in m.content.lower()),
-            m.decay_score or m.importance_score
-        ), reverse=True)
-        
-        # Return top N
-        return relevant[:limit]
+        index = self._load_index(user_id)
+        relevant = self._rank_memories(index, query, limit)
+        self._record_access(index, relevant)
+        return relevant
     
-    def get_all_memories(self, user_id: str) -> List[Memory]:
-        """Get all memories for a user"""
-        result = self.supabase.table("memories")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .order("created_at", desc=True)\
-            .execute()
-        
-        if not result.data:
-            return []
-        
-        memories = [Memory(**mem) for mem in result.data]
+    async def get_relevant_memories_async(
+        self,
+        user_id: str,
+        query: str,
+        limit: int = 5
+    ) -> List[MemoryRecord]:
+        """Async variant of get_relevant_memories (non-blocking data access)"""
+        index = await self._load_index_async(user_id)
+        relevant = self._rank_memories(index, query, limit)
+        self._record_access(index, relevant)
+        return relevant
+    
+    def _rank_memories(self, index: UserMemoryIndex, query: str, limit: int) -> List[MemoryRecord]:
+        """Top non-expired memories for the query, best first (decay computed at query time)"""
+        return [MemoryRecord(row) for row, _ in index.search(query, limit)]
+    
+    def get_all_memories(self, user_id: str) -> List[MemoryRecord]:
+        """Get all memories for a user, newest first"""
+        return self._list_memories(self._load_index(user_id))
+    
+    async def get_all_memories_async(self, user_id: str) -> List[MemoryRecord]:
+        """Async variant of get_all_memories"""
+        return self._list_memories(await self._load_index_async(user_id))
+
+    def _list_memories(self, index: UserMemoryIndex) -> List[MemoryRecord]:
+        memories = [MemoryRecord(row) for row in index.all_rows()]
+        memories.sort(key=lambda mem: _ensure_aware(mem.created_at) if mem.created_at else _EPOCH, reverse=True)
         # Filter out unimportant ones
-        return filter_unimportant_memories(memories)
+        return _with_current_decay(filter_unimportant_memories(memories))
     
     def _find_similar_memory(self, user_id: str, content: str) -> Optional[dict]:
-        """Find if a similar memory already exists"""
-        # Simple check - look for memories with similar keywords
-        content_words = set(content.lower().split())
-        if len(content_words) < 2:
-            return None
-        
-        result = self.supabase.table("memories")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .execute()
-        
-        if not result.data:
-            return None
-        
-        # Find memory with most word overlap
-        best_match = None
-        best_score = 0
-        
-        for mem in result.data:
-            mem_words = set(mem["content"].lower().split())
-            overlap = len(content_words & mem_words)
-            if overlap > best_score and overlap >= 2:
-                best_score = overlap
-                best_match = mem
-        
-        return best_match if best_score >= 2 else None
+        """Find if a near-duplicate memory already exists (MinHash/LSH, exact Jaccard check)"""
+        return self._load_index(user_id).find_duplicate(content)
     
-    def _update_memory(self, memory_id: str, updates: Dict[str, Any]):
-        """Update memory fields"""
-        self.supabase.table("memories")\
-            .update(updates)\
-            .eq("id", memory_id)\
-            .execute()
+    def _record_access(self, index: UserMemoryIndex, memories: List[MemoryRecord]) -> None:
+        """Queue access counts for a write-behind flush; the index is updated right away"""
+        self.access.record([mem.id for mem in memories if mem.id])
+        for mem in memories:
+            if mem.id:
+                # From the indexed row, so repeated hits in one call all count
+                current = index.rows.get(mem.id) or mem.model_dump()
+                index.upsert({"id": mem.id, **self._access_update(current)})
     
-    def _update_memory_access(self, memory_id: str):
-        """Update last accessed time and increment access count"""
-        # Get current access count
-        result = self.supabase.table("memories")\
-            .select("access_count, importance_score, memory_type, last_accessed, decay_score")\
-            .eq("id", memory_id)\
-            .execute()
-        
-        current_count = result.data[0].get("access_count", 0) if result.data else 0
-        importance_score = result.data[0].get("importance_score", 0.5) if result.data else 0.5
-        memory_type = result.data[0].get("memory_type", "fact") if result.data else "fact"
-        last_accessed = result.data[0].get("last_accessed") if result.data else None
-        now = _now_utc()
-        new_decay = compute_decay_score(
-            importance_score,
-            last_accessed,
-            memory_type,
-            0.5,
-            now
-        )
-
-        self.supabase.table("memories")\
-            .update({
-                "last_accessed": now.isoformat(),
-                "last_used_in_chat": now.isoformat(),
-                "decay_score": new_decay,
-                "access_count": current_count + 1
-            })\
-            .eq("id", memory_id)\
-            .execute()
+    def _access_update(self, current: Dict[str, Any]) -> Dict[str, Any]:
+        now = _now_utc().isoformat()
+        return {
+            "last_accessed": now,
+            "last_used_in_chat": now,
+            "access_count": current.get("access_count", 0) + 1
+        }
     
     def delete_memory(self, memory_id: str, user_id: str) -> bool:
         """Delete a memory"""
@@ -277,52 +422,108 @@ class MemoryService:
             .eq("id", memory_id)\
             .eq("user_id", user_id)\
             .execute()
+        self.indexes.remove(user_id, [memory_id])
         return len(result.data) > 0
 
-    def prune_memories(self, user_id: str):
-        """Remove expired and low-value memories to fit budget."""
-        result = self.supabase.table("memories")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .execute()
+    async def delete_memory_async(self, memory_id: str, user_id: str) -> bool:
+        """Async variant of delete_memory"""
+        deleted = await self.repository.delete(memory_id, user_id)
+        self.indexes.remove(user_id, [memory_id])
+        return deleted
+
+    def prune_memories(self, user_id: str) -> Dict[str, int]:
+        """
+        Remove expired memories, then the lowest-decay unpinned ones over budget.
 
-        if not result.data:
-            return
+        Uses the cached working set when the user has one; otherwise reads only
+        the columns the decision needs (without caching, so sweeps do not flood
+        the cache). Deletes with one ``in`` filter per batch; returns rows
+        examined and deleted.
+        """
+        index = self.indexes.get(user_id)
+        if index is not None:
+            rows = index.all_rows()
+        else:
+            result = self._stability_fallback(
+                lambda keep: self.supabase.table("memories")
+                .select(_PRUNE_COLUMNS if keep else _PRUNE_COLUMNS.replace(" stability,", ""))
+                .eq("user_id", user_id)
+                .execute()
+            )
+            rows = result.data or []
+        stats = {"examined": len(rows), "expired": 0, "over_budget": 0, "deleted": 0}
+        if not rows:
+            return stats
 
         now = _now_utc()
-        memories = [Memory(**mem) for mem in result.data]
+        features = decay_feature_matrix(rows)
+        expired = expired_mask(features, now)
+        expired_ids = [rows[i]["id"] for i in np.flatnonzero(expired)]
 
-        expired_ids = [
-            mem.id for mem in memories
-            if mem.id and is_memory_expired(mem, now)
-        ]
+        over_budget_ids: List[str] = []
+        over_budget = len(rows) - len(expired_ids) - self.max_memories_per_user
+        if over_budget > 0:
+            candidates = np.flatnonzero(~expired & (features[:, DECAY_FEATURES.index("is_pinned")] == 0))
+            decay = compute_decay_scores(features[candidates], now)
+            importance = features[candidates, DECAY_FEATURES.index("importance_score")]
+            created = np.nan_to_num(features[candidates, DECAY_FEATURES.index("created_at")], nan=now.timestamp())
+            # Lowest decay first, then lowest importance, then oldest
+            order = np.lexsort((created, importance, decay))
+            over_budget_ids = [rows[candidates[i]]["id"] for i in order[:over_budget]]
 
-        for mem_id in expired_ids:
-            self.supabase.table("memories")\
+        stats["expired"] = len(expired_ids)
+        stats["over_budget"] = len(over_budget_ids)
+        stats["deleted"] = self._delete_memories(user_id, expired_ids + over_budget_ids)
+        return stats
+
+    def downweight_memories(self, user_id: str, memory_ids: List[str], factor: float = MEMORY_ORPHAN_WEIGHT) -> int:
+        """
+        Scale the importance of memories whose source is gone (e.g. removed
+        journal paragraphs). TTL and decay are recomputed from the lower
+        importance, so unused ones expire or lose out in prune_memories.
+        Pinned memories are left alone; returns how many were updated.
+        """
+        wanted = set(memory_ids)
+        if not wanted:
+            return 0
+        now = _now_utc()
+        rows = []
+        for row in self._load_index(user_id).all_rows():
+            if row["id"] not in wanted or row.get("is_pinned"):
+                continue
+            importance = round(clamp(float(row.get("importance_score") or 0.5) * factor, 0, 1), 4)
+            memory_type = row.get("memory_type") or "fact"
+            stability = float(row.get("stability") if row.get("stability") is not None else 0.5)
+            last_accessed = row.get("last_accessed")
+            if isinstance(last_accessed, str):
+                last_accessed = parse_datetime(last_accessed)
+            rows.append({
+                **row,
+                "importance_score": importance,
+                "ttl_days": compute_ttl_days(importance, memory_type, stability),
+                "decay_score": compute_decay_score(importance, last_accessed, memory_type, stability, now)
+            })
+        if rows:
+            payload = [{"id": row["id"], "user_id": row.get("user_id") or user_id, "content": row["content"],
+                        **{field: row.get(field) for field in _DOWNWEIGHT_FIELDS}} for row in rows]
+            self._upsert_rows(payload)
+            for row in rows:
+                self.indexes.upsert(user_id, row)
+        return len(rows)
+
+    def _delete_memories(self, user_id: str, memory_ids: List[str]) -> int:
+        """Delete memories with one ``in`` filter per MEMORY_PRUNE_DELETE_BATCH ids"""
+        deleted = 0
+        for start in range(0, len(memory_ids), MEMORY_PRUNE_DELETE_BATCH):
+            batch = memory_ids[start:start + MEMORY_PRUNE_DELETE_BATCH]
+            result = self.supabase.table("memories")\
                 .delete()\
-                .eq("id", mem_id)\
+                .in_("id", batch)\
                 .eq("user_id", user_id)\
                 .execute()
-
-        remaining = [mem for mem in memories if mem.id not in set(expired_ids)]
-        if len(remaining) <= self.max_memories_per_user:
-            return
-
-        candidates = [mem for mem in remaining if not mem.is_pinned]
-        candidates.sort(key=lambda mem: (
-            mem.decay_score or mem.importance_score,
-            mem.importance_score,
-            mem.created_at or now
-        ))
-
-        to_remove = len(remaining) - self.max_memories_per_user
-        for mem in candidates[:to_remove]:
-            if mem.id:
-                self.supabase.table("memories")\
-                    .delete()\
-                    .eq("id", mem.id)\
-                    .eq("user_id", user_id)\
-                    .execute()
+            deleted += len(result.data or [])
+        self.indexes.remove(user_id, memory_ids)
+        return deleted
 
     def _apply_importance_rules(
         self,
@@ -348,17 +549,21 @@ class MemoryService:
         adjusted = importance * stability_multiplier + type_bonus + category_bonus + source_bonus - length_penalty
         return clamp(adjusted, 0, 1)
 
-    def _merge_with_existing(
+    def _merged_fields(
         self,
         existing: Dict[str, Any],
         adjusted_importance: float,
         category: str,
         memory_type: str,
         ttl_days: int,
-        decay_score: float,
-        source: str
+        source: str,
+        stability: float = 0.5
     ) -> Dict[str, Any]:
-        now = _now_utc().isoformat()
+        """
+        Fields to write when a new memory is folded into ``existing`` (decay is
+        derived at read time). The access itself is not written here: it is a
+        tracker hit, added in SQL like any other access.
+        """
         existing_importance = existing.get("importance_score", 0)
         existing_type = existing.get("memory_type")
         merged_type = existing_type or memory_type
@@ -367,20 +572,43 @@ class MemoryService:
         existing_source = existing.get("source") or "chat"
         merged_source = "journal" if source == "journal" or existing_source == "journal" else existing_source
 
-        updated = {
+        return {
             "importance_score": max(existing_importance, adjusted_importance),
-            "access_count": existing.get("access_count", 0) + 1,
-            "last_accessed": now,
-            "last_used_in_chat": now,
-            "decay_score": max(existing.get("decay_score", 0) or 0, decay_score),
             "ttl_days": max(existing.get("ttl_days", 0) or 0, ttl_days),
             "category": existing.get("category") or category,
             "memory_type": merged_type,
-            "source": merged_source
+            "source": merged_source,
+            "stability": max(existing.get("stability") or 0.5, stability)
         }
-        self._update_memory(existing["id"], updated)
-        merged = {**existing, **updated}
-        return merged
+
+
+def _with_stability(rows: List[Dict[str, Any]], keep: bool) -> List[Dict[str, Any]]:
+    return rows if keep else [{k: v for k, v in row.items() if k != "stability"} for row in rows]
+
+
+def _merge_chunk_memories(results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Concatenate per-chunk extractions, keeping one memory per (case-insensitive) content"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for chunk, memories in enumerate(results):
+        for mem in memories or []:
+            content = (mem.get("content") or "").strip()
+            if not content:
+                continue
+            key = " ".join(content.casefold().split())
+            kept = merged.get(key)
+            chunks = (kept["chunks"] if kept else []) + [chunk]
+            if kept is None or float(mem.get("importance_score", 0.5)) > float(kept.get("importance_score", 0.5)):
+                kept = merged[key] = dict(mem)
+            kept["chunks"] = sorted(set(chunks))
+    return list(merged.values())
+
+
+def _with_current_decay(memories: List[MemoryRecord]) -> List[MemoryRecord]:
+    """Replace the cached decay_score with the value computed for now"""
+    if memories:
+        for mem, score in zip(memories, compute_decay_scores(decay_feature_matrix(memories))):
+            mem.decay_score = float(score)
+    return memories
 
 
 # Singleton instance
@@ -0,0 +1,107 @@
+"""
+Post-turn work for a chat exchange (memory extraction, AI journal).
+
+Runs on the background work queue so POST /api/chat can return as soon as the
+reply is generated and stored. Memories and Tymon's reflection come from one
+combined Gemini call (GeminiService.analyze_turn).
+"""
+
+from typing import Any, Dict
+
+from app.models.journal import AIJournalCreate
+from app.services.gemini_service import get_gemini_service
+from app.services.journal_service import get_journal_service
+from app.services.memory_service import get_memory_service
+from app.services.work_queue import WorkQueue, get_work_queue
+
+ANALYZE_TURN_JOB = "post_turn.analyze"
+# Superseded by ANALYZE_TURN_JOB; still registered so jobs spooled before the switch drain
+EXTRACT_MEMORIES_JOB = "post_turn.extract_memories"
+AI_JOURNAL_JOB = "post_turn.ai_journal"
+
+
+def _full_context(payload: Dict[str, Any]) -> str:
+    return payload.get("context", "") + f"\nUser: {payload['user_message']}\nTymon: {payload['ai_response']}"
+
+
+def analyze_turn(payload: Dict[str, Any]) -> None:
+    """
+    Extract memories and store Tymon's reflection for one chat turn (one Gemini call).
+
+    Progress is checkpointed in the payload, which the work queue keeps (and
+    re-spools) across retries: a retry after a failed journal insert reuses
+    the analysis and does not store the memories again.
+    """
+    analysis = payload.get("analysis")
+    if analysis is None:
+        gemini = get_gemini_service()
+        analysis = payload["analysis"] = gemini.analyze_turn(
+            conversation=_full_context(payload),
+            user_message=payload["user_message"],
+            ai_response=payload["ai_response"]
+        )
+
+    if not payload.get("memories_stored"):
+        get_memory_service().store_extracted_memories(payload["user_id"], analysis["memories"], source="chat")
+        payload["memories_stored"] = True
+    get_journal_service().create_ai_journal_from_analysis(
+        payload["user_id"], payload["conversation_id"], analysis
+    )
+
+
+def extract_turn_memories(payload: Dict[str, Any]) -> None:
+    """Extract and store long-term memories from one chat turn."""
+    memory_service = get_memory_service()
+    conversation_text = f"User: {payload['user_message']}\nTymon: {payload['ai_response']}"
+    memory_service.extract_and_store_memories(payload["user_id"], conversation_text)
+
+
+def create_turn_ai_journal(payload: Dict[str, Any]) -> None:
+    """Generate and store Tymon's self-reflection for one chat turn."""
+    gemini = get_gemini_service()
+    journal_service = get_journal_service()
+
+    user_message = payload["user_message"]
+    ai_response = payload["ai_response"]
+
+    ai_journal_data = gemini.generate_ai_journal(
+        conversation=_full_context(payload),
+        user_message=user_message,
+        ai_response=ai_response
+    )
+
+    journal_service.create_ai_journal(
+        AIJournalCreate(
+            user_id=payload["user_id"],
+            conversation_id=payload["conversation_id"],
+            reflection=ai_journal_data.get("reflection", ""),
+            learnings=ai_journal_data.get("learnings", []),
+            questions_raised=ai_journal_data.get("questions_raised", [])
+        )
+    )
+
+
+def register_post_turn_handlers(queue: WorkQueue) -> None:
+    queue.register(ANALYZE_TURN_JOB, analyze_turn)
+    queue.register(EXTRACT_MEMORIES_JOB, extract_turn_memories)
+    queue.register(AI_JOURNAL_JOB, create_turn_ai_journal)
+
+
+async def enqueue_post_turn(
+    user_id: str,
+    conversation_id: str,
+    user_message: str,
+    ai_response: str,
+    context: str = ""
+) -> None:
+    """Queue the combined memory extraction / AI journal analysis for a stored turn."""
+    queue = get_work_queue()
+    register_post_turn_handlers(queue)
+    payload = {
+        "user_id": user_id,
+        "conversation_id": conversation_id,
+        "user_message": user_message,
+        "ai_response": ai_response,
+        "context": context
+    }
+    await queue.enqueue(ANALYZE_TURN_JOB, user_id, payload)
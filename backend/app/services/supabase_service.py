@@ -1,111 +1,215 @@
+import asyncio
 import os
-from supabase import create_client, Client
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import httpx
+from cachetools import TTLCache
+from supabase import create_client, acreate_client, Client, AsyncClient
+from supabase.lib.client_options import AsyncClientOptions
 from dotenv import load_dotenv
 
 load_dotenv()
 
 _supabase_client: Client = None
+_async_supabase_client: Optional[AsyncClient] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_async_client_lock: Optional[asyncio.Lock] = None
+
+
+def _supabase_credentials() -> Tuple[str, str]:
+    url = os.getenv("SUPABASE_URL")
+    key = (
+        os.getenv("SUPABASE_KEY")
+        or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        or os.getenv("SUPABASE_SECRET")
+    )
+    if not url or not key:
+        raise ValueError(
+            "SUPABASE_URL and one of SUPABASE_KEY / SUPABASE_SERVICE_ROLE_KEY / SUPABASE_SECRET must be set"
+        )
+    return url, key
 
 
 def get_supabase_client() -> Client:
     """Get or create Supabase client singleton"""
     global _supabase_client
     if _supabase_client is None:
-        url = os.getenv("SUPABASE_URL")
-        key = (
-            os.getenv("SUPABASE_KEY")
-            or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-            or os.getenv("SUPABASE_SECRET")
-        )
-        if not url or not key:
-            raise ValueError(
-                "SUPABASE_URL and one of SUPABASE_KEY / SUPABASE_SERVICE_ROLE_KEY / SUPABASE_SECRET must be set"
-            )
+        url, key = _supabase_credentials()
         _supabase_client = create_client(url, key)
     return _supabase_client
 
 
+async def get_async_supabase_client() -> AsyncClient:
+    """Get or create the async Supabase client singleton (used by app.repositories).
+
+    All PostgREST calls share one pooled HTTP/2 connection pool.
+    """
+    global _async_supabase_client, _async_http_client, _async_client_lock
+    if _async_supabase_client is not None:
+        return _async_supabase_client
+    if _async_client_lock is None:
+        _async_client_lock = asyncio.Lock()
+    async with _async_client_lock:
+        if _async_supabase_client is None:
+            url, key = _supabase_credentials()
+            _async_http_client = httpx.AsyncClient(
+                http2=True,
+                follow_redirects=True,
+                timeout=float(os.getenv("SUPABASE_TIMEOUT_S", "10")),
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20")),
+                    max_keepalive_connections=int(os.getenv("SUPABASE_MAX_KEEPALIVE", "10"))
+                )
+            )
+            _async_supabase_client = await acreate_client(
+                url,
+                key,
+                options=AsyncClientOptions(httpx_client=_async_http_client)
+            )
+    return _async_supabase_client
+
+
+async def close_async_supabase_client() -> None:
+    """Close the shared async connection pool (on app shutdown)."""
+    global _async_supabase_client, _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+    _async_supabase_client = None
+    _async_http_client = None
+
+
 # Demo user ID used by frontend; use a fixed short username to avoid long/duplicate issues
 DEMO_USER_ID = "00000000-0000-0000-0000-000000000000"
 DEMO_USERNAME = "demo_user"
 
+# Users confirmed to exist, so ensure_user_exists can skip the database for them
+KNOWN_USER_TTL_S = float(os.getenv("KNOWN_USER_TTL_S", "3600"))
+KNOWN_USER_CACHE_SIZE = int(os.getenv("KNOWN_USER_CACHE_SIZE", "10000"))
+_known_users: TTLCache = TTLCache(maxsize=KNOWN_USER_CACHE_SIZE, ttl=KNOWN_USER_TTL_S)
+_known_users_lock = threading.Lock()
+# Single-flight creation: one in-progress attempt per new user
+_creation_locks: Dict[str, threading.Lock] = {}
+_creation_tasks: Dict[str, "asyncio.Task[bool]"] = {}
+
+
+def _is_known_user(user_id: str) -> bool:
+    with _known_users_lock:
+        return user_id in _known_users
+
+
+def _mark_known_user(user_id: str) -> None:
+    with _known_users_lock:
+        _known_users[user_id] = True
+
+
+def forget_known_user(user_id: str) -> None:
+    """Drop a user from the known-user cache (call after deleting the user row)."""
+    with _known_users_lock:
+        _known_users.pop(user_id, None)
+
+
+def _new_user_row(user_id: str) -> Dict:
+    if user_id == DEMO_USER_ID:
+        username = DEMO_USERNAME
+    else:
+        # Use user_id (without hyphens) as username to ensure uniqueness
+        username = f"user_{user_id.replace('-', '')}"
+    return {"id": user_id, "username": username, "settings": {}}
+
+
+def _fallback_username(user_id: str) -> str:
+    timestamp_suffix = datetime.now().strftime("%Y%m%d%H%M%S%f")[:16]
+    return f"user_{user_id.replace('-', '')[:10]}_{timestamp_suffix}"
+
+
+def _is_unique_violation(error: Exception) -> bool:
+    error_str = str(error).lower()
+    return "duplicate" in error_str or "unique" in error_str or "23505" in error_str
+
+
+def _upsert_user(user_id: str) -> None:
+    """
+    Create the user row unless one with this id already exists.
+
+    ``on_conflict=id`` + ``ignore_duplicates`` makes an existing user a no-op, so
+    no prior SELECT is needed. A unique violation can then only come from the
+    username, which is retried once with a suffixed name.
+    """
+    table = get_supabase_client().table("users")
+    user_data = _new_user_row(user_id)
+    try:
+        table.upsert(user_data, on_conflict="id", ignore_duplicates=True).execute()
+    except Exception as e:
+        if not _is_unique_violation(e):
+            raise
+        user_data = {**user_data, "username": _fallback_username(user_id)}
+        table.upsert(user_data, on_conflict="id", ignore_duplicates=True).execute()
+
 
 def ensure_user_exists(user_id: str) -> bool:
     """
     Ensure a user exists in the users table. Create if not exists.
     Returns True if user exists or was created, False on error.
     """
-    client = get_supabase_client()
+    if _is_known_user(user_id):
+        return True
     
-    try:
-        # Check if user exists
-        result = client.table("users").select("id").eq("id", user_id).execute()
-        
-        if result.data and len(result.data) > 0:
-            # User already exists
+    with _known_users_lock:
+        lock = _creation_locks.setdefault(user_id, threading.Lock())
+    with lock:
+        # Another thread may have created the user while we waited
+        if _is_known_user(user_id):
             return True
-        
-        # User doesn't exist, create it
-        if user_id == DEMO_USER_ID:
-            username = DEMO_USERNAME
-        else:
-            # Use user_id (without hyphens) as username to ensure uniqueness
-            username = f"user_{user_id.replace('-', '')}"
-        
-        user_data = {
-            "id": user_id,
-            "username": username,
-            "settings": {}
-        }
-        
         try:
-            insert_result = client.table("users").insert(user_data).execute()
-            
-            if insert_result.data:
-                return True
-            else:
-                print(f"Failed to create user {user_id}")
-                return False
-        except Exception as insert_error:
-            # If insert fails due to duplicate username, try with timestamp suffix
-            error_str = str(insert_error).lower()
-            if "duplicate" in error_str or "unique" in error_str or "violates unique constraint" in error_str:
-                # Username conflict, try with timestamp
-                from datetime import datetime
-                timestamp_suffix = datetime.now().strftime("%Y%m%d%H%M%S%f")[:16]
-                username = f"user_{user_id.replace('-', '')[:10]}_{timestamp_suffix}"
-                user_data["username"] = username
-                
-                try:
-                    insert_result = client.table("users").insert(user_data).execute()
-                    if insert_result.data:
-                        return True
-                except:
-                    pass
-            
-            # If still fails, check if user was created by another request (race condition)
-            # by checking if user_id now exists
-            try:
-                check_result = client.table("users").select("id").eq("id", user_id).execute()
-                if check_result.data and len(check_result.data) > 0:
-                    return True
-            except:
-                pass
-            
-            print(f"Error creating user {user_id}: {insert_error}")
+            _upsert_user(user_id)
+            _mark_known_user(user_id)
+            return True
+        except Exception as e:
+            print(f"Error ensuring user exists: {e}")
             return False
-            
-    except Exception as e:
-        # Final fallback: check if user exists (might have been created by another request)
+        finally:
+            with _known_users_lock:
+                _creation_locks.pop(user_id, None)
+
+
+async def _create_user_async(user_id: str) -> bool:
+    from app.repositories.user_repository import UserRepository
+    users = UserRepository()
+    user_data = _new_user_row(user_id)
+    try:
         try:
-            check_result = client.table("users").select("id").eq("id", user_id).execute()
-            if check_result.data and len(check_result.data) > 0:
-                return True
-        except:
-            pass
-        
+            await users.upsert(user_data)
+        except Exception as e:
+            if not _is_unique_violation(e):
+                raise
+            user_data = {**user_data, "username": _fallback_username(user_id)}
+            await users.upsert(user_data)
+        _mark_known_user(user_id)
+        return True
+    except Exception as e:
         print(f"Error ensuring user exists: {e}")
         return False
+    finally:
+        _creation_tasks.pop(user_id, None)
+
+
+async def ensure_user_exists_async(user_id: str) -> bool:
+    """
+    Async variant of ensure_user_exists, using the pooled async client.
+    Returns True if user exists or was created, False on error.
+
+    Concurrent first requests for the same user await one shared creation task;
+    it is shielded so a caller timing out does not cancel it for the others.
+    """
+    if _is_known_user(user_id):
+        return True
+    
+    task = _creation_tasks.get(user_id)
+    if task is None:
+        task = asyncio.ensure_future(_create_user_async(user_id))
+        _creation_tasks[user_id] = task
+    return await asyncio.shield(task)
 
 
 def init_database():
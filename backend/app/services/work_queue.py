@@ -0,0 +1,327 @@
+"""
+Background work queue for jobs that must not block the request path.
+
+- Bounded asyncio worker pool; jobs for the same user always land on the same
+  worker, so they run in the order they were enqueued.
+- Every job is spooled to a local JSON file before it is queued and removed
+  once it succeeds, so pending jobs survive a process restart (at-least-once).
+  Spool files are tagged with the owning process id; on start a process only
+  replays its own files and those of processes that are gone, claiming each
+  with an atomic rename, so several workers can share one spool directory.
+- Failed jobs are retried with exponential backoff; jobs that exhaust their
+  attempts are moved to the spool's ``failed/`` folder for inspection.
+  Handlers may checkpoint progress in the payload dict: it is passed again
+  to the retry and re-spooled with it.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from app.utils.metrics import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    user_id: str
+    payload: Dict[str, Any]
+    enqueued_at: float
+    attempts: int = 0
+
+
+class WorkQueue:
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+        spool_dir: Optional[str] = None,
+        max_attempts: Optional[int] = None,
+        base_backoff_s: float = 1.0,
+        max_backoff_s: float = 60.0
+    ):
+        self.num_workers = max(1, num_workers or int(os.getenv("WORK_QUEUE_WORKERS", "4")))
+        self.max_queue_size = max_queue_size or int(os.getenv("WORK_QUEUE_MAX_SIZE", "1000"))
+        self.spool_dir = spool_dir or os.getenv(
+            "WORK_QUEUE_SPOOL_DIR",
+            os.path.join(tempfile.gettempdir(), "tymon-work-queue")
+        )
+        self.max_attempts = max_attempts or int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "5"))
+        self.base_backoff_s = base_backoff_s
+        self.max_backoff_s = max_backoff_s
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self._started = False
+        self._spool_enabled = True
+        self._owner = os.getpid()
+
+        self._in_flight = 0
+        self._counters = {"enqueued": 0, "completed": 0, "failed": 0, "retried": 0, "recovered": 0}
+        self._latency = LatencyTracker()
+        self._run_time = LatencyTracker()
+        self._kind_counters: Dict[str, Dict[str, int]] = {}
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """Register the handler for a job kind (idempotent)."""
+        self._handlers[kind] = handler
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def start(self) -> None:
+        """Start workers and re-queue any jobs left in the spool by a previous process."""
+        if self._started:
+            return
+        self._started = True
+        self._queues = [asyncio.Queue(maxsize=self.max_queue_size) for _ in range(self.num_workers)]
+        self._workers = [
+            asyncio.create_task(self._worker(index), name=f"work-queue-{index}")
+            for index in range(self.num_workers)
+        ]
+        recovered = await asyncio.to_thread(self._load_spool)
+        for job in recovered:
+            await self._shard(job.user_id).put(job)
+        if recovered:
+            self._counters["recovered"] += len(recovered)
+            logger.info("Work queue recovered %d spooled job(s)", len(recovered))
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Drain queued jobs for up to ``timeout`` seconds, then cancel workers.
+
+        Jobs that did not finish stay in the spool and run after the next start.
+        """
+        if not self._started:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Work queue stop timed out with %d job(s) pending", self.depth())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queues = []
+        self._started = False
+
+    async def enqueue(self, kind: str, user_id: str, payload: Dict[str, Any]) -> str:
+        """Spool and queue a job; returns the job id. Starts the workers if needed."""
+        if not self._started:
+            await self.start()
+        job = Job(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            user_id=user_id,
+            payload=payload,
+            enqueued_at=time.time()
+        )
+        await asyncio.to_thread(self._spool_write, job)
+        await self._shard(user_id).put(job)
+        self._counters["enqueued"] += 1
+        self._count(kind, "enqueued")
+        return job.id
+
+    def depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._started,
+            "workers": self.num_workers,
+            "depth": self.depth(),
+            "depth_per_worker": [queue.qsize() for queue in self._queues],
+            "in_flight": self._in_flight,
+            "spool_enabled": self._spool_enabled,
+            **self._counters,
+            "by_kind": self._kind_counters,
+            "latency": self._latency.snapshot(),
+            "run_time": self._run_time.snapshot(),
+        }
+
+    def _shard(self, user_id: str) -> asyncio.Queue:
+        return self._queues[zlib.crc32(user_id.encode("utf-8")) % self.num_workers]
+
+    def _count(self, kind: str, key: str) -> None:
+        counters = self._kind_counters.setdefault(kind, {})
+        counters[key] = counters.get(key, 0) + 1
+
+    async def _worker(self, index: int) -> None:
+        queue = self._queues[index]
+        while True:
+            job = await queue.get()
+            try:
+                await self._run_with_retry(job)
+            except Exception:
+                logger.exception("Work queue worker %d crashed on job %s", index, job.id)
+            finally:
+                queue.task_done()
+
+    async def _run_with_retry(self, job: Job) -> None:
+        handler = self._handlers.get(job.kind)
+        if handler is None:
+            logger.error("No handler registered for job kind %r (job %s)", job.kind, job.id)
+            self._finish_failed(job)
+            return
+
+        while True:
+            job.attempts += 1
+            error: Optional[Exception] = None
+            self._in_flight += 1
+            started = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(handler):
+                    await handler(job.payload)
+                else:
+                    await asyncio.to_thread(handler, job.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+            finally:
+                self._in_flight -= 1
+                self._run_time.observe((time.perf_counter() - started) * 1000)
+
+            if error is None:
+                self._counters["completed"] += 1
+                self._count(job.kind, "completed")
+                self._latency.observe((time.time() - job.enqueued_at) * 1000)
+                await asyncio.to_thread(self._spool_remove, job)
+                return
+
+            if job.attempts >= self.max_attempts:
+                logger.error("Job %s (%s) failed after %d attempts: %s", job.id, job.kind, job.attempts, error)
+                self._finish_failed(job)
+                return
+
+            delay = self._backoff(job.attempts)
+            logger.warning(
+                "Job %s (%s) attempt %d failed: %s - retrying in %.1fs",
+                job.id, job.kind, job.attempts, error, delay
+            )
+            self._counters["retried"] += 1
+            self._count(job.kind, "retried")
+            await asyncio.to_thread(self._spool_write, job)
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.max_backoff_s, self.base_backoff_s * (2 ** (attempts - 1)))
+        return delay * (0.5 + random.random() / 2)
+
+    def _finish_failed(self, job: Job) -> None:
+        self._counters["failed"] += 1
+        self._count(job.kind, "failed")
+        if not self._spool_enabled:
+            return
+        try:
+            failed_dir = os.path.join(self.spool_dir, "failed")
+            os.makedirs(failed_dir, exist_ok=True)
+            os.replace(self._spool_path(job), os.path.join(failed_dir, f"{job.id}.json"))
+        except OSError as e:
+            logger.warning("Could not move failed job %s out of the spool: %s", job.id, e)
+
+    # Spool (one JSON file per pending job; file name sorts by enqueue time and names the owning pid)
+    def _spool_path(self, job: Job) -> str:
+        return os.path.join(self.spool_dir, f"{int(job.enqueued_at * 1e6):020d}-{job.id}.{self._owner}.json")
+
+    def _spool_write(self, job: Job) -> None:
+        if not self._spool_enabled:
+            return
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            path = self._spool_path(job)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(asdict(job), f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Keep serving from memory; jobs just won't survive a restart
+            self._spool_enabled = False
+            logger.warning("Work queue spool disabled (%s): %s", self.spool_dir, e)
+
+    def _spool_remove(self, job: Job) -> None:
+        if not self._spool_enabled:
+            return
+        try:
+            os.remove(self._spool_path(job))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Could not remove spooled job %s: %s", job.id, e)
+
+    def _load_spool(self) -> List[Job]:
+        if not os.path.isdir(self.spool_dir):
+            return []
+        jobs = []
+        for name in sorted(os.listdir(self.spool_dir)):
+            if not name.endswith(".json"):
+                continue
+            path = self._claim(name)
+            if path is None:
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    jobs.append(Job(**json.load(f)))
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning("Skipping unreadable spooled job %s: %s", name, e)
+        return jobs
+
+    def _claim(self, name: str) -> Optional[str]:
+        """
+        Take over a spool file left by this pid or by a process that is gone
+        (renamed to this process's name, so only one process replays it);
+        None if another live process owns it or claimed it first.
+        """
+        stem, _, owner = name[:-len(".json")].partition(".")
+        if owner and owner.isdigit() and int(owner) != self._owner and _process_alive(int(owner)):
+            return None
+        path = os.path.join(self.spool_dir, f"{stem}.{self._owner}.json")
+        if name == os.path.basename(path):
+            return path
+        try:
+            os.rename(os.path.join(self.spool_dir, name), path)
+        except FileNotFoundError:
+            return None
+        return path
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == "nt":
+        # os.kill(pid, 0) is not a probe on Windows; assume a single process per spool there
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Singleton instance
+_work_queue: Optional[WorkQueue] = None
+
+
+def get_work_queue() -> WorkQueue:
+    """Get or create work queue singleton"""
+    global _work_queue
+    if _work_queue is None:
+        _work_queue = WorkQueue()
+    return _work_queue
@@ -0,0 +1,94 @@
+"""
+Incremental BM25 inverted index with roaring-bitmap postings
+"""
+
+import math
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from pyroaring import BitMap
+
+from app.utils.text_analyzer import analyze
+
+
+class BM25Index:
+    """
+    Okapi BM25 over short documents keyed by string id.
+
+    Postings are compressed bitmaps of internal document numbers, so the
+    candidate set for a query is one bitmap union; term frequencies and lengths
+    are kept per document for scoring. Documents can be added, replaced and
+    removed at any time.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, BitMap] = {}
+        self._term_freqs: Dict[int, Counter] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+        self._doc_numbers: Dict[str, int] = {}
+        self._doc_keys: Dict[int, str] = {}
+        self._next_doc = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def add(self, key: str, text: str) -> None:
+        """Index ``text`` under ``key``, replacing any previous text for it."""
+        self.remove(key)
+        terms = Counter(analyze(text))
+        doc = self._next_doc
+        self._next_doc += 1
+        self._doc_numbers[key] = doc
+        self._doc_keys[doc] = key
+        self._term_freqs[doc] = terms
+        length = sum(terms.values())
+        self._lengths[doc] = length
+        self._total_length += length
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = BitMap()
+            postings.add(doc)
+
+    def remove(self, key: str) -> None:
+        doc = self._doc_numbers.pop(key, None)
+        if doc is None:
+            return
+        del self._doc_keys[doc]
+        self._total_length -= self._lengths.pop(doc)
+        for term in self._term_freqs.pop(doc):
+            postings = self._postings[term]
+            postings.discard(doc)
+            if not postings:
+                del self._postings[term]
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """BM25 score of every document sharing at least one query term."""
+        terms = [term for term in set(analyze(query)) if term in self._postings]
+        if not terms:
+            return {}
+        total_docs = len(self._doc_numbers)
+        avg_length = self._total_length / total_docs if total_docs else 0.0
+        idf = {
+            term: math.log(1 + (total_docs - len(self._postings[term]) + 0.5) / (len(self._postings[term]) + 0.5))
+            for term in terms
+        }
+        candidates = BitMap.union(*(self._postings[term] for term in terms))
+        results: Dict[str, float] = {}
+        for doc in candidates:
+            freqs = self._term_freqs[doc]
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[doc] / avg_length) if avg_length else self.k1
+            score = 0.0
+            for term in terms:
+                tf = freqs.get(term)
+                if tf:
+                    score += idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results[self._doc_keys[doc]] = score
+        return results
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        ranked = sorted(self.scores(query).items(), key=lambda item: item[1], reverse=True)
+        return ranked[:k]
@@ -0,0 +1,78 @@
+"""
+Paragraph-aligned chunking of long texts (journal entries) for LLM extraction
+"""
+
+import hashlib
+import re
+from typing import List, Tuple
+
+_PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+|\n")
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """Non-empty paragraphs (blocks separated by blank lines), stripped"""
+    return [paragraph.strip() for paragraph in _PARAGRAPH_BREAK_RE.split(text or "") if paragraph.strip()]
+
+
+def paragraph_hash(paragraph: str) -> str:
+    """Stable id of a paragraph's text (whitespace-insensitive), used to diff journal versions"""
+    return hashlib.sha1(" ".join(paragraph.split()).encode("utf-8")).hexdigest()[:16]
+
+
+def _split_long(paragraph: str, max_chars: int) -> List[str]:
+    """A paragraph longer than max_chars, cut at sentence ends (hard cut for run-on sentences)"""
+    pieces: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END_RE.split(paragraph):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:].strip()
+        if not sentence:
+            continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def pack_paragraphs(paragraphs: List[str], max_chars: int) -> List[Tuple[str, List[int]]]:
+    """
+    Greedily pack whole paragraphs into chunks of at most ``max_chars``.
+    Only a paragraph that is longer than ``max_chars`` by itself is split.
+    Returns each chunk with the indexes of the paragraphs it holds (part of).
+    """
+    chunks: List[Tuple[str, List[int]]] = []
+    current: List[str] = []
+    sources: List[int] = []
+    size = 0
+    for index, paragraph in enumerate(paragraphs):
+        for piece in _split_long(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph]:
+            added = len(piece) + (2 if current else 0)
+            if current and size + added > max_chars:
+                chunks.append(("\n\n".join(current), sources))
+                current, sources, size = [], [], 0
+                added = len(piece)
+            current.append(piece)
+            if not sources or sources[-1] != index:
+                sources.append(index)
+            size += added
+    if current:
+        chunks.append(("\n\n".join(current), sources))
+    return chunks
+
+
+def chunk_paragraphs(paragraphs: List[str], max_chars: int) -> List[str]:
+    return [chunk for chunk, _ in pack_paragraphs(paragraphs, max_chars)]
+
+
+def chunk_text(text: str, max_chars: int) -> List[str]:
+    return chunk_paragraphs(split_paragraphs(text), max_chars)
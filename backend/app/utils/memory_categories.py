@@ -0,0 +1,158 @@
+"""
+Keyword rules for memory categories and types, compiled into one word-boundary regex
+"""
+
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+# JSON file replacing DEFAULT_RULES: {"categories": {label: [keywords]}, "constraint": [keywords]}
+MEMORY_CATEGORY_RULES_FILE = os.getenv("MEMORY_CATEGORY_RULES_FILE", "")
+
+CONSTRAINT = "constraint"
+
+# Categories in priority order: the first one that matches wins. A keyword
+# matches whole words only; a trailing "*" also matches longer words
+# ("friend*" -> friends, friendship).
+DEFAULT_RULES: Dict[str, Any] = {
+    "categories": {
+        "preference": [
+            "like", "likes", "liked", "prefer", "prefers", "preferred", "favorite*", "favourite*",
+            "love", "loves", "loved", "hate", "hates", "hated", "dislike", "dislikes", "disliked"
+        ],
+        "personal_info": [
+            "name", "named", "age", "aged", "born", "live", "lives", "lived", "living", "from"
+        ],
+        "relationship": [
+            "friend*", "family", "families", "relationship*", "know", "knows", "knew", "known"
+        ],
+        "goal": [
+            "goal*", "want", "wants", "wanted", "plan", "plans", "planned", "planning",
+            "dream*", "aspire*"
+        ],
+    },
+    CONSTRAINT: [
+        "don't", "dont", "do not", "avoid*", "cannot", "can't", "can not", "never",
+        "allergic", "allergy", "allergies", "boundary", "boundaries", "limit", "limits"
+    ],
+}
+
+_SPACE_RE = re.compile(r"\s+")
+# Categories that become the memory type of the same name (other categories are "fact")
+_TYPED_CATEGORIES = frozenset({"goal", "relationship", "preference"})
+
+
+def _normalize(text: str) -> str:
+    return _SPACE_RE.sub(" ", text.lower().replace("’", "'"))
+
+
+def _keyword_pattern(keyword: str) -> str:
+    prefix = keyword.endswith("*")
+    words = _normalize(keyword.rstrip("*")).split()
+    pattern = r"\s+".join(re.escape(word) for word in words)
+    return pattern + r"[\w']*" if prefix else pattern
+
+
+class KeywordMatcher:
+    """
+    Labels whose keywords occur in a text, found in a single regex scan.
+
+    All keywords of all labels are compiled into one alternation (longest
+    first) bounded by word/apostrophe lookarounds, so "from" does not match
+    "frompt" and "know" does not match "knowledge". The matched text is mapped
+    back to every label that lists it.
+    """
+
+    def __init__(self, rules: Mapping[str, Iterable[str]]):
+        self.labels: Tuple[str, ...] = tuple(rules)
+        self._exact: Dict[str, Set[str]] = {}
+        self._prefixes: List[Tuple[str, str]] = []
+        patterns = set()
+        for label, keywords in rules.items():
+            for keyword in keywords:
+                keyword = keyword.strip()
+                if not keyword.rstrip("*"):
+                    continue
+                if keyword.endswith("*"):
+                    self._prefixes.append((_normalize(keyword.rstrip("*")), label))
+                else:
+                    self._exact.setdefault(_normalize(keyword), set()).add(label)
+                patterns.add(_keyword_pattern(keyword))
+        alternation = "|".join(sorted(patterns, key=len, reverse=True)) or r"(?!)"
+        self._regex = re.compile(rf"(?<![\w'])(?:{alternation})(?![\w'])")
+
+    def labels_in(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        for match in self._regex.finditer(_normalize(text)):
+            keyword = match.group(0)
+            found |= self._exact.get(keyword, set())
+            found.update(label for prefix, label in self._prefixes if keyword.startswith(prefix))
+        return found
+
+
+class MemoryCategorizer:
+    """Category and memory type for memory content, from one KeywordMatcher scan per text"""
+
+    def __init__(self, rules: Optional[Mapping[str, Any]] = None):
+        rules = rules or DEFAULT_RULES
+        self.categories: Tuple[str, ...] = tuple(rules.get("categories", {}))
+        self.matcher = KeywordMatcher({**rules.get("categories", {}), CONSTRAINT: rules.get(CONSTRAINT, [])})
+
+    def category(self, labels: Set[str]) -> str:
+        return next((category for category in self.categories if category in labels), "fact")
+
+    @staticmethod
+    def memory_type(labels: Set[str], category: Optional[str]) -> str:
+        if CONSTRAINT in labels:
+            return CONSTRAINT
+        return category if category in _TYPED_CATEGORIES else "fact"
+
+    def classify(
+        self,
+        content: str,
+        category: Optional[str] = None,
+        memory_type: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """(category, memory_type), keeping the ones given and inferring the rest"""
+        if category and memory_type:
+            return category, memory_type
+        labels = self.matcher.labels_in(content)
+        category = category or self.category(labels)
+        return category, memory_type or self.memory_type(labels, category)
+
+    def classify_many(self, memories: Sequence[Mapping[str, Any]]) -> List[Tuple[str, str]]:
+        """
+        classify for a whole extraction result (dicts with content, optional
+        category and memory_type; category "other" counts as missing)
+        """
+        results = []
+        for mem in memories:
+            category = mem.get("category")
+            results.append(self.classify(
+                mem.get("content") or "",
+                None if category == "other" else category,
+                mem.get("memory_type")
+            ))
+        return results
+
+
+def load_category_rules(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    if not isinstance(rules.get("categories"), dict):
+        raise ValueError(f"{path}: 'categories' must map category -> keywords")
+    return rules
+
+
+# Singleton instance
+_categorizer: Optional[MemoryCategorizer] = None
+
+
+def get_memory_categorizer() -> MemoryCategorizer:
+    """Get or create the memory categorizer (rules from MEMORY_CATEGORY_RULES_FILE if set)"""
+    global _categorizer
+    if _categorizer is None:
+        rules = load_category_rules(MEMORY_CATEGORY_RULES_FILE) if MEMORY_CATEGORY_RULES_FILE else DEFAULT_RULES
+        _categorizer = MemoryCategorizer(rules)
+    return _categorizer
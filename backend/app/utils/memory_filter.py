@@ -2,9 +2,16 @@
 Memory filtering logic - determine what to keep and what to discard
 """
 
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Sequence
 from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
 from app.models.memory import Memory
+from app.models.records import Record
+from app.utils.memory_categories import get_memory_categorizer
+
+_SECONDS_PER_DAY = 86400.0
 
 
 def _ensure_aware(dt: datetime) -> datetime:
@@ -50,16 +57,12 @@ def compute_ttl_days(
     return max(7, min(ttl_days, 1825))
 
 
-def compute_decay_score(
+def decay_half_life_days(
     importance_score: float,
-    last_accessed: Optional[datetime],
     memory_type: Optional[str] = None,
-    stability: float = 0.5,
-    now: Optional[datetime] = None
+    stability: float = 0.5
 ) -> float:
-    now = _ensure_aware(now) if now else _now_utc()
-    last_accessed = _ensure_aware(last_accessed) if last_accessed else now
-    days_since = max(0, (now - last_accessed).days)
+    """Days after the last access at which decay reaches its 0.1 floor"""
     tier = get_memory_tier(importance_score)
     base_half_life = {"high": 180, "medium": 90, "low": 30}[tier]
     type_bonus = {
@@ -70,7 +73,20 @@ def compute_decay_score(
         "fact": 0
     }.get(memory_type or "fact", 0)
     stability_multiplier = 0.6 + 0.8 * clamp(stability, 0, 1)
-    effective_half_life = base_half_life * stability_multiplier + type_bonus
+    return base_half_life * stability_multiplier + type_bonus
+
+
+def compute_decay_score(
+    importance_score: float,
+    last_accessed: Optional[datetime],
+    memory_type: Optional[str] = None,
+    stability: float = 0.5,
+    now: Optional[datetime] = None
+) -> float:
+    now = _ensure_aware(now) if now else _now_utc()
+    last_accessed = _ensure_aware(last_accessed) if last_accessed else now
+    days_since = max(0, (now - last_accessed).days)
+    effective_half_life = decay_half_life_days(importance_score, memory_type, stability)
     decay_multiplier = max(0.1, 1 - (days_since / max(1, effective_half_life)))
     return round(importance_score * decay_multiplier, 4)
 
@@ -89,6 +105,69 @@ def is_memory_expired(memory: Memory, now: Optional[datetime] = None) -> bool:
     return False
 
 
+# Column order of decay_features rows (timestamps are epoch seconds, NaN if unknown)
+DECAY_FEATURES = (
+    "importance_score", "half_life_days", "last_accessed", "created_at",
+    "ttl_days", "access_count", "is_pinned"
+)
+
+
+def _epoch(value: Any) -> float:
+    if value is None:
+        return float("nan")
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return _ensure_aware(value).timestamp()
+
+
+def decay_features(memory: Dict[str, Any]) -> List[float]:
+    """One memory (row dict, MemoryRecord or Memory.model_dump()) as a DECAY_FEATURES row"""
+    importance = float(memory.get("importance_score") or 0.0)
+    stability = memory.get("stability")
+    return [
+        importance,
+        decay_half_life_days(importance, memory.get("memory_type"), 0.5 if stability is None else stability),
+        _epoch(memory.get("last_accessed")),
+        _epoch(memory.get("created_at")),
+        float(memory.get("ttl_days") or 0),
+        float(memory.get("access_count") or 0),
+        1.0 if memory.get("is_pinned") else 0.0,
+    ]
+
+
+def decay_feature_matrix(memories: Sequence[Any]) -> np.ndarray:
+    """DECAY_FEATURES matrix for Memory/MemoryRecord objects or row dicts, one row each"""
+    rows = [
+        decay_features(mem if isinstance(mem, (dict, Record)) else mem.model_dump())
+        for mem in memories
+    ]
+    return np.array(rows, dtype=np.float64).reshape(len(rows), len(DECAY_FEATURES))
+
+
+def _whole_days_since(timestamps: np.ndarray, now: datetime) -> np.ndarray:
+    # timedelta.days semantics: floor of the elapsed days
+    return np.floor((_ensure_aware(now).timestamp() - timestamps) / _SECONDS_PER_DAY)
+
+
+def compute_decay_scores(features: np.ndarray, now: Optional[datetime] = None) -> np.ndarray:
+    """compute_decay_score for every row of a DECAY_FEATURES matrix in one pass"""
+    now = now or _now_utc()
+    importance = features[:, 0]
+    days_since = np.nan_to_num(_whole_days_since(features[:, 2], now), nan=0.0).clip(min=0)
+    multiplier = np.maximum(0.1, 1 - days_since / np.maximum(1, features[:, 1]))
+    return np.round(importance * multiplier, 4)
+
+
+def expired_mask(features: np.ndarray, now: Optional[datetime] = None) -> np.ndarray:
+    """is_memory_expired for every row of a DECAY_FEATURES matrix in one pass"""
+    now = now or _now_utc()
+    days_since = _whole_days_since(features[:, 3], now)
+    ttl_days = features[:, 4]
+    past_ttl = (ttl_days > 0) & (days_since > ttl_days)
+    kept_anyway = (features[:, 0] >= 0.8) & (features[:, 5] >= 5)
+    return past_ttl & ~kept_anyway & (features[:, 6] == 0)
+
+
 def should_keep_memory(memory: Memory, days_since_creation: int, access_count: int) -> bool:
     """
     Determine if a memory should be kept or archived
@@ -145,30 +224,11 @@ def filter_unimportant_memories(memories: List[Memory]) -> List[Memory]:
 
 def categorize_memory_content(content: str) -> str:
     """
-    Simple categorization of memory content
+    Category of memory content from the keyword rules (see app.utils.memory_categories)
     """
-    content_lower = content.lower()
-    
-    if any(word in content_lower for word in ["like", "prefer", "favorite", "love", "hate", "dislike"]):
-        return "preference"
-    elif any(word in content_lower for word in ["name", "age", "born", "live", "from"]):
-        return "personal_info"
-    elif any(word in content_lower for word in ["friend", "family", "relationship", "know"]):
-        return "relationship"
-    elif any(word in content_lower for word in ["goal", "want", "plan", "dream", "aspire"]):
-        return "goal"
-    else:
-        return "fact"
+    return get_memory_categorizer().classify(content)[0]
 
 
 def infer_memory_type(content: str, category: Optional[str] = None) -> str:
-    content_lower = content.lower()
-    if any(word in content_lower for word in ["don't", "do not", "avoid", "cannot", "can't", "never", "allergic", "boundary", "limit"]):
-        return "constraint"
-    if category == "goal":
-        return "goal"
-    if category == "relationship":
-        return "relationship"
-    if category == "preference":
-        return "preference"
-    return "fact"
+    categorizer = get_memory_categorizer()
+    return categorizer.memory_type(categorizer.matcher.labels_in(content), category)
@@ -0,0 +1,193 @@
+"""
+Lightweight in-process metrics helpers (no external metrics backend)
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Rolling window of latency samples (milliseconds) with percentile summary."""
+
+    def __init__(self, window: int = 1000):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float) -> None:
+        with self._lock:
+            self._samples.append(value_ms)
+            self._count += 1
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+        if not samples:
+            return {"count": count, "p50_ms": None, "p95_ms": None, "max_ms": None}
+        return {
+            "count": count,
+            "p50_ms": round(percentile(samples, 0.50), 2),
+            "p95_ms": round(percentile(samples, 0.95), 2),
+            "max_ms": round(samples[-1], 2),
+        }
+
+
+def percentile(sorted_samples, q: float) -> float:
+    index = min(len(sorted_samples) - 1, int(round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+class StageStats:
+    """Aggregated per-stage latency and skip counts for one request pipeline."""
+
+    def __init__(self):
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._skipped: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, value_ms: float, skipped: bool = False) -> None:
+        with self._lock:
+            tracker = self._latency.setdefault(stage, LatencyTracker())
+            if skipped:
+                self._skipped[stage] = self._skipped.get(stage, 0) + 1
+        tracker.observe(value_ms)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            stages = dict(self._latency)
+            skipped = dict(self._skipped)
+        return {
+            stage: {**tracker.snapshot(), "skipped": skipped.get(stage, 0)}
+            for stage, tracker in stages.items()
+        }
+
+
+class StageTimeout(Exception):
+    def __init__(self, stage: str, timeout_s: float):
+        super().__init__(f"Stage '{stage}' exceeded its {timeout_s:.2f}s deadline")
+        self.stage = stage
+        self.timeout_s = timeout_s
+
+
+class StageTimings:
+    """Stage durations (ms) for a single request; skipped optional stages are recorded, not raised."""
+
+    def __init__(self, stats: Optional[StageStats] = None):
+        self.durations: Dict[str, float] = {}
+        self.skipped: Dict[str, str] = {}
+        self._stats = stats
+
+    async def run(
+        self,
+        stage: str,
+        awaitable: Awaitable[T],
+        timeout_s: float,
+        required: bool = True,
+        default: Any = None
+    ) -> T:
+        """Await one stage under its deadline.
+
+        Required stages raise StageTimeout (or their own error); optional stages
+        return ``default`` and are marked as skipped.
+        """
+        started = time.perf_counter()
+        skipped_reason = None
+        try:
+            return await asyncio.wait_for(awaitable, timeout=timeout_s)
+        except asyncio.TimeoutError:
+            if required:
+                raise StageTimeout(stage, timeout_s)
+            skipped_reason = "timeout"
+            return default
+        except Exception as e:
+            if required:
+                raise
+            skipped_reason = type(e).__name__
+            return default
+        finally:
+            self.record(stage, (time.perf_counter() - started) * 1000, skipped_reason)
+
+    def record(self, stage: str, value_ms: float, skipped_reason: Optional[str] = None) -> None:
+        self.durations[stage] = round(value_ms, 1)
+        if skipped_reason:
+            self.skipped[stage] = skipped_reason
+        if self._stats is not None:
+            self._stats.observe(stage, value_ms, skipped=skipped_reason is not None)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"stages_ms": dict(self.durations), "skipped": dict(self.skipped)}
+
+    def server_timing(self) -> str:
+        """Value for the HTTP Server-Timing header"""
+        parts = []
+        for stage, value_ms in self.durations.items():
+            part = f"{stage};dur={value_ms}"
+            if stage in self.skipped:
+                part += f';desc="skipped: {self.skipped[stage]}"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+_stage_stats: Dict[str, StageStats] = {}
+
+
+def get_stage_stats(pipeline: str) -> StageStats:
+    """Get or create the named StageStats aggregate (e.g. "chat")"""
+    if pipeline not in _stage_stats:
+        _stage_stats[pipeline] = StageStats()
+    return _stage_stats[pipeline]
+
+
+def all_stage_stats() -> Dict[str, Dict]:
+    return {pipeline: stats.snapshot() for pipeline, stats in _stage_stats.items()}
+
+
+class BatchStats:
+    """Bulk write counters: batch sizes and round trips saved versus one write per item."""
+
+    def __init__(self):
+        self._batches = 0
+        self._items = 0
+        self._max_items = 0
+        self._round_trips = 0
+        self._lock = threading.Lock()
+
+    def observe(self, items: int, round_trips: int) -> None:
+        with self._lock:
+            self._batches += 1
+            self._items += items
+            self._max_items = max(self._max_items, items)
+            self._round_trips += round_trips
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            batches, items, round_trips = self._batches, self._items, self._round_trips
+            max_items = self._max_items
+        return {
+            "batches": batches,
+            "items": items,
+            "avg_batch_size": round(items / batches, 2) if batches else None,
+            "max_batch_size": max_items,
+            "round_trips": round_trips,
+            "round_trips_saved": items - round_trips,
+        }
+
+
+_batch_stats: Dict[str, BatchStats] = {}
+
+
+def get_batch_stats(name: str) -> BatchStats:
+    """Get or create the named BatchStats aggregate (e.g. "memory_writes")"""
+    if name not in _batch_stats:
+        _batch_stats[name] = BatchStats()
+    return _batch_stats[name]
+
+
+def all_batch_stats() -> Dict[str, Dict]:
+    return {name: stats.snapshot() for name, stats in _batch_stats.items()}
@@ -0,0 +1,111 @@
+"""
+MinHash signatures (mmh3) and a banded LSH index for near-duplicate lookup
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import mmh3
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """
+    ``num_perm`` MinHash values per token set.
+
+    Each token is hashed once with mmh3 (32-bit); the permutations are
+    universal hashes ``((a * h + b) mod p) & 0xffffffff`` evaluated with NumPy
+    (uint64 wrap-around intended, as in the usual MinHash implementations).
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, tokens: Iterable[str]) -> np.ndarray:
+        hashes = np.fromiter(
+            (mmh3.hash(token, signed=False) for token in set(tokens)),
+            dtype=np.uint64
+        )
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        permuted = ((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=0)
+
+
+class LSHIndex:
+    """
+    Banded LSH over MinHash signatures.
+
+    With ``bands`` x ``rows`` = ``num_perm``, two sets become candidates when
+    any band matches exactly; the S-curve threshold is about
+    ``(1 / bands) ** (1 / rows)``. Candidates are
+    then checked with the exact Jaccard similarity of the stored token sets.
+    The 32 x 2 default keeps the candidate threshold (~0.18) well below typical
+    merge thresholds, so pairs at 0.6 are found with ~99.9% probability.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        self._keys: Dict[str, Tuple[Set[str], List[bytes]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, key: str, tokens: Iterable[str]) -> None:
+        self.remove(key)
+        token_set = set(tokens)
+        if not token_set:
+            return
+        band_keys = self._band_keys(self.hasher.signature(token_set))
+        for bucket, band_key in zip(self._buckets, band_keys):
+            bucket.setdefault(band_key, set()).add(key)
+        self._keys[key] = (token_set, band_keys)
+
+    def remove(self, key: str) -> None:
+        entry = self._keys.pop(key, None)
+        if entry is None:
+            return
+        for bucket, band_key in zip(self._buckets, entry[1]):
+            members = bucket.get(band_key)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del bucket[band_key]
+
+    def candidates(self, tokens: Iterable[str]) -> Set[str]:
+        token_set = set(tokens)
+        if not token_set:
+            return set()
+        found: Set[str] = set()
+        for bucket, band_key in zip(self._buckets, self._band_keys(self.hasher.signature(token_set))):
+            found |= bucket.get(band_key, set())
+        return found
+
+    def best_match(self, tokens: Iterable[str], threshold: float) -> Optional[Tuple[str, float]]:
+        """Most similar stored key with exact Jaccard >= threshold, if any"""
+        token_set = set(tokens)
+        best: Optional[Tuple[str, float]] = None
+        for key in self.candidates(token_set):
+            score = jaccard(token_set, self._keys[key][0])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
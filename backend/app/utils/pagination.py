@@ -0,0 +1,101 @@
+"""
+Opaque keyset cursors: the sort key of the last row on a page as URL-safe base64 JSON
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if isinstance(value, (date, datetime)) else str(value)
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=_json_default).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, size: int) -> List[Any]:
+    """The ``size`` key values in a cursor from encode_cursor; InvalidCursor if it is not one"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Invalid cursor") from None
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def _quote(value: Any) -> str:
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def keyset_filter(columns: Sequence[str], values: Sequence[Any], descending: bool = True) -> str:
+    """
+    PostgREST ``or`` filter for the rows after ``values`` in ``columns`` order,
+    e.g. ``created_at.lt."t",and(created_at.eq."t",id.lt."i")`` (use with query.or_).
+    """
+    op = "lt" if descending else "gt"
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [f"{prefix}.eq.{_quote(value)}" for prefix, value in zip(columns[:i], values[:i])]
+        after = f"{column}.{op}.{_quote(values[i])}"
+        clauses.append(f"and({','.join(equal + [after])})" if equal else after)
+    return ",".join(clauses)
+
+
+def keyset_page(
+    rows: Sequence[Dict[str, Any]],
+    limit: int,
+    key: Callable[[Dict[str, Any]], Tuple[Any, ...]]
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Split rows fetched with ``limit + 1`` into the page and the cursor of the
+    next one (None on the last page).
+    """
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    return page, encode_cursor(*key(page[-1]))
+
+
+def keyset_query(
+    query: Any,
+    columns: Sequence[str],
+    limit: int,
+    offset: int = 0,
+    after: Optional[Sequence[Any]] = None,
+    descending: bool = True
+) -> Any:
+    """
+    Order a PostgREST query by ``columns`` and fetch one row past the page:
+    the rows after the ``after`` key if given, else from ``offset``.
+    """
+    for column in columns:
+        query = query.order(column, desc=descending)
+    if after:
+        return query.or_(keyset_filter(columns, after, descending)).limit(limit + 1)
+    return query.range(offset, offset + limit)
+
+
+def paged_response(response: Any, items: List[Any], next_cursor: Optional[str], cursor: Optional[str]) -> Any:
+    """
+    ``{items, next_cursor}`` when the client paged with ``?cursor=`` (empty for
+    the first page); otherwise the legacy bare list, with the next cursor in
+    the NEXT_CURSOR_HEADER response header.
+    """
+    if cursor is not None:
+        return {"items": items, "next_cursor": next_cursor}
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return items
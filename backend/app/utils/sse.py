@@ -0,0 +1,82 @@
+"""
+Server-Sent Events helpers
+"""
+
+import asyncio
+import json
+import threading
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_ITEM = "item"
+_ERROR = "error"
+_DONE = "done"
+
+
+def format_sse(data: Any, event: Optional[str] = None) -> str:
+    """Encode one SSE frame with a JSON payload."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _cancel_source(source: Any) -> None:
+    cancel = getattr(source, "cancel", None)
+    if callable(cancel):
+        cancel()
+
+
+async def iterate_in_thread(open_source: Callable[[], Iterable[T]]) -> AsyncIterator[T]:
+    """
+    Consume a blocking iterable on a dedicated thread and yield its items on the event loop.
+
+    ``open_source`` also runs on that thread, so a blocking connect/first-chunk
+    wait never touches the loop. If the consumer stops early (e.g. the client
+    disconnected and the response was cancelled), the source's ``cancel()`` is
+    called so upstream work stops instead of running to completion.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    holder = {}
+
+    def post(kind: str, value: Any = None) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    def produce() -> None:
+        try:
+            source = open_source()
+            holder["source"] = source
+            if stop.is_set():
+                _cancel_source(source)
+                return
+            for item in source:
+                if stop.is_set():
+                    break
+                post(_ITEM, item)
+        except BaseException as e:
+            post(_ERROR, e)
+        finally:
+            post(_DONE)
+
+    threading.Thread(target=produce, name="sse-producer", daemon=True).start()
+    finished = False
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == _DONE:
+                finished = True
+                break
+            if kind == _ERROR:
+                finished = True
+                raise value
+            yield value
+    finally:
+        stop.set()
+        source = holder.get("source")
+        if not finished and source is not None:
+            _cancel_source(source)
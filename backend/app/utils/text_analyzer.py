@@ -0,0 +1,88 @@
+"""
+Query/document analyzer for memory retrieval: word-boundary tokens, vi/en stopwords, diacritic folding
+"""
+
+import re
+import unicodedata
+from typing import List
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Matched before folding, so e.g. "mà" (but) is dropped while "má" (mother) is kept
+STOPWORDS_EN = frozenset("""
+a an the is are was were be been being am to of in on at for and or but with as by it its
+this that these those i you he she we they me my your our their his her them us do does did
+have has had not no so if then than too very can will would should could just about from
+what which who whom how when where why there here all any some more most up out into over
+also only own same such s t im ive dont
+""".split())
+
+STOPWORDS_VI = frozenset("""
+là và của có không được cho với các những một này đó thì mà ở trong khi cũng đã đang sẽ
+rất như để nhưng hay hoặc vì nên nếu thế vậy gì nào ạ à ừ nhé nha ơi thôi lại ra vào lên
+đây kia ấy bị bởi tại từ theo về trên dưới sau trước cả mỗi chỉ còn đều vẫn tôi mình bạn
+họ chúng ta nó thấy làm
+""".split())
+
+STOPWORDS = STOPWORDS_EN | STOPWORDS_VI
+
+
+def fold_diacritics(text: str) -> str:
+    """Strip accents so "cà phê" and "ca phe" (unaccented typing) match; đ -> d."""
+    decomposed = unicodedata.normalize("NFD", text)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return stripped.replace("đ", "d").replace("Đ", "D")
+
+
+# Negation cues (matched before folding). Stopword lists drop them, which is fine for
+# ranking but not for deduplication: "not allergic" must not merge into "allergic".
+NEGATIONS = frozenset("""
+not no never nor neither none nothing nobody cannot without dont doesnt didnt isnt arent
+wasnt werent wont cant havent hasnt shouldnt wouldnt couldnt
+không chẳng chả chưa đừng chớ ko
+""".split())
+
+# English n't contractions ("can't", "don’t") are rewritten to a separate "not"
+_CONTRACTION_RE = re.compile(r"n['’]t\b")
+# A negation applies up to the end of its clause
+_CLAUSE_BREAK_RE = re.compile(r"[.,;:!?\n]+|\b(?:but|nhưng)\b")
+
+
+def _token(word: str) -> str:
+    """Folded index token for a lowercased word ('' if it is a stopword or too short)."""
+    if word in STOPWORDS:
+        return ""
+    folded = fold_diacritics(word)
+    if len(folded) < 2 and not folded.isdigit():
+        return ""
+    return folded
+
+
+def analyze(text: str) -> List[str]:
+    """Lowercased, folded word tokens with stopwords and 1-letter tokens removed."""
+    tokens = []
+    for word in _WORD_RE.findall(text.lower()):
+        token = _token(word)
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+def analyze_for_dedupe(text: str) -> List[str]:
+    """
+    Tokens for near-duplicate detection: like analyze, but words after a
+    negation (to the end of the clause) are prefixed with ``not_``, so a
+    statement and its negation share few shingles.
+    """
+    tokens = []
+    text = _CONTRACTION_RE.sub(" not", text.lower())
+    for clause in _CLAUSE_BREAK_RE.split(text):
+        negated = False
+        for word in _WORD_RE.findall(clause):
+            if word in NEGATIONS:
+                negated = True
+                continue
+            token = _token(word)
+            if token:
+                tokens.append(f"not_{token}" if negated else token)
+    return tokens
@@ -0,0 +1,187 @@
+"""
+Offline text embeddings (feature hashing with mmh3) and a NumPy cosine top-k index
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import mmh3
+import numpy as np
+
+from app.utils.text_analyzer import analyze
+
+
+def _features(text: str) -> List[Tuple[str, float]]:
+    """Word unigrams, word bigrams and character trigrams (for inflections / typos)."""
+    words = analyze(text)
+    features: List[Tuple[str, float]] = [(f"w:{w}", 1.0) for w in words]
+    features += [(f"b:{a} {b}", 0.7) for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        features += [(f"c:{padded[i:i + 3]}", 0.3) for i in range(len(padded) - 2)]
+    return features
+
+
+class HashingEmbedder:
+    """
+    Stateless text -> unit vector mapping using the hashing trick.
+
+    Each feature is hashed with mmh3 into one of ``dim`` buckets with a hashed
+    sign, so collisions cancel out on average instead of piling up.
+    """
+
+    def __init__(self, dim: int = 1024, seed: int = 0):
+        self.dim = dim
+        self.seed = seed
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in _features(text):
+            h = mmh3.hash(feature, self.seed, signed=False)
+            vector[h % self.dim] += weight if (h >> 31) & 1 else -weight
+        norm = float(np.linalg.norm(vector))
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+class VectorIndex:
+    """
+    Row-per-item float32 matrix with a per-row boost (e.g. decay score).
+
+    Rows live in one contiguous block that grows by doubling; removal swaps the
+    last row into the hole, so search is always a single matrix-vector product
+    over ``matrix[:size]``. Optionally each row also carries ``attributes``
+    float64 values (e.g. decay inputs) kept in the same row order, so callers
+    can compute a boost for every row with array operations at query time.
+    """
+
+    def __init__(self, dim: int, capacity: int = 64, attributes: int = 0):
+        self.dim = dim
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._boost = np.zeros(capacity, dtype=np.float32)
+        self._attributes = np.zeros((capacity, attributes), dtype=np.float64)
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the row arrays (at current capacity, not size)"""
+        return self._matrix.nbytes + self._boost.nbytes + self._attributes.nbytes
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._positions
+
+    def upsert(
+        self,
+        item_id: str,
+        vector: np.ndarray,
+        boost: float = 0.0,
+        attributes: Optional[Sequence[float]] = None
+    ) -> None:
+        position = self._positions.get(item_id)
+        if position is None:
+            position = len(self._ids)
+            if position == self._matrix.shape[0]:
+                self._grow()
+            self._ids.append(item_id)
+            self._positions[item_id] = position
+        self._matrix[position] = vector
+        self._boost[position] = boost
+        if attributes is not None:
+            self._attributes[position] = attributes
+
+    def set_boost(self, item_id: str, boost: float) -> None:
+        position = self._positions.get(item_id)
+        if position is not None:
+            self._boost[position] = boost
+
+    def set_attributes(self, item_id: str, attributes: Sequence[float]) -> None:
+        position = self._positions.get(item_id)
+        if position is not None:
+            self._attributes[position] = attributes
+
+    def attributes(self) -> np.ndarray:
+        """Per-row attributes in row order (a view; do not keep across writes)"""
+        return self._attributes[:len(self._ids)]
+
+    def remove(self, item_id: str) -> None:
+        position = self._positions.pop(item_id, None)
+        if position is None:
+            return
+        last = len(self._ids) - 1
+        if position != last:
+            moved = self._ids[last]
+            self._matrix[position] = self._matrix[last]
+            self._boost[position] = self._boost[last]
+            self._attributes[position] = self._attributes[last]
+            self._ids[position] = moved
+            self._positions[moved] = position
+        self._ids.pop()
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        relevance_weight: float = 1.0,
+        min_similarity: float = 0.0,
+        lexical: Optional[Dict[str, float]] = None,
+        lexical_weight: float = 0.5,
+        boost: Optional[np.ndarray] = None,
+        exclude: Optional[np.ndarray] = None
+    ) -> List[Tuple[str, float, float]]:
+        """
+        Top-k rows by ``relevance_weight * relevance + (1 - relevance_weight) * boost``.
+
+        Relevance is the cosine, or with ``lexical`` (per-id scores in [0, 1], e.g.
+        normalized BM25) ``(1 - lexical_weight) * cosine + lexical_weight * lexical``.
+        A row is a candidate if its cosine reaches ``min_similarity`` or it has a
+        lexical score. ``boost`` (per row, in row order) replaces the stored
+        boosts and rows set in the ``exclude`` mask are never returned.
+        Returns ``(id, blended_score, cosine)`` tuples, best first.
+        """
+        size = len(self._ids)
+        if size == 0 or k <= 0:
+            return []
+        similarity = self._matrix[:size] @ query
+        relevance = similarity
+        mask = similarity >= min_similarity
+        if lexical:
+            lexical_scores = np.zeros(size, dtype=np.float32)
+            for item_id, value in lexical.items():
+                position = self._positions.get(item_id)
+                if position is not None:
+                    lexical_scores[position] = value
+            relevance = (1.0 - lexical_weight) * similarity + lexical_weight * lexical_scores
+            mask |= lexical_scores > 0
+        if exclude is not None:
+            mask &= ~exclude
+        if boost is None:
+            boost = self._boost[:size]
+        scores = relevance_weight * relevance + (1.0 - relevance_weight) * boost
+        scores = np.where(mask, scores, -np.inf)
+        candidates = int(mask.sum())
+        if candidates == 0:
+            return []
+        k = min(k, candidates)
+        top = np.argpartition(-scores, k - 1)[:k] if k < size else np.arange(size)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (self._ids[i], float(scores[i]), float(similarity[i]))
+            for i in top
+            if np.isfinite(scores[i])
+        ]
+
+    def _grow(self) -> None:
+        capacity = self._matrix.shape[0] * 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        boost = np.zeros(capacity, dtype=np.float32)
+        attributes = np.zeros((capacity, self._attributes.shape[1]), dtype=np.float64)
+        matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+        boost[:len(self._ids)] = self._boost[:len(self._ids)]
+        attributes[:len(self._ids)] = self._attributes[:len(self._ids)]
+        self._matrix = matrix
+        self._boost = boost
+        self._attributes = attributes
@@ -0,0 +1,69 @@
+"""
+Per-row cost of building read models from database rows.
+
+Compares validating every row into a Pydantic model (``Memory(**row)``) with
+wrapping it in a MemoryRecord, both followed by the field reads a listing
+does (content, importance, created_at). Run from backend/:
+
+    python -m scripts.bench_read_models
+"""
+
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from app.models.memory import Memory, MemoryRecord
+
+_START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _rows(n):
+    return [
+        {
+            "id": f"m{i}",
+            "user_id": "u1",
+            "content": f"memory number {i} about something the user said",
+            "importance_score": 0.5,
+            "category": "fact",
+            "created_at": (_START + timedelta(minutes=i)).isoformat(),
+            "last_accessed": (_START + timedelta(minutes=2 * i)).isoformat(),
+            "access_count": i % 7,
+            "decay_score": 0.8,
+            "ttl_days": 180,
+            "last_used_in_chat": None,
+            "is_pinned": False,
+            "memory_type": "long_term",
+            "source": "extraction",
+            "stability": 0.5,
+        }
+        for i in range(n)
+    ]
+
+
+def _read(memories):
+    for mem in memories:
+        mem.content, mem.importance_score, mem.created_at
+
+
+def _pydantic(rows):
+    _read([Memory(**row) for row in rows])
+
+
+def _records(rows):
+    # Copy like the services do for cached rows, so every run parses again
+    _read([MemoryRecord(dict(row)) for row in rows])
+
+
+def main():
+    for n in (500, 5000):
+        rows = _rows(n)
+        repeat = max(1, 20000 // n)
+        results = {}
+        for name, build in (("Memory(**row)", _pydantic), ("MemoryRecord(row)", _records)):
+            best = min(timeit.repeat(lambda: build(rows), number=repeat, repeat=5)) / repeat
+            results[name] = best
+            print(f"{n:>5} rows  {name:<18} {best * 1e3:8.2f} ms  {best / n * 1e6:6.2f} us/row")
+        print(f"{n:>5} rows  speedup {results['Memory(**row)'] / results['MemoryRecord(row)']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
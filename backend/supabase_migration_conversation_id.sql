@@ -0,0 +1,14 @@
+-- Migration: first-class conversation_id column on conversations
+-- Run this if you already have the base schema applied
+
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS conversation_id TEXT;
+
+-- Backfill from metadata for rows written before the column existed
+UPDATE conversations
+SET conversation_id = metadata->>'conversation_id'
+WHERE conversation_id IS NULL
+  AND metadata ? 'conversation_id';
+
+-- Last N turns of one conversation / delete one conversation
+CREATE INDEX IF NOT EXISTS idx_conversations_user_conversation_ts
+    ON conversations(user_id, conversation_id, timestamp DESC);
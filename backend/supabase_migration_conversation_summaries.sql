@@ -0,0 +1,122 @@
+-- Migration: conversation_summaries (sidebar list), maintained by triggers on write
+-- Requires supabase_migration_conversation_id.sql and supabase_migration_pinned.sql
+
+CREATE TABLE IF NOT EXISTS conversation_summaries (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    conversation_id TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    first_message TEXT NOT NULL DEFAULT '',
+    last_message_time TIMESTAMP WITH TIME ZONE,
+    pinned BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (user_id, conversation_id)
+);
+
+-- Sidebar query: pinned first, then most recent
+CREATE INDEX IF NOT EXISTS idx_conversation_summaries_sidebar
+    ON conversation_summaries(user_id, pinned DESC, last_message_time DESC);
+
+ALTER TABLE conversation_summaries ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Users can view own conversation summaries" ON conversation_summaries;
+CREATE POLICY "Users can view own conversation summaries" ON conversation_summaries FOR SELECT USING (true);
+
+-- Preview text shown in the sidebar (latest message, max 50 chars)
+CREATE OR REPLACE FUNCTION conversation_preview(msg TEXT) RETURNS TEXT AS $$
+    SELECT CASE WHEN length(msg) > 50 THEN left(msg, 50) || '...' ELSE coalesce(msg, '') END
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION conversation_summaries_on_insert() RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF NEW.conversation_id IS NULL THEN
+        RETURN NEW;
+    END IF;
+    INSERT INTO conversation_summaries AS s
+        (user_id, conversation_id, message_count, first_message, last_message_time, pinned)
+    VALUES (
+        NEW.user_id,
+        NEW.conversation_id,
+        1,
+        conversation_preview(NEW.message),
+        NEW.timestamp,
+        EXISTS (
+            SELECT 1 FROM pinned_conversations p
+            WHERE p.user_id = NEW.user_id AND p.conversation_id = NEW.conversation_id
+        )
+    )
+    ON CONFLICT (user_id, conversation_id) DO UPDATE SET
+        message_count = s.message_count + 1,
+        first_message = CASE
+            WHEN s.last_message_time IS NULL OR EXCLUDED.last_message_time >= s.last_message_time
+            THEN EXCLUDED.first_message
+            ELSE s.first_message
+        END,
+        last_message_time = GREATEST(s.last_message_time, EXCLUDED.last_message_time);
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION conversation_summaries_on_delete() RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF OLD.conversation_id IS NULL THEN
+        RETURN OLD;
+    END IF;
+    UPDATE conversation_summaries
+    SET message_count = message_count - 1
+    WHERE user_id = OLD.user_id AND conversation_id = OLD.conversation_id;
+    DELETE FROM conversation_summaries
+    WHERE user_id = OLD.user_id AND conversation_id = OLD.conversation_id AND message_count <= 0;
+    RETURN OLD;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION conversation_summaries_on_pin() RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE conversation_summaries SET pinned = FALSE
+        WHERE user_id = OLD.user_id AND conversation_id = OLD.conversation_id;
+        RETURN OLD;
+    END IF;
+    UPDATE conversation_summaries SET pinned = TRUE
+    WHERE user_id = NEW.user_id AND conversation_id = NEW.conversation_id;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_conversation_summaries_insert ON conversations;
+CREATE TRIGGER trg_conversation_summaries_insert
+    AFTER INSERT ON conversations
+    FOR EACH ROW EXECUTE FUNCTION conversation_summaries_on_insert();
+
+DROP TRIGGER IF EXISTS trg_conversation_summaries_delete ON conversations;
+CREATE TRIGGER trg_conversation_summaries_delete
+    AFTER DELETE ON conversations
+    FOR EACH ROW EXECUTE FUNCTION conversation_summaries_on_delete();
+
+DROP TRIGGER IF EXISTS trg_conversation_summaries_pin ON pinned_conversations;
+CREATE TRIGGER trg_conversation_summaries_pin
+    AFTER INSERT OR DELETE ON pinned_conversations
+    FOR EACH ROW EXECUTE FUNCTION conversation_summaries_on_pin();
+
+-- Backfill from existing conversations
+INSERT INTO conversation_summaries
+    (user_id, conversation_id, message_count, first_message, last_message_time, pinned)
+SELECT
+    c.user_id,
+    c.conversation_id,
+    COUNT(*),
+    conversation_preview((array_agg(c.message ORDER BY c.timestamp DESC))[1]),
+    MAX(c.timestamp),
+    EXISTS (
+        SELECT 1 FROM pinned_conversations p
+        WHERE p.user_id = c.user_id AND p.conversation_id = c.conversation_id
+    )
+FROM conversations c
+WHERE c.conversation_id IS NOT NULL
+GROUP BY c.user_id, c.conversation_id
+ON CONFLICT (user_id, conversation_id) DO UPDATE SET
+    message_count = EXCLUDED.message_count,
+    first_message = EXCLUDED.first_message,
+    last_message_time = EXCLUDED.last_message_time,
+    pinned = EXCLUDED.pinned;
@@ -0,0 +1,13 @@
+-- Migration: background memory extraction status for user journals
+-- New entries start as 'pending'; the journal.extract_memories job moves them to
+-- 'processing' and then 'done' (or 'failed' with the error, while it is retried).
+-- Existing entries were extracted inline when they were written, so they are 'done'.
+
+ALTER TABLE user_journals
+    ADD COLUMN IF NOT EXISTS extraction_status TEXT NOT NULL DEFAULT 'done',
+    ADD COLUMN IF NOT EXISTS extraction_error TEXT,
+    ADD COLUMN IF NOT EXISTS extraction_chunks INTEGER,
+    ADD COLUMN IF NOT EXISTS extracted_memories INTEGER,
+    ADD COLUMN IF NOT EXISTS extraction_updated_at TIMESTAMP WITH TIME ZONE;
+
+ALTER TABLE user_journals ALTER COLUMN extraction_status SET DEFAULT 'pending';
@@ -0,0 +1,26 @@
+-- Migration: incremental memory extraction for edited user journals
+-- paragraph_hashes holds the hash of each paragraph of the last extracted version,
+-- so an edit only sends new or changed paragraphs to Gemini. journal_memory_links
+-- records which paragraphs each memory came from; memories left without a link when
+-- their paragraphs are removed are downweighted (and then pruned as usual).
+
+ALTER TABLE user_journals ADD COLUMN IF NOT EXISTS paragraph_hashes TEXT[];
+
+CREATE TABLE IF NOT EXISTS journal_memory_links (
+    journal_id UUID NOT NULL REFERENCES user_journals(id) ON DELETE CASCADE,
+    memory_id UUID NOT NULL REFERENCES memories(id) ON DELETE CASCADE,
+    paragraph_hash TEXT NOT NULL,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (journal_id, paragraph_hash, memory_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_journal_memory_links_memory_id ON journal_memory_links(memory_id);
+
+ALTER TABLE journal_memory_links ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Users can view own journal memory links" ON journal_memory_links;
+DROP POLICY IF EXISTS "Users can insert own journal memory links" ON journal_memory_links;
+DROP POLICY IF EXISTS "Users can delete own journal memory links" ON journal_memory_links;
+CREATE POLICY "Users can view own journal memory links" ON journal_memory_links FOR SELECT USING (true);
+CREATE POLICY "Users can insert own journal memory links" ON journal_memory_links FOR INSERT WITH CHECK (true);
+CREATE POLICY "Users can delete own journal memory links" ON journal_memory_links FOR DELETE USING (true);
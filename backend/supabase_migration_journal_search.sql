@@ -0,0 +1,78 @@
+-- Migration: ranked full-text search over user journals
+-- Adds a generated tsvector column with a GIN index and the search_user_journals RPC
+-- (ranked, keyset-paged on rank/created_at/id, returns HTML-escaped ts_headline snippets instead of full bodies)
+
+-- Journal search: no stemming or stopwords (entries are mostly Vietnamese), accents folded
+-- like app.utils.text_analyzer, so "ca phe" finds "cà phê"
+CREATE EXTENSION IF NOT EXISTS unaccent;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'journal_search') THEN
+        CREATE TEXT SEARCH CONFIGURATION journal_search (COPY = simple);
+        ALTER TEXT SEARCH CONFIGURATION journal_search
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+    END IF;
+END $$;
+
+-- A search_vector built by an earlier version of this migration used the english config;
+-- a generated column's expression cannot be changed in place, so rebuild it
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'user_journals' AND column_name = 'search_vector'
+          AND generation_expression LIKE '%english%'
+    ) THEN
+        ALTER TABLE user_journals DROP COLUMN search_vector;
+    END IF;
+END $$;
+
+ALTER TABLE user_journals
+    ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('journal_search', COALESCE(content, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_user_journals_search ON user_journals USING GIN (search_vector);
+
+-- Pass the previous page's last (rank, created_at, id) to get the next page
+CREATE OR REPLACE FUNCTION search_user_journals(
+    p_user_id UUID,
+    p_query TEXT,
+    p_limit INTEGER DEFAULT 20,
+    p_after_rank REAL DEFAULT NULL,
+    p_after_created_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL
+) RETURNS TABLE (
+    id UUID,
+    created_at TIMESTAMP WITH TIME ZONE,
+    tags TEXT[],
+    rank REAL,
+    headline TEXT
+)
+LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public AS $$
+    WITH q AS (
+        SELECT websearch_to_tsquery('journal_search', p_query) AS query
+    ),
+    page AS (
+        SELECT j.id, j.created_at, j.tags, j.content, ts_rank(j.search_vector, q.query) AS rank
+        FROM user_journals j, q
+        WHERE j.user_id = p_user_id
+          AND j.search_vector @@ q.query
+          AND (
+              p_after_id IS NULL
+              OR (ts_rank(j.search_vector, q.query), j.created_at, j.id) < (p_after_rank, p_after_created_at, p_after_id)
+          )
+        ORDER BY rank DESC, j.created_at DESC, j.id DESC
+        LIMIT p_limit
+    )
+    -- Snippets only for the rows on the page
+    SELECT page.id, page.created_at, page.tags, page.rank,
+        -- Highlight with private-use markers, HTML-escape the excerpt, then turn the markers into <mark>
+        replace(replace(replace(replace(replace(
+            ts_headline('journal_search', page.content, q.query,
+                'StartSel="' || chr(57344) || '", StopSel="' || chr(57345) || '"'
+                || ', MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=" … "'),
+            '&', '&amp;'), '<', '&lt;'), '>', '&gt;'),
+            chr(57344), '<mark>'), chr(57345), '</mark>')
+    FROM page, q
+    ORDER BY page.rank DESC, page.created_at DESC, page.id DESC;
+$$;
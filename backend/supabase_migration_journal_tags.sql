@@ -0,0 +1,59 @@
+-- Migration: journal tag index and per-user tag counts
+-- GIN index for tag containment/overlap filters; user_journal_tags holds per-user counts
+-- (backs GET /api/journal/user/{user_id}/tags), maintained by a trigger on user_journals
+
+CREATE INDEX IF NOT EXISTS idx_user_journals_tags ON user_journals USING GIN (tags);
+
+CREATE TABLE IF NOT EXISTS user_journal_tags (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    journal_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, tag)
+);
+
+ALTER TABLE user_journal_tags ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Users can view own journal tags" ON user_journal_tags;
+CREATE POLICY "Users can view own journal tags" ON user_journal_tags FOR SELECT USING (true);
+
+-- Add delta to the count of each distinct tag (rows reaching 0 are removed)
+CREATE OR REPLACE FUNCTION user_journal_tags_apply(p_user_id UUID, p_tags TEXT[], delta INTEGER) RETURNS VOID
+LANGUAGE sql SECURITY DEFINER SET search_path = public AS $$
+    INSERT INTO user_journal_tags AS t (user_id, tag, journal_count)
+    SELECT p_user_id, tag, delta FROM (SELECT DISTINCT unnest(p_tags) AS tag) tags
+    WHERE tag IS NOT NULL
+    ON CONFLICT (user_id, tag) DO UPDATE SET journal_count = t.journal_count + EXCLUDED.journal_count;
+    DELETE FROM user_journal_tags WHERE user_id = p_user_id AND tag = ANY(p_tags) AND journal_count <= 0;
+$$;
+
+CREATE OR REPLACE FUNCTION user_journal_tags_on_change() RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM user_journal_tags_apply(NEW.user_id, COALESCE(NEW.tags, ARRAY[]::TEXT[]), 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM user_journal_tags_apply(OLD.user_id, COALESCE(OLD.tags, ARRAY[]::TEXT[]), -1);
+    ELSE
+        -- Only the tags that were removed or added
+        PERFORM user_journal_tags_apply(NEW.user_id, ARRAY(
+            SELECT unnest(COALESCE(OLD.tags, ARRAY[]::TEXT[])) EXCEPT SELECT unnest(COALESCE(NEW.tags, ARRAY[]::TEXT[]))
+        ), -1);
+        PERFORM user_journal_tags_apply(NEW.user_id, ARRAY(
+            SELECT unnest(COALESCE(NEW.tags, ARRAY[]::TEXT[])) EXCEPT SELECT unnest(COALESCE(OLD.tags, ARRAY[]::TEXT[]))
+        ), 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_user_journal_tags ON user_journals;
+CREATE TRIGGER trg_user_journal_tags
+    AFTER INSERT OR DELETE OR UPDATE OF tags ON user_journals
+    FOR EACH ROW EXECUTE FUNCTION user_journal_tags_on_change();
+
+-- Backfill from existing journals
+INSERT INTO user_journal_tags (user_id, tag, journal_count)
+SELECT user_id, tag, COUNT(*)
+FROM (SELECT DISTINCT id, user_id, unnest(tags) AS tag FROM user_journals) tagged
+WHERE tag IS NOT NULL
+GROUP BY user_id, tag
+ON CONFLICT (user_id, tag) DO UPDATE SET journal_count = EXCLUDED.journal_count;
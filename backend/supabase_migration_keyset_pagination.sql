@@ -0,0 +1,10 @@
+-- Migration: composite indexes for keyset (cursor) pagination
+-- Journal listings page on (created_at, id) newest first; history pages on (timestamp, id)
+
+CREATE INDEX IF NOT EXISTS idx_user_journals_user_created_id ON user_journals(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_ai_journals_user_created_id ON ai_journals(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_ts_id ON conversations(user_id, timestamp, id);
+
+-- Extends idx_conversations_user_conversation_ts with the id tie-breaker
+CREATE INDEX IF NOT EXISTS idx_conversations_user_conversation_ts_id ON conversations(user_id, conversation_id, timestamp DESC, id DESC);
+DROP INDEX IF EXISTS idx_conversations_user_conversation_ts;
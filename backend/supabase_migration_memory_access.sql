@@ -0,0 +1,15 @@
+-- Migration: bulk memory access increments (write-behind access tracker)
+-- hits: [{"id": "<memory uuid>", "n": <hits>, "accessed_at": "<iso timestamp>"}, ...]
+CREATE OR REPLACE FUNCTION record_memory_access(hits JSONB) RETURNS INTEGER
+LANGUAGE sql SECURITY DEFINER SET search_path = public AS $$
+    WITH updated AS (
+        UPDATE memories m
+        SET access_count = COALESCE(m.access_count, 0) + h.n,
+            last_accessed = GREATEST(m.last_accessed, h.accessed_at),
+            last_used_in_chat = GREATEST(m.last_used_in_chat, h.accessed_at)
+        FROM jsonb_to_recordset(hits) AS h(id UUID, n INTEGER, accessed_at TIMESTAMP WITH TIME ZONE)
+        WHERE m.id = h.id
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM updated;
+$$;
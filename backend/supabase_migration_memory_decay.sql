@@ -0,0 +1,39 @@
+-- Migration: decay is computed at read time; decay_score becomes a cache refreshed nightly
+ALTER TABLE memories
+    ADD COLUMN IF NOT EXISTS stability FLOAT NOT NULL DEFAULT 0.5 CHECK (stability >= 0 AND stability <= 1);
+
+-- Same formula as app.utils.memory_filter.compute_decay_score, for every memory in one statement
+CREATE OR REPLACE FUNCTION refresh_memory_decay() RETURNS INTEGER
+LANGUAGE sql SECURITY DEFINER SET search_path = public AS $$
+    WITH scored AS (
+        SELECT
+            id,
+            ROUND((importance_score * GREATEST(
+                0.1,
+                1 - GREATEST(0, FLOOR(EXTRACT(EPOCH FROM (NOW() - COALESCE(last_accessed, NOW()))) / 86400))
+                    / GREATEST(1,
+                        (CASE WHEN importance_score >= 0.7 THEN 180 WHEN importance_score >= 0.4 THEN 90 ELSE 30 END)
+                        * (0.6 + 0.8 * LEAST(GREATEST(stability, 0), 1))
+                        + CASE memory_type
+                            WHEN 'constraint' THEN 60
+                            WHEN 'goal' THEN 45
+                            WHEN 'relationship' THEN 45
+                            WHEN 'preference' THEN 30
+                            ELSE 0
+                          END
+                    )
+            ))::NUMERIC, 4)::FLOAT AS decay
+        FROM memories
+    ),
+    updated AS (
+        UPDATE memories m
+        SET decay_score = s.decay
+        FROM scored s
+        WHERE m.id = s.id AND m.decay_score IS DISTINCT FROM s.decay
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM updated;
+$$;
+
+-- Nightly refresh (requires the pg_cron extension, enabled under Database > Extensions):
+-- SELECT cron.schedule('refresh-memory-decay', '15 3 * * *', 'SELECT refresh_memory_decay()');
@@ -0,0 +1,26 @@
+-- Migration: expired memories are deleted by one set-based statement instead of a prune job per user
+
+-- Same rule as app.utils.memory_filter.is_memory_expired (unpinned, whole days since creation
+-- past ttl_days, unless important and often used); returns rows deleted
+CREATE OR REPLACE FUNCTION prune_expired_memories() RETURNS INTEGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    deleted INTEGER;
+BEGIN
+    -- One sweep at a time: concurrent callers (every API process, pg_cron) skip instead of racing
+    IF NOT pg_try_advisory_xact_lock(hashtext('prune_expired_memories')) THEN
+        RETURN 0;
+    END IF;
+    DELETE FROM memories
+    WHERE NOT is_pinned
+      AND ttl_days > 0
+      AND created_at <= NOW() - (ttl_days + 1) * INTERVAL '1 day'
+      AND NOT (importance_score >= 0.8 AND COALESCE(access_count, 0) >= 5);
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    RETURN deleted;
+END;
+$$;
+
+-- Nightly prune (requires the pg_cron extension, enabled under Database > Extensions);
+-- set MEMORY_PRUNE_SWEEP_S=0 on the API once this is scheduled:
+-- SELECT cron.schedule('prune-expired-memories', '45 3 * * *', 'SELECT prune_expired_memories()');
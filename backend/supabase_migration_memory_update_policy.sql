@@ -0,0 +1,5 @@
+-- Migration: allow updates on memories
+-- Merges and downweights are written with one upsert (INSERT ... ON CONFLICT (id) DO UPDATE),
+-- which with the anon key needs an UPDATE policy next to the INSERT one
+DROP POLICY IF EXISTS "Users can update own memories" ON memories;
+CREATE POLICY "Users can update own memories" ON memories FOR UPDATE USING (true);
@@ -1,6 +1,18 @@
 -- Supabase Database Schema for Tymon AI Chatbot
 -- Run this in Supabase SQL Editor to create the tables
 
+-- Journal search: no stemming or stopwords (entries are mostly Vietnamese), accents folded
+-- like app.utils.text_analyzer, so "ca phe" finds "cà phê"
+CREATE EXTENSION IF NOT EXISTS unaccent;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'journal_search') THEN
+        CREATE TEXT SEARCH CONFIGURATION journal_search (COPY = simple);
+        ALTER TEXT SEARCH CONFIGURATION journal_search
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+    END IF;
+END $$;
+
 -- Users table
 CREATE TABLE IF NOT EXISTS users (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -13,6 +25,7 @@ CREATE TABLE IF NOT EXISTS users (
 CREATE TABLE IF NOT EXISTS conversations (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    conversation_id TEXT,
     message TEXT NOT NULL,
     response TEXT NOT NULL,
     timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
@@ -34,7 +47,8 @@ CREATE TABLE IF NOT EXISTS memories (
     last_used_in_chat TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     is_pinned BOOLEAN NOT NULL DEFAULT FALSE,
     memory_type TEXT NOT NULL DEFAULT 'fact',
-    source TEXT NOT NULL DEFAULT 'chat'
+    source TEXT NOT NULL DEFAULT 'chat',
+    stability FLOAT NOT NULL DEFAULT 0.5 CHECK (stability >= 0 AND stability <= 1)
 );
 
 -- User journals table
@@ -43,7 +57,14 @@ CREATE TABLE IF NOT EXISTS user_journals (
     user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     content TEXT NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    tags TEXT[] DEFAULT ARRAY[]::TEXT[]
+    tags TEXT[] DEFAULT ARRAY[]::TEXT[],
+    search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('journal_search', COALESCE(content, ''))) STORED,
+    extraction_status TEXT NOT NULL DEFAULT 'pending',
+    extraction_error TEXT,
+    extraction_chunks INTEGER,
+    extracted_memories INTEGER,
+    extraction_updated_at TIMESTAMP WITH TIME ZONE,
+    paragraph_hashes TEXT[]
 );
 
 -- Pinned conversations table (for pin state per user)
@@ -54,6 +75,35 @@ CREATE TABLE IF NOT EXISTS pinned_conversations (
     PRIMARY KEY (user_id, conversation_id)
 );
 
+-- Conversation summaries (sidebar list), maintained by triggers below
+CREATE TABLE IF NOT EXISTS conversation_summaries (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    conversation_id TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    first_message TEXT NOT NULL DEFAULT '',
+    last_message_time TIMESTAMP WITH TIME ZONE,
+    pinned BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (user_id, conversation_id)
+);
+
+-- Per-user journal tag counts, maintained by the trigger below
+CREATE TABLE IF NOT EXISTS user_journal_tags (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    journal_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, tag)
+);
+
+-- Which journal paragraphs each memory was extracted from (incremental re-extraction on edit)
+CREATE TABLE IF NOT EXISTS journal_memory_links (
+    journal_id UUID NOT NULL REFERENCES user_journals(id) ON DELETE CASCADE,
+    memory_id UUID NOT NULL REFERENCES memories(id) ON DELETE CASCADE,
+    paragraph_hash TEXT NOT NULL,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (journal_id, paragraph_hash, memory_id)
+);
+
 -- AI journals table
 CREATE TABLE IF NOT EXISTS ai_journals (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -68,6 +118,8 @@ CREATE TABLE IF NOT EXISTS ai_journals (
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_conversations_user_id ON conversations(user_id);
 CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_conversation_ts_id ON conversations(user_id, conversation_id, timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_ts_id ON conversations(user_id, timestamp, id);
 CREATE INDEX IF NOT EXISTS idx_memories_user_id ON memories(user_id);
 CREATE INDEX IF NOT EXISTS idx_memories_importance ON memories(importance_score DESC);
 CREATE INDEX IF NOT EXISTS idx_memories_category ON memories(category);
@@ -76,9 +128,15 @@ CREATE INDEX IF NOT EXISTS idx_memories_decay ON memories(decay_score DESC);
 CREATE INDEX IF NOT EXISTS idx_memories_last_used ON memories(last_used_in_chat DESC);
 CREATE INDEX IF NOT EXISTS idx_user_journals_user_id ON user_journals(user_id);
 CREATE INDEX IF NOT EXISTS idx_user_journals_created_at ON user_journals(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_user_journals_user_created_id ON user_journals(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_user_journals_search ON user_journals USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_user_journals_tags ON user_journals USING GIN (tags);
+CREATE INDEX IF NOT EXISTS idx_journal_memory_links_memory_id ON journal_memory_links(memory_id);
 CREATE INDEX IF NOT EXISTS idx_ai_journals_user_id ON ai_journals(user_id);
 CREATE INDEX IF NOT EXISTS idx_ai_journals_created_at ON ai_journals(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_ai_journals_user_created_id ON ai_journals(user_id, created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_pinned_conversations_user_id ON pinned_conversations(user_id);
+CREATE INDEX IF NOT EXISTS idx_conversation_summaries_sidebar ON conversation_summaries(user_id, pinned DESC, last_message_time DESC);
 
 -- Enable Row Level Security (RLS) - Optional but recommended
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
@@ -87,6 +145,9 @@ ALTER TABLE memories ENABLE ROW LEVEL SECURITY;
 ALTER TABLE user_journals ENABLE ROW LEVEL SECURITY;
 ALTER TABLE ai_journals ENABLE ROW LEVEL SECURITY;
 ALTER TABLE pinned_conversations ENABLE ROW LEVEL SECURITY;
+ALTER TABLE user_journal_tags ENABLE ROW LEVEL SECURITY;
+ALTER TABLE conversation_summaries ENABLE ROW LEVEL SECURITY;
+ALTER TABLE journal_memory_links ENABLE ROW LEVEL SECURITY;
 
 -- Basic RLS policies (adjust based on your auth setup)
 -- For now, allow all operations - you should restrict based on user_id matching authenticated user
@@ -97,6 +158,7 @@ CREATE POLICY "Users can insert own conversations" ON conversations FOR INSERT W
 CREATE POLICY "Users can delete own conversations" ON conversations FOR DELETE USING (true);
 CREATE POLICY "Users can view own memories" ON memories FOR SELECT USING (true);
 CREATE POLICY "Users can insert own memories" ON memories FOR INSERT WITH CHECK (true);
+CREATE POLICY "Users can update own memories" ON memories FOR UPDATE USING (true);
 CREATE POLICY "Users can delete own memories" ON memories FOR DELETE USING (true);
 CREATE POLICY "Users can view own journals" ON user_journals FOR SELECT USING (true);
 CREATE POLICY "Users can insert own journals" ON user_journals FOR INSERT WITH CHECK (true);
@@ -107,4 +169,244 @@ CREATE POLICY "AI can insert journals" ON ai_journals FOR INSERT WITH CHECK (tru
 CREATE POLICY "Users can view own pinned" ON pinned_conversations FOR SELECT USING (true);
 CREATE POLICY "Users can insert own pinned" ON pinned_conversations FOR INSERT WITH CHECK (true);
 CREATE POLICY "Users can update own pinned" ON pinned_conversations FOR UPDATE USING (true);
-CREATE POLICY "Users can delete own pinned" ON pinned_conversations FOR DELETE USING (true);
\ No newline at end of file
+CREATE POLICY "Users can delete own pinned" ON pinned_conversations FOR DELETE USING (true);
+CREATE POLICY "Users can view own conversation summaries" ON conversation_summaries FOR SELECT USING (true);
+CREATE POLICY "Users can view own journal tags" ON user_journal_tags FOR SELECT USING (true);
+CREATE POLICY "Users can view own journal memory links" ON journal_memory_links FOR SELECT USING (true);
+CREATE POLICY "Users can insert own journal memory links" ON journal_memory_links FOR INSERT WITH CHECK (true);
+CREATE POLICY "Users can delete own journal memory links" ON journal_memory_links FOR DELETE USING (true);
+
+-- Keep conversation_summaries up to date on insert/delete of turns and pin/unpin
+-- Preview text shown in the sidebar (latest message, max 50 chars)
+CREATE OR REPLACE FUNCTION conversation_preview(msg TEXT) RETURNS TEXT AS $$
+    SELECT CASE WHEN length(msg) > 50 THEN left(msg, 50) || '...' ELSE coalesce(msg, '') END
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION conversation_summaries_on_insert() RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF NEW.conversation_id IS NULL THEN
+        RETURN NEW;
+    END IF;
+    INSERT INTO conversation_summaries AS s
+        (user_id, conversation_id, message_count, first_message, last_message_time, pinned)
+    VALUES (
+        NEW.user_id,
+        NEW.conversation_id,
+        1,
+        conversation_preview(NEW.message),
+        NEW.timestamp,
+        EXISTS (
+            SELECT 1 FROM pinned_conversations p
+            WHERE p.user_id = NEW.user_id AND p.conversation_id = NEW.conversation_id
+        )
+    )
+    ON CONFLICT (user_id, conversation_id) DO UPDATE SET
+        message_count = s.message_count + 1,
+        first_message = CASE
+            WHEN s.last_message_time IS NULL OR EXCLUDED.last_message_time >= s.last_message_time
+            THEN EXCLUDED.first_message
+            ELSE s.first_message
+        END,
+        last_message_time = GREATEST(s.last_message_time, EXCLUDED.last_message_time);
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION conversation_summaries_on_delete() RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF OLD.conversation_id IS NULL THEN
+        RETURN OLD;
+    END IF;
+    UPDATE conversation_summaries
+    SET message_count = message_count - 1
+    WHERE user_id = OLD.user_id AND conversation_id = OLD.conversation_id;
+    DELETE FROM conversation_summaries
+    WHERE user_id = OLD.user_id AND conversation_id = OLD.conversation_id AND message_count <= 0;
+    RETURN OLD;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION conversation_summaries_on_pin() RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE conversation_summaries SET pinned = FALSE
+        WHERE user_id = OLD.user_id AND conversation_id = OLD.conversation_id;
+        RETURN OLD;
+    END IF;
+    UPDATE conversation_summaries SET pinned = TRUE
+    WHERE user_id = NEW.user_id AND conversation_id = NEW.conversation_id;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_conversation_summaries_insert ON conversations;
+CREATE TRIGGER trg_conversation_summaries_insert
+    AFTER INSERT ON conversations
+    FOR EACH ROW EXECUTE FUNCTION conversation_summaries_on_insert();
+
+DROP TRIGGER IF EXISTS trg_conversation_summaries_delete ON conversations;
+CREATE TRIGGER trg_conversation_summaries_delete
+    AFTER DELETE ON conversations
+    FOR EACH ROW EXECUTE FUNCTION conversation_summaries_on_delete();
+
+DROP TRIGGER IF EXISTS trg_conversation_summaries_pin ON pinned_conversations;
+CREATE TRIGGER trg_conversation_summaries_pin
+    AFTER INSERT OR DELETE ON pinned_conversations
+    FOR EACH ROW EXECUTE FUNCTION conversation_summaries_on_pin();
+
+-- Write-behind memory access tracker: add buffered hit counts in one statement
+CREATE OR REPLACE FUNCTION record_memory_access(hits JSONB) RETURNS INTEGER
+LANGUAGE sql SECURITY DEFINER SET search_path = public AS $$
+    WITH updated AS (
+        UPDATE memories m
+        SET access_count = COALESCE(m.access_count, 0) + h.n,
+            last_accessed = GREATEST(m.last_accessed, h.accessed_at),
+            last_used_in_chat = GREATEST(m.last_used_in_chat, h.accessed_at)
+        FROM jsonb_to_recordset(hits) AS h(id UUID, n INTEGER, accessed_at TIMESTAMP WITH TIME ZONE)
+        WHERE m.id = h.id
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM updated;
+$$;
+
+-- Decay is computed at read time; decay_score is a cache refreshed by this nightly job
+CREATE OR REPLACE FUNCTION refresh_memory_decay() RETURNS INTEGER
+LANGUAGE sql SECURITY DEFINER SET search_path = public AS $$
+    WITH scored AS (
+        SELECT
+            id,
+            ROUND((importance_score * GREATEST(
+                0.1,
+                1 - GREATEST(0, FLOOR(EXTRACT(EPOCH FROM (NOW() - COALESCE(last_accessed, NOW()))) / 86400))
+                    / GREATEST(1,
+                        (CASE WHEN importance_score >= 0.7 THEN 180 WHEN importance_score >= 0.4 THEN 90 ELSE 30 END)
+                        * (0.6 + 0.8 * LEAST(GREATEST(stability, 0), 1))
+                        + CASE memory_type
+                            WHEN 'constraint' THEN 60
+                            WHEN 'goal' THEN 45
+                            WHEN 'relationship' THEN 45
+                            WHEN 'preference' THEN 30
+                            ELSE 0
+                          END
+                    )
+            ))::NUMERIC, 4)::FLOAT AS decay
+        FROM memories
+    ),
+    updated AS (
+        UPDATE memories m
+        SET decay_score = s.decay
+        FROM scored s
+        WHERE m.id = s.id AND m.decay_score IS DISTINCT FROM s.decay
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM updated;
+$$;
+
+-- Nightly refresh (requires the pg_cron extension, enabled under Database > Extensions):
+-- SELECT cron.schedule('refresh-memory-decay', '15 3 * * *', 'SELECT refresh_memory_decay()');
+
+-- Expired memories (app.utils.memory_filter.is_memory_expired) in one statement, one sweep at a time
+CREATE OR REPLACE FUNCTION prune_expired_memories() RETURNS INTEGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+    deleted INTEGER;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('prune_expired_memories')) THEN
+        RETURN 0;
+    END IF;
+    DELETE FROM memories
+    WHERE NOT is_pinned
+      AND ttl_days > 0
+      AND created_at <= NOW() - (ttl_days + 1) * INTERVAL '1 day'
+      AND NOT (importance_score >= 0.8 AND COALESCE(access_count, 0) >= 5);
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    RETURN deleted;
+END;
+$$;
+
+-- Nightly prune (pg_cron):
+-- SELECT cron.schedule('prune-expired-memories', '45 3 * * *', 'SELECT prune_expired_memories()');
+
+-- Ranked journal search (see supabase_migration_journal_search.sql)
+-- Pass the previous page's last (rank, created_at, id) to get the next page
+CREATE OR REPLACE FUNCTION search_user_journals(
+    p_user_id UUID,
+    p_query TEXT,
+    p_limit INTEGER DEFAULT 20,
+    p_after_rank REAL DEFAULT NULL,
+    p_after_created_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL
+) RETURNS TABLE (
+    id UUID,
+    created_at TIMESTAMP WITH TIME ZONE,
+    tags TEXT[],
+    rank REAL,
+    headline TEXT
+)
+LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public AS $$
+    WITH q AS (
+        SELECT websearch_to_tsquery('journal_search', p_query) AS query
+    ),
+    page AS (
+        SELECT j.id, j.created_at, j.tags, j.content, ts_rank(j.search_vector, q.query) AS rank
+        FROM user_journals j, q
+        WHERE j.user_id = p_user_id
+          AND j.search_vector @@ q.query
+          AND (
+              p_after_id IS NULL
+              OR (ts_rank(j.search_vector, q.query), j.created_at, j.id) < (p_after_rank, p_after_created_at, p_after_id)
+          )
+        ORDER BY rank DESC, j.created_at DESC, j.id DESC
+        LIMIT p_limit
+    )
+    -- Snippets only for the rows on the page
+    SELECT page.id, page.created_at, page.tags, page.rank,
+        -- Highlight with private-use markers, HTML-escape the excerpt, then turn the markers into <mark>
+        replace(replace(replace(replace(replace(
+            ts_headline('journal_search', page.content, q.query,
+                'StartSel="' || chr(57344) || '", StopSel="' || chr(57345) || '"'
+                || ', MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=" … "'),
+            '&', '&amp;'), '<', '&lt;'), '>', '&gt;'),
+            chr(57344), '<mark>'), chr(57345), '</mark>')
+    FROM page, q
+    ORDER BY page.rank DESC, page.created_at DESC, page.id DESC;
+$$;
+
+-- Keep user_journal_tags up to date on insert/update/delete of journals
+-- Add delta to the count of each distinct tag (rows reaching 0 are removed)
+CREATE OR REPLACE FUNCTION user_journal_tags_apply(p_user_id UUID, p_tags TEXT[], delta INTEGER) RETURNS VOID
+LANGUAGE sql SECURITY DEFINER SET search_path = public AS $$
+    INSERT INTO user_journal_tags AS t (user_id, tag, journal_count)
+    SELECT p_user_id, tag, delta FROM (SELECT DISTINCT unnest(p_tags) AS tag) tags
+    WHERE tag IS NOT NULL
+    ON CONFLICT (user_id, tag) DO UPDATE SET journal_count = t.journal_count + EXCLUDED.journal_count;
+    DELETE FROM user_journal_tags WHERE user_id = p_user_id AND tag = ANY(p_tags) AND journal_count <= 0;
+$$;
+
+CREATE OR REPLACE FUNCTION user_journal_tags_on_change() RETURNS TRIGGER
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM user_journal_tags_apply(NEW.user_id, COALESCE(NEW.tags, ARRAY[]::TEXT[]), 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM user_journal_tags_apply(OLD.user_id, COALESCE(OLD.tags, ARRAY[]::TEXT[]), -1);
+    ELSE
+        -- Only the tags that were removed or added
+        PERFORM user_journal_tags_apply(NEW.user_id, ARRAY(
+            SELECT unnest(COALESCE(OLD.tags, ARRAY[]::TEXT[])) EXCEPT SELECT unnest(COALESCE(NEW.tags, ARRAY[]::TEXT[]))
+        ), -1);
+        PERFORM user_journal_tags_apply(NEW.user_id, ARRAY(
+            SELECT unnest(COALESCE(NEW.tags, ARRAY[]::TEXT[])) EXCEPT SELECT unnest(COALESCE(OLD.tags, ARRAY[]::TEXT[]))
+        ), 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_user_journal_tags ON user_journals;
+CREATE TRIGGER trg_user_journal_tags
+    AFTER INSERT OR DELETE OR UPDATE OF tags ON user_journals
+    FOR EACH ROW EXECUTE FUNCTION user_journal_tags_on_change();
@@ -0,0 +1,60 @@
+"""Tests for app.services.access_tracker."""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+from app.services.access_tracker import AccessTracker
+
+
+def _tracker(client, **kwargs):
+    return AccessTracker(client_factory=lambda: client, flush_interval_s=60, **kwargs)
+
+
+def test_hits_are_merged_and_flushed_in_one_rpc():
+    client = MagicMock()
+    tracker = _tracker(client)
+    early = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    tracker.record(["m1", "m2"], accessed_at=early)
+    tracker.record(["m1"], accessed_at=early + timedelta(minutes=5))
+
+    assert tracker.pending() == {"m1": 2, "m2": 1}
+    assert tracker.flush() == 2
+
+    client.rpc.assert_called_once()
+    name, params = client.rpc.call_args[0]
+    assert name == "record_memory_access"
+    hits = {hit["id"]: hit for hit in params["hits"]}
+    assert hits["m1"]["n"] == 2
+    assert hits["m1"]["accessed_at"] == (early + timedelta(minutes=5)).isoformat()
+    assert tracker.pending() == {}
+    assert tracker.stats()["flushed"] == 3
+    tracker.close()
+
+
+def test_failed_flush_keeps_hits_for_next_attempt():
+    client = MagicMock()
+    client.rpc.return_value.execute.side_effect = [Exception("function not found"), MagicMock()]
+    tracker = _tracker(client)
+    tracker.record(["m1"])
+
+    assert tracker.flush() == 0
+    tracker.record(["m1"])
+    assert tracker.pending() == {"m1": 2}
+    assert tracker.flush() == 1
+    assert tracker.stats()["flush_errors"] == 1
+    tracker.close()
+
+
+def test_pending_is_bounded():
+    tracker = _tracker(MagicMock(), max_pending=2)
+    tracker.record(["a", "b", "c"])
+    assert set(tracker.pending()) == {"a", "b"}
+    assert tracker.stats()["dropped"] == 1
+    tracker.close()
+
+
+def test_close_flushes_remaining_hits():
+    client = MagicMock()
+    tracker = _tracker(client)
+    tracker.record(["m1"])
+    tracker.close()
+    client.rpc.assert_called_once()
@@ -0,0 +1,55 @@
+"""Tests for app.utils.text_analyzer and app.utils.bm25_index."""
+from app.services.memory_index import UserMemoryIndex
+from app.utils.bm25_index import BM25Index
+from app.utils.text_analyzer import analyze, fold_diacritics
+
+
+class TestAnalyzer:
+    def test_folds_vietnamese_diacritics(self):
+        assert fold_diacritics("Đà Nẵng cà phê") == "Da Nang ca phe"
+
+    def test_drops_stopwords_and_single_letters(self):
+        assert analyze("Tôi là a nurse and I like cà phê") == ["nurse", "like", "ca", "phe"]
+
+    def test_stopwords_checked_before_folding(self):
+        # "mà" (but) is a stopword, "má" (mother) is not
+        assert analyze("mà má") == ["ma"]
+
+
+class TestBM25Index:
+    def test_stopword_only_query_matches_nothing(self):
+        index = BM25Index()
+        index.add("m1", "User is a nurse")
+        index.add("m2", "Người dùng là sinh viên")
+        assert index.scores("là a") == {}
+
+    def test_rare_term_ranks_higher(self):
+        index = BM25Index()
+        index.add("m1", "User drinks coffee every morning")
+        index.add("m2", "User drinks tea")
+        index.add("m3", "User drinks water")
+        assert index.search("coffee drinks", 3)[0][0] == "m1"
+
+    def test_unaccented_query_matches_accented_memory(self):
+        index = BM25Index()
+        index.add("m1", "Thích uống cà phê sữa đá")
+        assert list(index.scores("ca phe")) == ["m1"]
+
+    def test_replace_and_remove(self):
+        index = BM25Index()
+        index.add("m1", "likes tea")
+        index.add("m1", "likes coffee")
+        assert index.scores("tea") == {}
+        assert "m1" in index.scores("coffee")
+        index.remove("m1")
+        assert len(index) == 0 and index.scores("coffee") == {}
+
+
+class TestHybridSearch:
+    def test_lexical_match_is_candidate_and_stopwords_are_not(self):
+        index = UserMemoryIndex("u", [
+            {"id": "m1", "content": "Người dùng thích uống cà phê sữa đá mỗi sáng", "decay_score": 0.2},
+            {"id": "m2", "content": "Làm y tá ở bệnh viện", "decay_score": 0.9},
+        ])
+        assert [row["id"] for row, _ in index.search("mình thích ca phe", 5)] == ["m1"]
+        assert index.search("là và của", 5) == []
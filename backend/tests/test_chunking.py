@@ -0,0 +1,47 @@
+"""Tests for app.utils.chunking."""
+from app.utils.chunking import chunk_paragraphs, chunk_text, pack_paragraphs, paragraph_hash, split_paragraphs
+
+
+def test_split_paragraphs_on_blank_lines():
+    text = "  first line\nstill first \n\n\n second\n \n\nthird  "
+    assert split_paragraphs(text) == ["first line\nstill first", "second", "third"]
+    assert split_paragraphs("") == []
+
+
+def test_whole_paragraphs_packed_up_to_limit():
+    paragraphs = ["a" * 40, "b" * 40, "c" * 40]
+
+    chunks = chunk_paragraphs(paragraphs, 90)
+
+    assert chunks == ["a" * 40 + "\n\n" + "b" * 40, "c" * 40]
+    assert all(len(chunk) <= 90 for chunk in chunks)
+
+
+def test_long_paragraph_split_at_sentences():
+    paragraph = "One short sentence. " * 10
+
+    chunks = chunk_text(paragraph, 50)
+
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert " ".join(chunks).split() == paragraph.split()
+
+
+def test_run_on_sentence_is_hard_cut():
+    chunks = chunk_text("x" * 25, 10)
+    assert chunks == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("Hôm nay trời đẹp.\n\nMình đi dạo.", 4000) == ["Hôm nay trời đẹp.\n\nMình đi dạo."]
+
+
+def test_packed_chunks_list_their_paragraphs():
+    packed = pack_paragraphs(["a" * 40, "b" * 40, "c. " * 40], 90)
+
+    assert [sources for _, sources in packed] == [[0, 1], [2], [2]]
+
+
+def test_paragraph_hash_ignores_whitespace_only():
+    assert paragraph_hash("went  hiking\ntoday") == paragraph_hash("went hiking today")
+    assert paragraph_hash("went hiking today") != paragraph_hash("went hiking yesterday")
@@ -0,0 +1,88 @@
+"""Tests for app.repositories.conversation_repository (with a mocked async Supabase table)."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.repositories.conversation_repository import METADATA_CONVERSATION_ID, ConversationRepository
+
+MISSING_COLUMN = Exception("column conversations.conversation_id does not exist")
+
+
+def _repository(table):
+    repository = ConversationRepository()
+    repository._table = AsyncMock(return_value=table)
+    return repository
+
+
+def _filter_columns(table):
+    return [c.args[0] for c in table.select.return_value.eq.return_value.eq.call_args_list]
+
+
+class TestConversationIdFallback:
+    def test_filters_on_column(self):
+        table = MagicMock()
+        query = table.select.return_value.eq.return_value.eq.return_value.order.return_value.order.return_value
+        query.limit.return_value.execute = AsyncMock(return_value=MagicMock(data=[{"id": "2"}, {"id": "1"}]))
+
+        rows = asyncio.run(_repository(table).last_turns("u1", "c1", 10))
+
+        assert rows == [{"id": "1"}, {"id": "2"}]
+        assert _filter_columns(table) == ["conversation_id"]
+
+    def test_falls_back_to_metadata_before_migration(self):
+        table = MagicMock()
+        query = table.select.return_value.eq.return_value.eq.return_value.order.return_value.order.return_value
+        query.limit.return_value.execute = AsyncMock(side_effect=[MISSING_COLUMN, MagicMock(data=[]), MagicMock(data=[])])
+        repository = _repository(table)
+
+        asyncio.run(repository.last_turns("u1", "c1", 10))
+        asyncio.run(repository.last_turns("u1", "c1", 10))
+
+        # The column is only tried once
+        assert _filter_columns(table) == ["conversation_id", METADATA_CONVERSATION_ID, METADATA_CONVERSATION_ID]
+
+    def test_insert_keeps_conversation_id_in_metadata_only(self):
+        table = MagicMock()
+        table.insert.return_value.execute = AsyncMock(side_effect=[
+            Exception("Could not find the 'conversation_id' column of 'conversations' in the schema cache"),
+            None,
+        ])
+        turn = {"id": "t1", "conversation_id": "c1", "metadata": {"conversation_id": "c1"}}
+
+        asyncio.run(_repository(table).insert_turn(turn))
+
+        assert table.insert.call_args_list[-1].args[0] == {"id": "t1", "metadata": {"conversation_id": "c1"}}
+
+    def test_other_errors_still_raise(self):
+        table = MagicMock()
+        table.delete.return_value.eq.return_value.eq.return_value.execute = AsyncMock(
+            side_effect=Exception("connection reset")
+        )
+        repository = _repository(table)
+
+        with pytest.raises(Exception, match="connection reset"):
+            asyncio.run(repository.delete_conversation("u1", "c1"))
+        assert repository._conversation_column
+
+
+class TestSummaries:
+    def _query(self, table):
+        return table.select.return_value.eq.return_value.order.return_value.order.return_value.order.return_value
+
+    def test_all_conversations_without_limit(self):
+        table = MagicMock()
+        self._query(table).execute = AsyncMock(return_value=MagicMock(data=[{"conversation_id": "c1"}]))
+
+        rows = asyncio.run(_repository(table).summaries("u1", None))
+
+        assert rows == [{"conversation_id": "c1"}]
+        self._query(table).range.assert_not_called()
+
+    def test_page_from_offset(self):
+        table = MagicMock()
+        self._query(table).range.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
+
+        asyncio.run(_repository(table).summaries("u1", 21, 40))
+
+        self._query(table).range.assert_called_once_with(40, 60)
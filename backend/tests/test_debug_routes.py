@@ -0,0 +1,34 @@
+"""Tests for the admin guard on app.api.routes.debug."""
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import debug
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(debug.router, prefix="/api/debug")
+    return TestClient(app)
+
+
+def test_disabled_without_token(client, monkeypatch):
+    monkeypatch.delenv("DEBUG_API_TOKEN", raising=False)
+    assert client.get("/api/debug/stages", headers={"X-Debug-Token": "anything"}).status_code == 404
+
+
+def test_rejects_missing_or_wrong_token(client, monkeypatch):
+    monkeypatch.setenv("DEBUG_API_TOKEN", "s3cret")
+    assert client.get("/api/debug/gemini-keys").status_code == 401
+    assert client.get("/api/debug/llm", headers={"X-Debug-Token": "wrong"}).status_code == 401
+
+
+def test_serves_with_token(client, monkeypatch):
+    monkeypatch.setenv("DEBUG_API_TOKEN", "s3cret")
+    with patch.object(debug, "all_stage_stats", return_value={"chat": {}}):
+        response = client.get("/api/debug/stages", headers={"X-Debug-Token": "s3cret"})
+    assert response.status_code == 200
+    assert response.json() == {"chat": {}}
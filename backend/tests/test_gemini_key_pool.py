@@ -0,0 +1,145 @@
+"""Tests for app.services.gemini_key_pool and GeminiService key usage."""
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from google.api_core.exceptions import ResourceExhausted
+
+from app.services.gemini_key_pool import GeminiKeyPool, parse_retry_delay
+from app.services.llm_telemetry import get_llm_telemetry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _make_pool(keys=("key-aaaa", "key-bbbb"), **kwargs):
+    clock = FakeClock()
+    kwargs.setdefault("rpm", 2)
+    kwargs.setdefault("tpm", 10_000)
+    kwargs.setdefault("max_wait_s", 0)
+    pool = GeminiKeyPool(
+        keys,
+        client_factory=lambda key: f"client-{key}",
+        clock=clock,
+        sleep=clock.sleep,
+        **kwargs
+    )
+    return pool, clock
+
+
+class TestGeminiKeyPool:
+    def test_least_loaded_key_is_chosen(self):
+        pool, _ = _make_pool()
+        first = pool.acquire(100)
+        second = pool.acquire(100)
+        assert {first.key_suffix, second.key_suffix} == {"aaaa", "bbbb"}
+        assert first.client == "client-key-aaaa"
+
+    def test_rpm_budget_exhausted_raises_without_waiting(self):
+        pool, _ = _make_pool(keys=("key-aaaa",), rpm=1)
+        pool.acquire(10).release()
+        with pytest.raises(ResourceExhausted):
+            pool.acquire(10)
+        assert pool.stats()["exhausted"] == 1
+
+    def test_waits_for_budget_when_allowed(self):
+        pool, clock = _make_pool(keys=("key-aaaa",), rpm=1, max_wait_s=120)
+        pool.acquire(10).release()
+        started = clock.now
+        pool.acquire(10).release()
+        assert clock.now - started == pytest.approx(60, rel=0.01)
+        assert pool.stats()["local_waits"] == 1
+
+    def test_429_puts_key_in_cooldown_from_retry_delay(self):
+        pool, clock = _make_pool(rpm=100)
+        lease = pool.acquire(10)
+        lease.release(error=ResourceExhausted("Quota exceeded. Please retry in 30.5s."))
+        throttled = lease.key_suffix
+
+        for _ in range(3):
+            other = pool.acquire(10)
+            assert other.key_suffix != throttled
+            other.release()
+
+        clock.now += 31
+        stats = {k["key"]: k for k in pool.stats()["keys"]}
+        assert stats[f"...{throttled}"]["throttled"] == 1
+        assert stats[f"...{throttled}"]["cooldown_remaining_s"] == 0
+
+    def test_token_reservation_settles_to_actual_usage(self):
+        pool, _ = _make_pool(keys=("key-aaaa",), tpm=1000)
+        lease = pool.acquire(600)
+        lease.release(response=SimpleNamespace(usage_metadata=SimpleNamespace(total_token_count=100)))
+        key = pool.stats()["keys"][0]
+        assert key["tokens_used"] == 100
+        assert key["tpm_available"] == 900
+
+    def test_concurrent_acquire_is_thread_safe(self):
+        pool, _ = _make_pool(rpm=1000, tpm=10**9)
+        leases = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(50):
+                lease = pool.acquire(1)
+                with lock:
+                    leases.append(lease)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        in_flight = sum(k["in_flight"] for k in pool.stats()["keys"])
+        assert in_flight == len(leases) == 200
+
+
+class TestParseRetryDelay:
+    def test_from_details(self):
+        error = ResourceExhausted("quota", details=[SimpleNamespace(retry_delay=timedelta(seconds=12))])
+        assert parse_retry_delay(error) == 12
+
+    def test_from_message(self):
+        assert parse_retry_delay(ResourceExhausted("retry_delay {\n  seconds: 41\n}")) == 41
+
+    def test_missing(self):
+        assert parse_retry_delay(ResourceExhausted("quota exceeded")) is None
+
+
+class TestGeminiServiceKeys:
+    def test_429_moves_to_another_key_without_global_configure(self, monkeypatch):
+        monkeypatch.setenv("GEMINI_API_KEYS", "key-aaaa,key-bbbb")
+        from app.services import gemini_service
+
+        used_clients = []
+
+        class FakeModel:
+            def __init__(self, name):
+                self._client = None
+
+            def generate_content(self, prompt, stream=False, generation_config=None):
+                used_clients.append(self._client)
+                if len(used_clients) == 1:
+                    raise ResourceExhausted("quota exceeded")
+                return SimpleNamespace(text="ok", usage_metadata=None)
+
+        with patch.object(gemini_service.genai, "GenerativeModel", FakeModel), \
+             patch.object(gemini_service.genai, "configure") as configure:
+            service = gemini_service.GeminiService()
+            service.key_pool._client_factory = lambda key: f"client-{key}"
+            assert service.generate_response("hi", "system") == "ok"
+
+        configure.assert_not_called()
+        assert len(used_clients) == 2 and used_clients[0] != used_clients[1]
+        recent = get_llm_telemetry().query(operation="chat", limit=2)
+        assert [r["outcome"] for r in recent] == ["ok", "throttled"]
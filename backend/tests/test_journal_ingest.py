@@ -0,0 +1,53 @@
+"""Tests for background journal memory extraction (app.services.journal_ingest)."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services import journal_ingest
+
+
+class TestExtractJournalJob:
+    def test_extracts_stored_entry(self):
+        journal_service, journal = MagicMock(), MagicMock()
+        journal_service.get_user_journal.return_value = journal
+        with patch.object(journal_ingest, "get_journal_service", return_value=journal_service):
+            journal_ingest.extract_journal_memories({"user_id": "u1", "journal_id": "j1"})
+
+        journal_service.get_user_journal.assert_called_once_with("j1", "u1")
+        journal_service.extract_journal_memories.assert_called_once_with(journal)
+
+    def test_deleted_entry_is_skipped(self):
+        journal_service = MagicMock()
+        journal_service.get_user_journal.return_value = None
+        with patch.object(journal_ingest, "get_journal_service", return_value=journal_service):
+            journal_ingest.extract_journal_memories({"user_id": "u1", "journal_id": "j1"})
+
+        journal_service.extract_journal_memories.assert_not_called()
+
+    def test_enqueue_registers_and_queues(self):
+        queue = MagicMock()
+        queue.enqueue = AsyncMock()
+        with patch.object(journal_ingest, "get_work_queue", return_value=queue):
+            asyncio.run(journal_ingest.enqueue_journal_extraction("u1", "j1"))
+
+        queue.register.assert_any_call(journal_ingest.EXTRACT_JOURNAL_JOB, journal_ingest.extract_journal_memories)
+        queue.enqueue.assert_awaited_once_with(journal_ingest.EXTRACT_JOURNAL_JOB, "u1", {"user_id": "u1", "journal_id": "j1"})
+
+
+class TestRetireJournalMemoriesJob:
+    def test_retires_deleted_entry_memories(self):
+        journal_service = MagicMock()
+        with patch.object(journal_ingest, "get_journal_service", return_value=journal_service):
+            journal_ingest.retire_journal_memories({"user_id": "u1", "memory_ids": ["m1"]})
+
+        journal_service.retire_journal_memories.assert_called_once_with("u1", ["m1"])
+
+    def test_enqueue_registers_and_queues(self):
+        queue = MagicMock()
+        queue.enqueue = AsyncMock()
+        with patch.object(journal_ingest, "get_work_queue", return_value=queue):
+            asyncio.run(journal_ingest.enqueue_journal_retirement("u1", ["m1"]))
+
+        queue.register.assert_any_call(journal_ingest.RETIRE_JOURNAL_MEMORIES_JOB, journal_ingest.retire_journal_memories)
+        queue.enqueue.assert_awaited_once_with(
+            journal_ingest.RETIRE_JOURNAL_MEMORIES_JOB, "u1", {"user_id": "u1", "memory_ids": ["m1"]}
+        )
@@ -0,0 +1,292 @@
+"""Tests for app.services.journal_service (with mocked Supabase)."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models.journal import UserJournalCreate, UserJournalRecord
+from app.services.journal_service import JournalService
+from app.utils.chunking import paragraph_hash
+from app.utils.pagination import InvalidCursor, decode_cursor
+
+
+@pytest.fixture
+def mock_supabase():
+    with patch("app.services.journal_service.get_supabase_client") as m:
+        client = MagicMock()
+        m.return_value = client
+        yield client
+
+
+@pytest.fixture
+def journal_service(mock_supabase):
+    return JournalService()
+
+
+def _hit(i, rank):
+    return {
+        "id": f"j{i}",
+        "created_at": f"2026-01-0{i + 1}T00:00:00+00:00",
+        "tags": [],
+        "rank": rank,
+        "headline": f"about <mark>hiking</mark> {i}",
+    }
+
+
+class TestSearchUserJournals:
+    def test_ranked_page_with_next_cursor(self, journal_service, mock_supabase):
+        mock_supabase.rpc.return_value.execute.return_value.data = [_hit(0, 0.9), _hit(1, 0.5), _hit(2, 0.1)]
+
+        page = journal_service.search_user_journals("u1", "hiking", limit=2)
+
+        name, params = mock_supabase.rpc.call_args[0]
+        assert name == "search_user_journals"
+        assert params == {"p_user_id": "u1", "p_query": "hiking", "p_limit": 3}
+        assert [hit.id for hit in page.items] == ["j0", "j1"]
+        assert page.items[0].headline == "about <mark>hiking</mark> 0"
+        assert decode_cursor(page.next_cursor, 3) == [0.5, "2026-01-02T00:00:00+00:00", "j1"]
+
+    def test_cursor_becomes_keyset_params(self, journal_service, mock_supabase):
+        mock_supabase.rpc.return_value.execute.return_value.data = [_hit(0, 0.9), _hit(1, 0.5), _hit(2, 0.1)]
+        first = journal_service.search_user_journals("u1", "hiking", limit=2)
+        mock_supabase.rpc.return_value.execute.return_value.data = [_hit(2, 0.1)]
+
+        page = journal_service.search_user_journals("u1", "hiking", limit=2, cursor=first.next_cursor)
+
+        params = mock_supabase.rpc.call_args[0][1]
+        assert params["p_after_rank"] == 0.5
+        assert params["p_after_created_at"] == "2026-01-02T00:00:00+00:00"
+        assert params["p_after_id"] == "j1"
+        assert [hit.id for hit in page.items] == ["j2"]
+        assert page.next_cursor is None
+
+    def test_bad_cursor(self, journal_service):
+        with pytest.raises(InvalidCursor):
+            journal_service.search_user_journals("u1", "hiking", cursor="garbage")
+
+    def test_async_uses_repository(self, journal_service):
+        journal_service.user_journals.search = AsyncMock(return_value=[_hit(0, 0.9)])
+
+        page = asyncio.run(journal_service.search_user_journals_async("u1", "hiking", limit=5))
+
+        params = journal_service.user_journals.search.call_args[0][0]
+        assert params["p_limit"] == 6
+        assert [hit.id for hit in page.items] == ["j0"]
+        assert page.next_cursor is None
+
+
+def _journal(i):
+    return {"id": f"j{i}", "user_id": "u1", "content": f"entry {i}", "created_at": f"2026-01-0{9 - i}T00:00:00+00:00"}
+
+
+class TestJournalListings:
+    def test_offset_page_reports_next_cursor(self, journal_service, mock_supabase):
+        query = mock_supabase.table.return_value.select.return_value.eq.return_value
+        query.order.return_value = query
+        query.range.return_value.execute.return_value.data = [_journal(0), _journal(1), _journal(2)]
+
+        journals, next_cursor = journal_service.get_user_journals("u1", limit=2)
+
+        query.range.assert_called_once_with(0, 2)
+        assert [journal.id for journal in journals] == ["j0", "j1"]
+        assert decode_cursor(next_cursor, 2) == ["2026-01-08T00:00:00+00:00", "j1"]
+
+    def test_cursor_continues_after_last_row(self, journal_service):
+        journal_service.ai_journals.list_for_user = AsyncMock(return_value=[{**_journal(2), "conversation_id": "c"}])
+        cursor = "WyIyMDI2LTAxLTA4VDAwOjAwOjAwKzAwOjAwIiwiajEiXQ"
+
+        journals, next_cursor = asyncio.run(journal_service.get_ai_journals_async("u1", 2, 0, cursor))
+
+        assert journal_service.ai_journals.list_for_user.call_args[0] == (
+            "u1", 2, 0, ["2026-01-08T00:00:00+00:00", "j1"]
+        )
+        assert [journal.id for journal in journals] == ["j2"]
+        assert next_cursor is None
+
+
+class TestJournalTags:
+    def test_tag_modes_use_one_array_filter(self, journal_service, mock_supabase):
+        query = mock_supabase.table.return_value.select.return_value.eq.return_value
+        for mode, method in (("all", query.contains), ("any", query.overlaps)):
+            method.return_value.order.return_value = method.return_value
+            method.return_value.range.return_value.execute.return_value.data = []
+
+            journal_service.get_user_journals("u1", tags=["travel", "food"], tag_mode=mode)
+
+            method.assert_called_once_with("tags", ["travel", "food"])
+
+    def test_unknown_tag_mode(self, journal_service):
+        with pytest.raises(ValueError):
+            journal_service.get_user_journals("u1", tags=["travel"], tag_mode="some")
+
+    def test_counts_from_aggregate(self, journal_service):
+        journal_service.user_journals.tag_counts = AsyncMock(return_value=[
+            {"tag": "travel", "journal_count": 3},
+            {"tag": "food", "journal_count": 1},
+        ])
+
+        counts = asyncio.run(journal_service.get_user_journal_tags_async("u1"))
+
+        assert [(c.tag, c.count) for c in counts] == [("travel", 3), ("food", 1)]
+
+    def test_counts_fall_back_to_journal_tags(self, journal_service):
+        journal_service.user_journals.tag_counts = AsyncMock(side_effect=Exception("relation does not exist"))
+        journal_service.user_journals.all_tags = AsyncMock(return_value=[["b", "a"], ["a", "a"], []])
+
+        counts = asyncio.run(journal_service.get_user_journal_tags_async("u1"))
+
+        assert [(c.tag, c.count) for c in counts] == [("a", 2), ("b", 1)]
+
+
+class TestJournalExtraction:
+    def _updates(self, mock_supabase):
+        return [c.args[0] for c in mock_supabase.table.return_value.update.call_args_list]
+
+    def test_chunked_extraction_records_progress(self, journal_service, mock_supabase):
+        memory = MagicMock()
+        memory.extract_from_chunks.return_value = [{"content": "User hikes", "chunks": [1]}]
+        memory.store_journal_memories.return_value = [(MagicMock(id="m1"), None)]
+        journal = UserJournalRecord({"id": "j1", "user_id": "u1", "content": "a" * 30 + "\n\n" + "b" * 30})
+
+        with patch("app.services.journal_service.get_memory_service", return_value=memory), \
+             patch("app.services.journal_service.JOURNAL_CHUNK_CHARS", 40):
+            stats = journal_service.extract_journal_memories(journal)
+
+        assert stats["chunks"] == 2
+        assert stats["memories"] == 1
+        memory.extract_from_chunks.assert_called_once_with(["a" * 30, "b" * 30])
+        memory.store_journal_memories.assert_called_once_with("u1", [{"content": "User hikes", "chunks": [1]}])
+        links = mock_supabase.table.return_value.upsert.call_args[0][0]
+        assert links == [{"journal_id": "j1", "memory_id": "m1", "paragraph_hash": paragraph_hash("b" * 30), "user_id": "u1"}]
+        updates = self._updates(mock_supabase)
+        assert [u["extraction_status"] for u in updates] == ["processing", "done"]
+        assert updates[-1]["extraction_chunks"] == 2
+        assert updates[-1]["extracted_memories"] == 1
+        assert updates[-1]["paragraph_hashes"] == [paragraph_hash("a" * 30), paragraph_hash("b" * 30)]
+
+    def test_edit_extracts_only_changed_paragraphs(self, journal_service, mock_supabase):
+        memory = MagicMock()
+        memory.extract_from_chunks.return_value = [{"content": "User moved to Hue", "chunks": [0]}]
+        memory.store_journal_memories.return_value = [(MagicMock(id="m2"), None)]
+        memory.downweight_memories.return_value = 1
+        mock_supabase.table.return_value.delete.return_value.eq.return_value.in_.return_value.execute.return_value.data = [
+            {"memory_id": "m1"}, {"memory_id": "m3"}
+        ]
+        mock_supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = [
+            {"memory_id": "m3"}
+        ]
+        journal = UserJournalRecord({
+            "id": "j1",
+            "user_id": "u1",
+            "content": "Kept paragraph.\n\nI moved to Hue.",
+            "paragraph_hashes": [paragraph_hash("Kept paragraph."), paragraph_hash("I lived in Hanoi.")],
+        })
+
+        with patch("app.services.journal_service.get_memory_service", return_value=memory):
+            stats = journal_service.extract_journal_memories(journal)
+
+        memory.extract_from_chunks.assert_called_once_with(["I moved to Hue."])
+        delete = mock_supabase.table.return_value.delete.return_value.eq.return_value.in_
+        delete.assert_called_once_with("paragraph_hash", [paragraph_hash("I lived in Hanoi.")])
+        memory.downweight_memories.assert_called_once_with("u1", ["m1"])
+        assert stats["paragraphs_extracted"] == 1
+        assert stats["paragraphs_removed"] == 1
+        assert stats["downweighted"] == 1
+
+    def test_memory_merged_into_chat_memory_is_not_linked(self, journal_service, mock_supabase):
+        memory = MagicMock()
+        memory.extract_from_chunks.return_value = [
+            {"content": "User hikes"}, {"content": "User likes tea"}, {"content": "User runs"}, {"content": "User swims"}
+        ]
+        memory.store_journal_memories.return_value = [
+            (MagicMock(id="chat1"), "chat"),
+            # Journal-sourced only because a journal memory merged into it (no links)
+            (MagicMock(id="chat2"), "journal"),
+            (MagicMock(id="j-old"), "journal"),
+            (MagicMock(id="m1"), None),
+        ]
+        mock_supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = [
+            {"memory_id": "j-old"}
+        ]
+        journal = UserJournalRecord({"id": "j1", "user_id": "u1", "content": "I hike, drink tea, run and swim."})
+
+        with patch("app.services.journal_service.get_memory_service", return_value=memory):
+            stats = journal_service.extract_journal_memories(journal)
+
+        links = mock_supabase.table.return_value.upsert.call_args[0][0]
+        assert [link["memory_id"] for link in links] == ["j-old", "m1"]
+        assert stats["memories"] == 4
+
+    def test_unchanged_entry_costs_no_extraction(self, journal_service, mock_supabase):
+        memory = MagicMock()
+        journal = UserJournalRecord({
+            "id": "j1", "user_id": "u1", "content": "Same  text.", "paragraph_hashes": [paragraph_hash("Same text.")]
+        })
+
+        with patch("app.services.journal_service.get_memory_service", return_value=memory):
+            stats = journal_service.extract_journal_memories(journal)
+
+        memory.extract_from_chunks.assert_not_called()
+        memory.downweight_memories.assert_not_called()
+        assert stats["chunks"] == 0
+        assert self._updates(mock_supabase)[-1]["extraction_status"] == "done"
+
+    def test_failure_is_recorded_and_raised(self, journal_service, mock_supabase):
+        memory = MagicMock()
+        memory.extract_from_chunks.side_effect = RuntimeError("quota exceeded")
+        journal = UserJournalRecord({"id": "j1", "user_id": "u1", "content": "entry"})
+
+        with patch("app.services.journal_service.get_memory_service", return_value=memory):
+            with pytest.raises(RuntimeError):
+                journal_service.extract_journal_memories(journal)
+
+        updates = self._updates(mock_supabase)
+        assert updates[-1]["extraction_status"] == "failed"
+        assert updates[-1]["extraction_error"] == "quota exceeded"
+
+    def test_async_create_does_not_extract(self, journal_service):
+        journal_service.user_journals.insert = AsyncMock(return_value={"id": "j1", "user_id": "u1", "content": "x"})
+
+        with patch("app.services.journal_service.get_memory_service") as memory:
+            journal = asyncio.run(journal_service.create_user_journal_async(UserJournalCreate(user_id="u1", content="x")))
+
+        assert journal.id == "j1"
+        memory.assert_not_called()
+
+    def test_status_of_missing_journal(self, journal_service):
+        journal_service.user_journals.get = AsyncMock(return_value=None)
+
+        assert asyncio.run(journal_service.get_extraction_status_async("j1", "u1")) is None
+
+
+class TestJournalDelete:
+    def test_delete_retires_memories_only_it_linked(self, journal_service, mock_supabase):
+        memory = MagicMock()
+        memory.downweight_memories.return_value = 1
+        table = mock_supabase.table.return_value
+        table.select.return_value.eq.return_value.execute.return_value.data = [{"memory_id": "m1"}, {"memory_id": "m2"}]
+        table.delete.return_value.eq.return_value.eq.return_value.execute.return_value.data = [{"id": "j1"}]
+        # m2 is still linked from another entry
+        table.select.return_value.in_.return_value.execute.return_value.data = [{"memory_id": "m2"}]
+
+        with patch("app.services.journal_service.get_memory_service", return_value=memory):
+            assert journal_service.delete_user_journal("j1", "u1") is True
+
+        memory.downweight_memories.assert_called_once_with("u1", ["m1"])
+
+    def test_missing_journal_retires_nothing(self, journal_service, mock_supabase):
+        memory = MagicMock()
+        table = mock_supabase.table.return_value
+        table.select.return_value.eq.return_value.execute.return_value.data = [{"memory_id": "m1"}]
+        table.delete.return_value.eq.return_value.eq.return_value.execute.return_value.data = []
+
+        with patch("app.services.journal_service.get_memory_service", return_value=memory):
+            assert journal_service.delete_user_journal("j1", "u2") is False
+
+        memory.downweight_memories.assert_not_called()
+
+    def test_async_reads_links_from_repository(self, journal_service):
+        journal_service.user_journals.linked_memory_ids = AsyncMock(return_value=["m1"])
+
+        assert asyncio.run(journal_service.get_journal_memory_ids_async("j1")) == ["m1"]
+        journal_service.user_journals.linked_memory_ids.assert_awaited_once_with("j1")
@@ -0,0 +1,57 @@
+"""Tests for app.services.llm_telemetry."""
+import json
+import time
+from types import SimpleNamespace
+
+from app.services.llm_telemetry import LLMAttempt, LLMTelemetry, usage_counts
+
+
+def _attempt(outcome="ok", key="...aaaa", latency_ms=10.0, **kwargs):
+    return LLMAttempt(
+        ts=time.time(), operation="chat", key=key, attempt=0,
+        outcome=outcome, latency_ms=latency_ms, **kwargs
+    )
+
+
+class TestLLMTelemetry:
+    def test_buffer_is_bounded(self):
+        telemetry = LLMTelemetry(capacity=3, export_path="")
+        for i in range(5):
+            telemetry.record(_attempt(latency_ms=float(i)))
+        records = telemetry.query()
+        assert [r["latency_ms"] for r in records] == [4.0, 3.0, 2.0]
+
+    def test_query_filters_and_summary(self):
+        telemetry = LLMTelemetry(export_path="")
+        telemetry.record(_attempt(total_tokens=120))
+        telemetry.record(_attempt(outcome="throttled", key="...bbbb", error_class="ResourceExhausted"))
+        assert len(telemetry.query(outcome="throttled")) == 1
+        assert telemetry.query(key="bbbb")[0]["outcome"] == "throttled"
+        summary = telemetry.summary()
+        assert summary["by_outcome"] == {"ok": 1, "throttled": 1}
+        assert summary["by_error_class"] == {"ResourceExhausted": 1}
+        assert summary["total_tokens"] == 120
+
+    def test_record_does_no_io_until_flush(self, tmp_path):
+        path = tmp_path / "llm.jsonl"
+        telemetry = LLMTelemetry(export_path=str(path), flush_interval_s=60)
+        telemetry.record(_attempt())
+        telemetry.record(_attempt(outcome="error", error_class="ValueError"))
+        assert not path.exists()
+        telemetry.close()
+        lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert [line["outcome"] for line in lines] == ["ok", "error"]
+        assert telemetry.summary()["unflushed"] == 0
+
+    def test_export_jsonl(self):
+        telemetry = LLMTelemetry(export_path="")
+        telemetry.record(_attempt())
+        lines = list(telemetry.export_jsonl())
+        assert json.loads(lines[0])["operation"] == "chat"
+
+    def test_usage_counts(self):
+        response = SimpleNamespace(usage_metadata=SimpleNamespace(
+            prompt_token_count=10, candidates_token_count=5, total_token_count=15
+        ))
+        assert usage_counts(response) == {"prompt_tokens": 10, "output_tokens": 5, "total_tokens": 15}
+        assert usage_counts(None) == {"prompt_tokens": None, "output_tokens": None, "total_tokens": None}
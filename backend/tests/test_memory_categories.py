@@ -0,0 +1,86 @@
+"""Tests for app.utils.memory_categories."""
+import json
+
+import pytest
+
+from app.utils.memory_categories import (
+    DEFAULT_RULES,
+    KeywordMatcher,
+    MemoryCategorizer,
+    load_category_rules,
+)
+
+
+def test_matches_whole_words_only():
+    matcher = KeywordMatcher({"a": ["from", "know"]})
+
+    assert matcher.labels_in("I am from Hanoi") == {"a"}
+    assert matcher.labels_in("the frompt field") == set()
+    assert matcher.labels_in("general knowledge") == set()
+
+
+def test_every_matching_label_in_one_scan():
+    matcher = KeywordMatcher({"a": ["coffee"], "b": ["tea", "coffee"], "c": ["water"]})
+
+    assert matcher.labels_in("Coffee, then TEA") == {"a", "b"}
+
+
+def test_prefix_keywords_and_phrases():
+    matcher = KeywordMatcher({"rel": ["friend*"], "no": ["do not", "can't"]})
+
+    assert matcher.labels_in("my friendship with Lan") == {"rel"}
+    assert matcher.labels_in("Please do  not call") == {"no"}
+    assert matcher.labels_in("I can’t swim") == {"no"}
+    assert matcher.labels_in("unfriendly") == set()
+
+
+def test_category_priority_and_constraint_type():
+    categorizer = MemoryCategorizer()
+
+    assert categorizer.classify("I love my family") == ("preference", "preference")
+    assert categorizer.classify("My friend never eats meat") == ("relationship", "constraint")
+    assert categorizer.classify("Knowledge is power") == ("fact", "fact")
+
+
+def test_classify_keeps_given_values():
+    categorizer = MemoryCategorizer()
+
+    assert categorizer.classify("I want a dog", category="pets") == ("pets", "fact")
+    assert categorizer.classify("I want a dog", memory_type="fact") == ("goal", "fact")
+
+
+def test_classify_many_treats_other_as_missing():
+    categorizer = MemoryCategorizer()
+    extracted = [
+        {"content": "I plan to run a marathon", "category": "other"},
+        {"content": "Allergic to peanuts", "category": "health"},
+        {"content": "Lives in Da Nang", "category": "personal_info", "memory_type": "fact"},
+    ]
+
+    assert categorizer.classify_many(extracted) == [
+        ("goal", "goal"),
+        ("health", "constraint"),
+        ("personal_info", "fact"),
+    ]
+
+
+def test_rules_load_from_json(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"categories": {"food": ["pho", "bun*"]}, "constraint": ["vegan"]}))
+    categorizer = MemoryCategorizer(load_category_rules(str(path)))
+
+    assert categorizer.classify("Eats pho daily") == ("food", "fact")
+    assert categorizer.classify("Vegan, eats bunny-shaped bread") == ("food", "constraint")
+    assert categorizer.classify("I like coffee") == ("fact", "fact")
+
+
+def test_invalid_rules_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"categories": ["food"]}))
+
+    with pytest.raises(ValueError):
+        load_category_rules(str(path))
+
+
+def test_default_rules_cover_the_documented_categories():
+    assert tuple(DEFAULT_RULES["categories"]) == ("preference", "personal_info", "relationship", "goal")
@@ -9,6 +9,9 @@ from app.utils.memory_filter import (
     get_memory_tier,
     compute_ttl_days,
     compute_decay_score,
+    compute_decay_scores,
+    decay_feature_matrix,
+    expired_mask,
     is_memory_expired,
     should_keep_memory,
     filter_unimportant_memories,
@@ -126,6 +129,46 @@ class TestIsMemoryExpired:
         assert is_memory_expired(mem) is False
 
 
+class TestBatchScoring:
+    def test_matches_scalar_functions(self):
+        now = datetime.now()
+        memories = [
+            Memory(
+                user_id="u",
+                content="x",
+                importance_score=importance,
+                category="fact",
+                memory_type=memory_type,
+                stability=stability,
+                ttl_days=ttl_days,
+                created_at=now - timedelta(days=age),
+                last_accessed=now - timedelta(days=idle) if idle is not None else None,
+                access_count=access_count,
+                is_pinned=pinned,
+            )
+            for importance, memory_type, stability, ttl_days, age, idle, access_count, pinned in [
+                (0.9, "constraint", 0.8, 30, 60, 10, 10, False),
+                (0.5, "fact", None, 30, 60, 45, 0, False),
+                (0.3, "preference", 0.2, 30, 60, 200, 0, True),
+                (0.6, "goal", 0.5, None, 5, None, 1, False),
+                (0.75, None, 1.0, 400, 10, 3, 0, None),
+            ]
+        ]
+        features = decay_feature_matrix(memories)
+        expected_decay = [
+            compute_decay_score(m.importance_score, m.last_accessed, m.memory_type,
+                                m.stability if m.stability is not None else 0.5, now)
+            for m in memories
+        ]
+        assert list(compute_decay_scores(features, now)) == pytest.approx(expected_decay)
+        assert list(expired_mask(features, now)) == [is_memory_expired(m, now) for m in memories]
+
+    def test_empty_set(self):
+        features = decay_feature_matrix([])
+        assert compute_decay_scores(features).shape == (0,)
+        assert expired_mask(features).shape == (0,)
+
+
 class TestShouldKeepMemory:
     def test_high_importance_always_keep(self):
         mem = Memory(user_id="u", content="x", importance_score=0.8, category="fact")
@@ -189,6 +232,9 @@ class TestCategorizeMemoryContent:
     def test_fact_default(self):
         assert categorize_memory_content("The meeting was on Monday") == "fact"
 
+    def test_no_substring_matches(self):
+        assert categorize_memory_content("Studies machine knowledge graphs") == "fact"
+
 
 class TestInferMemoryType:
     def test_constraint(self):
@@ -0,0 +1,36 @@
+"""Tests for app.services.memory_maintenance (prune job and periodic sweep)."""
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from app.services import memory_maintenance
+
+
+def test_prune_job_adds_to_totals():
+    memory = MagicMock()
+    memory.prune_memories.return_value = {"examined": 10, "expired": 2, "over_budget": 1, "deleted": 3}
+    before = memory_maintenance.prune_stats()
+    with patch.object(memory_maintenance, "get_memory_service", return_value=memory):
+        memory_maintenance.prune_user_memories({"user_id": "user-1"})
+
+    memory.prune_memories.assert_called_once_with("user-1")
+    after = memory_maintenance.prune_stats()
+    assert after["runs"] == before["runs"] + 1
+    assert after["examined"] == before["examined"] + 10
+    assert after["deleted"] == before["deleted"] + 3
+
+
+def test_sweep_deletes_expired_in_one_rpc():
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value.data = 7
+    queue = MagicMock()
+    before = memory_maintenance.prune_stats()
+    with patch.object(memory_maintenance, "get_supabase_client", return_value=client), \
+         patch("app.services.work_queue.get_work_queue", return_value=queue):
+        deleted = asyncio.run(memory_maintenance.sweep_memories())
+
+    assert deleted == 7
+    client.rpc.assert_called_once_with("prune_expired_memories", {})
+    queue.enqueue.assert_not_called()
+    after = memory_maintenance.prune_stats()
+    assert after["deleted"] == before["deleted"] + 7
+    assert after["last_sweep"]["deleted"] == 7
@@ -1,6 +1,8 @@
 """Tests for app.services.memory_service (with mocked Supabase and Gemini)."""
-from datetime import datetime
-from unittest.mock import MagicMock, patch
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
@@ -91,6 +93,34 @@ class TestCreateMemory:
         assert call_args.get("source") == "chat"
 
 
+class TestStabilityFallback:
+    def test_writes_without_stability_until_migration(self, memory_service, mock_supabase):
+        table = mock_supabase.table.return_value
+        written = []
+
+        def insert(rows):
+            written.append(rows)
+            if "stability" in rows[0]:
+                raise Exception("Could not find the 'stability' column of 'memories' in the schema cache")
+            return MagicMock(execute=MagicMock(return_value=MagicMock(
+                data=[{**row, "id": f"new-{i}"} for i, row in enumerate(rows)]
+            )))
+        table.insert.side_effect = insert
+
+        row = {"user_id": "user-1", "content": "User hikes", "stability": 0.5}
+        assert memory_service._insert_memories("user-1", [row])[0]["id"] == "new-0"
+        memory_service._insert_memories("user-1", [row])
+
+        assert ["stability" in rows[0] for rows in written] == [True, False, False]
+
+    def test_other_errors_still_raise(self, memory_service, mock_supabase):
+        mock_supabase.table.return_value.insert.side_effect = Exception("connection reset")
+
+        with pytest.raises(Exception, match="connection reset"):
+            memory_service._insert_memories("user-1", [{"content": "x", "stability": 0.5}])
+        assert memory_service._stability_column
+
+
 class TestExtractAndStoreMemories:
     def test_journal_source_passed_and_stored(self, memory_service, mock_supabase, mock_gemini):
         mock_gemini.extract_memories.return_value = [
@@ -135,6 +165,125 @@ class TestExtractAndStoreMemories:
         stored = memory_service.extract_and_store_memories("user-1", "Conversation")
         assert len(stored) == 0
 
+    def test_batch_writes_one_insert_and_one_upsert_in_order(self, memory_service, mock_supabase):
+        now = datetime.now().isoformat()
+        existing = {"id": "old-1", "user_id": "user-1", "content": "User works as a night shift nurse",
+                    "importance_score": 0.5, "category": "fact", "created_at": now, "last_accessed": now,
+                    "access_count": 1, "decay_score": 0.5, "ttl_days": 100, "is_pinned": False,
+                    "memory_type": "fact", "source": "chat"}
+        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [existing]
+        table = mock_supabase.table.return_value
+        table.insert.side_effect = lambda rows: MagicMock(execute=MagicMock(return_value=MagicMock(
+            data=[{**row, "id": f"new-{i}"} for i, row in enumerate(rows)]
+        )))
+        memory_service.access = MagicMock()
+        extracted = [
+            {"content": "User loves hiking in the mountains", "importance_score": 0.6},
+            {"content": "User works as a night shift nurse", "importance_score": 0.8},
+            {"content": "User has a cat named Miso", "importance_score": 0.6},
+            {"content": "User loves hiking in the mountains!", "importance_score": 0.9},
+        ]
+
+        stored = memory_service.store_extracted_memories("user-1", extracted)
+
+        assert [m.id for m in stored] == ["new-0", "old-1", "new-1", "new-0"]
+        table.insert.assert_called_once()
+        assert len(table.insert.call_args[0][0]) == 2
+        table.upsert.assert_called_once()
+        upserted = table.upsert.call_args[0][0]
+        assert [row["id"] for row in upserted] == ["old-1"]
+        # The merge is an access: counted by the tracker, never written as an absolute count
+        assert not {"access_count", "last_accessed", "last_used_in_chat"} & upserted[0].keys()
+        memory_service.access.record.assert_called_once_with(["old-1"])
+        assert memory_service.indexes.get("user-1").rows["old-1"]["access_count"] == 2
+        table.update.assert_not_called()
+
+    def test_journal_memories_report_provenance(self, memory_service, mock_supabase):
+        now = datetime.now().isoformat()
+        chat = {"id": "chat-1", "user_id": "user-1", "content": "User works as a night shift nurse",
+                "importance_score": 0.5, "category": "fact", "created_at": now, "last_accessed": now,
+                "access_count": 1, "decay_score": 0.5, "ttl_days": 100, "is_pinned": False,
+                "memory_type": "fact", "source": "chat"}
+        journal = {**chat, "id": "journal-1", "content": "User has a cat named Miso", "source": "journal"}
+        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [chat, journal]
+        mock_supabase.table.return_value.insert.side_effect = lambda rows: MagicMock(execute=MagicMock(
+            return_value=MagicMock(data=[{**row, "id": f"new-{i}"} for i, row in enumerate(rows)])
+        ))
+        memory_service.access = MagicMock()
+        extracted = [
+            {"content": "User works as a night shift nurse", "importance_score": 0.8},
+            {"content": "User has a cat named Miso", "importance_score": 0.6},
+            {"content": "User loves hiking in the mountains", "importance_score": 0.6},
+        ]
+
+        stored = memory_service.store_journal_memories("user-1", extracted)
+
+        assert [(m.id, provenance) for m, provenance in stored] == [
+            ("chat-1", "chat"), ("journal-1", "journal"), ("new-0", None)
+        ]
+
+    def test_negation_in_same_batch_is_kept_separate(self, memory_service, mock_supabase):
+        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = []
+        table = mock_supabase.table.return_value
+        table.insert.side_effect = lambda rows: MagicMock(execute=MagicMock(return_value=MagicMock(
+            data=[{**row, "id": f"new-{i}"} for i, row in enumerate(rows)]
+        )))
+
+        stored = memory_service.store_extracted_memories("user-1", [
+            {"content": "User is allergic to peanuts"},
+            {"content": "User is not allergic to peanuts"},
+        ])
+
+        assert [m.id for m in stored] == ["new-0", "new-1"]
+
+
+class TestExtractFromChunks:
+    def test_chunks_labelled_and_merged(self, memory_service, mock_gemini):
+        mock_gemini.key_pool.__len__.return_value = 2
+        mock_gemini.extract_memories.side_effect = lambda text, strict: [
+            {"content": "User loves  hiking", "importance_score": 0.4 if "part 1" in text else 0.7},
+            {"content": text.split("\n", 1)[1], "importance_score": 0.5},
+        ]
+
+        memories = memory_service.extract_from_chunks(["first", "second"])
+
+        texts = sorted(c.args[0] for c in mock_gemini.extract_memories.call_args_list)
+        assert texts == ["User journal entry (part 1 of 2):\nfirst", "User journal entry (part 2 of 2):\nsecond"]
+        assert all(c.kwargs == {"strict": True} for c in mock_gemini.extract_memories.call_args_list)
+        by_content = {m["content"].lower(): (m["importance_score"], m["chunks"]) for m in memories}
+        assert by_content == {"user loves  hiking": (0.7, [0, 1]), "first": (0.5, [0]), "second": (0.5, [1])}
+
+    def test_failed_chunk_raises(self, memory_service, mock_gemini):
+        mock_gemini.extract_memories.side_effect = [[], RuntimeError("quota")]
+
+        with pytest.raises(RuntimeError):
+            memory_service.extract_from_chunks(["a", "b"])
+
+    def test_no_chunks(self, memory_service, mock_gemini):
+        assert memory_service.extract_from_chunks([]) == []
+        mock_gemini.extract_memories.assert_not_called()
+
+
+class TestDownweightMemories:
+    def test_scales_importance_and_skips_pinned(self, memory_service, mock_supabase):
+        now = datetime.now().isoformat()
+        base = {"user_id": "user-1", "memory_type": "fact", "stability": 0.5, "last_accessed": now, "created_at": now}
+        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [
+            {**base, "id": "m1", "content": "User hikes", "importance_score": 0.8, "ttl_days": 365, "is_pinned": False},
+            {**base, "id": "m2", "content": "User is vegan", "importance_score": 0.8, "ttl_days": 365, "is_pinned": True},
+            {**base, "id": "m3", "content": "User has a cat", "importance_score": 0.8, "ttl_days": 365, "is_pinned": False},
+        ]
+
+        assert memory_service.downweight_memories("user-1", ["m1", "m2"], factor=0.5) == 1
+
+        payload = mock_supabase.table.return_value.upsert.call_args[0][0]
+        assert [row["id"] for row in payload] == ["m1"]
+        assert payload[0]["importance_score"] == 0.4
+        assert payload[0]["ttl_days"] < 365
+        cached = {row["id"]: row for row in memory_service.indexes.get("user-1").all_rows()}
+        assert cached["m1"]["importance_score"] == 0.4
+        assert cached["m2"]["importance_score"] == 0.8
+
 
 class TestPruneMemories:
     def test_under_budget_no_delete(self, memory_service, mock_supabase):
@@ -146,8 +295,9 @@ class TestPruneMemories:
             for i in range(3)
         ]
         memory_service.max_memories_per_user = 500
-        memory_service.prune_memories("user-1")
-        mock_supabase.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute.assert_not_called()
+        stats = memory_service.prune_memories("user-1")
+        mock_supabase.table.return_value.delete.assert_not_called()
+        assert stats == {"examined": 3, "expired": 0, "over_budget": 0, "deleted": 0}
 
     def test_over_budget_prunes_low_score(self, memory_service, mock_supabase):
         data = [
@@ -159,14 +309,46 @@ class TestPruneMemories:
             for i in range(5)
         ]
         mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = data
+        delete = mock_supabase.table.return_value.delete.return_value.in_
+        delete.return_value.eq.return_value.execute.return_value.data = [{"id": "m2"}, {"id": "m3"}]
         memory_service.max_memories_per_user = 3
-        memory_service.prune_memories("user-1")
-        delete_calls = mock_supabase.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute.call_count
-        assert delete_calls >= 1
+        stats = memory_service.prune_memories("user-1")
+        delete.assert_called_once_with("id", ["m2", "m3"])
+        assert stats == {"examined": 5, "expired": 0, "over_budget": 2, "deleted": 2}
+        selected = mock_supabase.table.return_value.select.call_args[0][0]
+        assert "content" not in selected
+
+
+    def test_expired_deleted_in_batches(self, memory_service, mock_supabase):
+        old = (datetime.now() - timedelta(days=90)).isoformat()
+        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [
+            {"id": f"m{i}", "importance_score": 0.5, "memory_type": "fact", "created_at": old,
+             "last_accessed": old, "ttl_days": 30, "access_count": 0, "is_pinned": i == 4}
+            for i in range(5)
+        ]
+        delete = mock_supabase.table.return_value.delete.return_value.in_
+        with patch("app.services.memory_service.MEMORY_PRUNE_DELETE_BATCH", 3):
+            stats = memory_service.prune_memories("user-1")
+        assert [c.args[1] for c in delete.call_args_list] == [["m0", "m1", "m2"], ["m3"]]
+        assert stats["expired"] == 4
+
+    def test_store_prunes_only_when_over_budget(self, memory_service, mock_supabase):
+        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = []
+        mock_supabase.table.return_value.insert.side_effect = lambda rows: MagicMock(execute=MagicMock(
+            return_value=MagicMock(data=[{**row, "id": row["content"]} for row in rows])
+        ))
+        memory_service.prune_memories = MagicMock()
+        memory_service.max_memories_per_user = 1
+
+        memory_service.store_extracted_memories("user-1", [{"content": "User loves hiking"}])
+        memory_service.prune_memories.assert_not_called()
 
+        memory_service.store_extracted_memories("user-1", [{"content": "User has a cat named Miso"}])
+        memory_service.prune_memories.assert_called_once_with("user-1")
 
-class TestMergeWithExisting:
-    def test_journal_source_preserved_in_merge(self, memory_service, mock_supabase):
+
+class TestMergedFields:
+    def test_journal_source_preserved_in_merge(self, memory_service):
         existing = {
             "id": "existing-1",
             "user_id": "user-1",
@@ -179,14 +361,114 @@ class TestMergeWithExisting:
             "ttl_days": 100,
             "decay_score": 0.5,
         }
-        mock_supabase.table.return_value.update.return_value.eq.return_value.execute.return_value = None
-        merged = memory_service._merge_with_existing(
-            existing=existing,
+        merged = memory_service._merged_fields(
+            existing,
             adjusted_importance=0.6,
             category="preference",
             memory_type="preference",
             ttl_days=150,
-            decay_score=0.6,
             source="journal",
         )
         assert merged["source"] == "journal"
+        assert merged["importance_score"] == 0.6
+        assert merged["ttl_days"] == 150
+
+    def test_goal_type_wins_over_existing_type(self, memory_service):
+        merged = memory_service._merged_fields(
+            {"importance_score": 0.9, "memory_type": "fact", "source": "chat", "ttl_days": 300},
+            adjusted_importance=0.4,
+            category="goal",
+            memory_type="goal",
+            ttl_days=90,
+            source="chat",
+        )
+        assert merged["memory_type"] == "goal"
+        assert merged["importance_score"] == 0.9
+        assert merged["ttl_days"] == 300
+
+    def test_merge_into_stored_memory_is_one_upsert(self, memory_service, mock_supabase):
+        now = datetime.now().isoformat()
+        existing = {"id": "existing-1", "user_id": "user-1", "content": "User likes green tea", "importance_score": 0.5,
+                    "category": "preference", "created_at": now, "last_accessed": now, "access_count": 2,
+                    "ttl_days": 100, "is_pinned": False, "memory_type": "preference", "source": "chat"}
+        mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [existing]
+        memory_service.access = MagicMock()
+
+        stored = memory_service.store_extracted_memories(
+            "user-1", [{"content": "User likes green tea", "importance_score": 0.9}], source="journal"
+        )
+
+        assert [m.id for m in stored] == ["existing-1"]
+        assert stored[0].source == "journal"
+        mock_supabase.table.return_value.update.assert_not_called()
+        mock_supabase.table.return_value.insert.assert_not_called()
+        upserted = mock_supabase.table.return_value.upsert.call_args[0][0]
+        assert upserted[0]["source"] == "journal"
+
+
+class TestWorkingSetCache:
+    def test_one_read_serves_retrieval_dedupe_listing_and_pruning(self, memory_service, mock_supabase):
+        now = datetime.now().isoformat()
+        rows = [{"id": "m1", "user_id": "u", "content": "User loves hiking", "importance_score": 0.6,
+                 "category": "preference", "created_at": now, "last_accessed": now, "access_count": 0,
+                 "ttl_days": 180, "is_pinned": False, "memory_type": "preference", "source": "chat"}]
+        table = mock_supabase.table.return_value
+        table.select.return_value.eq.return_value.execute.return_value.data = rows
+        table.insert.side_effect = lambda batch: MagicMock(execute=MagicMock(
+            return_value=MagicMock(data=[{**row, "id": "m2"} for row in batch])
+        ))
+        memory_service.access = MagicMock()
+        memory_service.max_memories_per_user = 1
+
+        assert [m.id for m in memory_service.get_relevant_memories("u", "hiking")] == ["m1"]
+        memory_service.store_extracted_memories("u", [{"content": "User has a cat named Miso"}])
+        assert {m.id for m in memory_service.get_all_memories("u")} == {"m1"}
+
+        table.select.assert_called_once_with("*")
+        table.delete.return_value.in_.assert_called_once()
+        assert memory_service.indexes.stats()["misses"] == 1
+
+
+class TestAsyncFacade:
+    def test_get_relevant_memories_async_uses_repository(self, memory_service, mock_supabase):
+        now = datetime.now().isoformat()
+        rows = [
+            {"id": "m1", "user_id": "u", "content": "User loves hiking", "importance_score": 0.6,
+             "category": "preference", "created_at": now, "last_accessed": now, "access_count": 0,
+             "decay_score": 0.6, "ttl_days": 180, "is_pinned": False, "memory_type": "preference",
+             "source": "chat"},
+            {"id": "m2", "user_id": "u", "content": "Works as a nurse", "importance_score": 0.9,
+             "category": "fact", "created_at": now, "last_accessed": now, "access_count": 0,
+             "decay_score": 0.9, "ttl_days": 180, "is_pinned": False, "memory_type": "fact",
+             "source": "chat"},
+        ]
+        repo = MagicMock()
+        repo.list_for_user = AsyncMock(return_value=rows)
+        repo.update = AsyncMock()
+        memory_service.repository = repo
+        memory_service.access = MagicMock()
+
+        result = asyncio.run(memory_service.get_relevant_memories_async("u", "hiking trip", limit=5))
+
+        assert [m.id for m in result] == ["m1"]
+        memory_service.access.record.assert_called_once_with(["m1"])
+        repo.update.assert_not_called()
+        mock_supabase.table.assert_not_called()
+        assert memory_service.indexes.get("u").rows["m1"]["access_count"] == 1
+
+    def test_async_index_is_built_off_the_event_loop(self, memory_service):
+        repo = MagicMock()
+        repo.list_for_user = AsyncMock(return_value=[])
+        memory_service.repository = repo
+        build = memory_service.indexes.build
+        threads = []
+
+        def record_thread(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return build(*args, **kwargs)
+
+        memory_service.indexes.build = record_thread
+
+        asyncio.run(memory_service._load_index_async("u"))
+
+        assert threads and threads[0] != threading.get_ident()
@@ -0,0 +1,81 @@
+"""Tests for app.utils.metrics."""
+import asyncio
+
+import pytest
+
+from app.utils.metrics import BatchStats, LatencyTracker, StageStats, StageTimeout, StageTimings
+
+
+async def _sleep_then(value, delay):
+    await asyncio.sleep(delay)
+    return value
+
+
+class TestLatencyTracker:
+    def test_snapshot_percentiles(self):
+        tracker = LatencyTracker()
+        for value in range(1, 101):
+            tracker.observe(float(value))
+        snap = tracker.snapshot()
+        assert snap["count"] == 100
+        assert snap["p50_ms"] == 51.0
+        assert snap["max_ms"] == 100.0
+
+
+class TestStageTimings:
+    def test_stages_run_concurrently(self):
+        timings = StageTimings()
+
+        async def scenario():
+            return await asyncio.gather(
+                timings.run("a", _sleep_then(1, 0.05), timeout_s=1),
+                timings.run("b", _sleep_then(2, 0.05), timeout_s=1),
+            )
+
+        loop = asyncio.new_event_loop()
+        try:
+            started = loop.time()
+            result = loop.run_until_complete(scenario())
+            elapsed = loop.time() - started
+        finally:
+            loop.close()
+        assert result == [1, 2]
+        assert elapsed < 0.09
+        assert set(timings.durations) == {"a", "b"}
+
+    def test_optional_stage_timeout_returns_default_and_records_skip(self):
+        stats = StageStats()
+        timings = StageTimings(stats)
+        result = asyncio.run(
+            timings.run("memories", _sleep_then([1], 1), timeout_s=0.01, required=False, default=[])
+        )
+        assert result == []
+        assert timings.skipped == {"memories": "timeout"}
+        assert stats.snapshot()["memories"]["skipped"] == 1
+        assert 'memories;dur=' in timings.server_timing()
+        assert 'desc="skipped: timeout"' in timings.server_timing()
+
+    def test_required_stage_timeout_raises(self):
+        timings = StageTimings()
+        with pytest.raises(StageTimeout, match="history"):
+            asyncio.run(timings.run("history", _sleep_then(None, 1), timeout_s=0.01))
+        assert "history" in timings.durations
+
+    def test_optional_stage_error_is_recorded(self):
+        async def broken():
+            raise ConnectionError("db down")
+
+        timings = StageTimings()
+        assert asyncio.run(timings.run("memories", broken(), 1, required=False, default=[])) == []
+        assert timings.skipped == {"memories": "ConnectionError"}
+
+
+def test_batch_stats_counts_round_trips_saved():
+    stats = BatchStats()
+    stats.observe(items=5, round_trips=2)
+    stats.observe(items=1, round_trips=1)
+    snapshot = stats.snapshot()
+    assert snapshot["batches"] == 2
+    assert snapshot["avg_batch_size"] == 3.0
+    assert snapshot["max_batch_size"] == 5
+    assert snapshot["round_trips_saved"] == 3
@@ -0,0 +1,58 @@
+"""Tests for app.utils.minhash and near-duplicate lookup in the memory index."""
+from app.services.memory_index import UserMemoryIndex
+from app.utils.minhash import LSHIndex, MinHasher, jaccard
+from app.utils.text_analyzer import analyze_for_dedupe
+
+
+class TestMinHasher:
+    def test_signature_agreement_estimates_jaccard(self):
+        hasher = MinHasher(num_perm=256)
+        a = {f"t{i}" for i in range(40)}
+        b = {f"t{i}" for i in range(10, 50)}
+        agreement = (hasher.signature(a) == hasher.signature(b)).mean()
+        assert abs(agreement - jaccard(a, b)) < 0.1
+
+
+class TestLSHIndex:
+    def test_finds_near_duplicate_above_threshold(self):
+        index = LSHIndex()
+        index.add("m1", ["user", "loves", "hiking"])
+        index.add("m2", ["user", "likes", "tea"])
+        assert index.best_match(["user", "loves", "hiking", "mountains"], 0.6) == ("m1", 0.75)
+
+    def test_shared_words_alone_do_not_merge(self):
+        index = LSHIndex()
+        index.add("m1", ["user", "likes", "tea"])
+        assert index.best_match(["user", "likes", "coffee"], 0.6) is None
+
+    def test_remove(self):
+        index = LSHIndex()
+        index.add("m1", ["user", "loves", "hiking"])
+        index.remove("m1")
+        assert len(index) == 0
+        assert index.candidates(["user", "loves", "hiking"]) == set()
+
+
+class TestFindDuplicate:
+    def test_memory_index_tracks_updates(self):
+        index = UserMemoryIndex("u", [{"id": "m1", "content": "User loves hiking"}])
+        assert index.find_duplicate("User loves hiking in the mountains")["id"] == "m1"
+        index.upsert({"id": "m1", "content": "Works as a nurse"})
+        assert index.find_duplicate("User loves hiking") is None
+        assert index.find_duplicate("the a") is None
+
+    def test_negated_statement_is_not_a_duplicate(self):
+        index = UserMemoryIndex("u", [
+            {"id": "m1", "content": "User is allergic to peanuts"},
+            {"id": "m2", "content": "Tôi ăn thịt bò"},
+        ])
+        assert index.find_duplicate("User is not allergic to peanuts") is None
+        assert index.find_duplicate("User isn't allergic to peanuts") is None
+        assert index.find_duplicate("Tôi không ăn thịt bò") is None
+        assert index.find_duplicate("User is allergic to peanuts!")["id"] == "m1"
+
+
+def test_dedupe_tokens_scope_negation_to_the_clause():
+    assert analyze_for_dedupe("User doesn't drink coffee, but loves tea") == [
+        "user", "not_drink", "not_coffee", "loves", "tea"
+    ]
@@ -0,0 +1,79 @@
+"""Tests for app.utils.pagination."""
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.utils.pagination import (
+    NEXT_CURSOR_HEADER,
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+    keyset_page,
+    keyset_query,
+    paged_response,
+)
+
+
+def test_cursor_round_trip():
+    token = encode_cursor(0.0607927, "2026-01-02T03:04:05+00:00", "j1")
+
+    assert "=" not in token
+    assert decode_cursor(token, 3) == [0.0607927, "2026-01-02T03:04:05+00:00", "j1"]
+
+
+def test_datetimes_are_encoded_as_iso():
+    token = encode_cursor(datetime(2026, 1, 2, tzinfo=timezone.utc), "j1")
+
+    assert decode_cursor(token, 2) == ["2026-01-02T00:00:00+00:00", "j1"]
+
+
+@pytest.mark.parametrize("token", ["not base64!", encode_cursor("a", "b"), "e30"])
+def test_invalid_cursors(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, 3)
+
+
+def test_keyset_page_cursor_points_at_last_row():
+    rows = [{"id": str(i)} for i in range(4)]
+
+    page, cursor = keyset_page(rows, 3, lambda row: (row["id"],))
+    assert [row["id"] for row in page] == ["0", "1", "2"]
+    assert decode_cursor(cursor, 1) == ["2"]
+
+
+def test_keyset_page_last_page_has_no_cursor():
+    rows = [{"id": "0"}, {"id": "1"}]
+
+    assert keyset_page(rows, 2, lambda row: (row["id"],)) == (rows, None)
+    assert keyset_page([], 2, lambda row: (row["id"],)) == ([], None)
+
+
+def test_keyset_filter_descending_and_ascending():
+    assert keyset_filter(("created_at", "id"), ["t", "j1"]) == \
+        'created_at.lt."t",and(created_at.eq."t",id.lt."j1")'
+    assert keyset_filter(("timestamp", "id"), ["t", 'a"b'], descending=False) == \
+        'timestamp.gt."t",and(timestamp.eq."t",id.gt."a\\"b")'
+
+
+def test_keyset_query_uses_offset_or_keyset():
+    query = MagicMock()
+    query.order.return_value = query
+
+    keyset_query(query, ("created_at", "id"), 10, offset=20)
+    query.range.assert_called_once_with(20, 30)
+    query.or_.assert_not_called()
+
+    keyset_query(query, ("created_at", "id"), 10, after=["t", "j1"])
+    query.or_.assert_called_once()
+    query.or_.return_value.limit.assert_called_once_with(11)
+
+
+def test_paged_response_envelope_only_when_cursor_given():
+    response = MagicMock(headers={})
+
+    assert paged_response(response, [1, 2], "next", "") == {"items": [1, 2], "next_cursor": "next"}
+    assert response.headers == {}
+    assert paged_response(response, [1, 2], "next", None) == [1, 2]
+    assert response.headers == {NEXT_CURSOR_HEADER: "next"}
@@ -0,0 +1,89 @@
+"""Tests for the combined post-turn analysis (app.services.post_turn, GeminiService.analyze_turn)."""
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import post_turn
+from app.services.gemini_service import GeminiService, TURN_ANALYSIS_SCHEMA
+
+
+def _payload():
+    return {
+        "user_id": "user-1",
+        "conversation_id": "conv-1",
+        "user_message": "I just moved to Da Nang",
+        "ai_response": "How are you settling in?",
+        "context": "user: hi"
+    }
+
+
+class TestAnalyzeTurnJob:
+    def test_one_gemini_call_feeds_memories_and_journal(self):
+        analysis = {
+            "memories": [{"content": "User lives in Da Nang", "importance_score": 0.8}],
+            "reflection": "Asked a follow-up question",
+            "learnings": ["User moved recently"],
+            "questions_raised": ["How are you settling in?"]
+        }
+        gemini, memory, journal = MagicMock(), MagicMock(), MagicMock()
+        gemini.analyze_turn.return_value = analysis
+        with patch.object(post_turn, "get_gemini_service", return_value=gemini), \
+             patch.object(post_turn, "get_memory_service", return_value=memory), \
+             patch.object(post_turn, "get_journal_service", return_value=journal):
+            post_turn.analyze_turn(_payload())
+
+        gemini.analyze_turn.assert_called_once()
+        gemini.extract_memories.assert_not_called()
+        gemini.generate_ai_journal.assert_not_called()
+        memory.store_extracted_memories.assert_called_once_with(
+            "user-1", analysis["memories"], source="chat"
+        )
+        journal.create_ai_journal_from_analysis.assert_called_once_with("user-1", "conv-1", analysis)
+
+    def test_retry_reuses_analysis_and_stored_memories(self):
+        analysis = {"memories": [{"content": "User lives in Da Nang"}], "reflection": "ok"}
+        gemini, memory, journal = MagicMock(), MagicMock(), MagicMock()
+        gemini.analyze_turn.return_value = analysis
+        journal.create_ai_journal_from_analysis.side_effect = [RuntimeError("insert failed"), None]
+        payload = _payload()
+        with patch.object(post_turn, "get_gemini_service", return_value=gemini), \
+             patch.object(post_turn, "get_memory_service", return_value=memory), \
+             patch.object(post_turn, "get_journal_service", return_value=journal):
+            with pytest.raises(RuntimeError):
+                post_turn.analyze_turn(payload)
+            post_turn.analyze_turn(payload)
+
+        gemini.analyze_turn.assert_called_once()
+        memory.store_extracted_memories.assert_called_once()
+        assert journal.create_ai_journal_from_analysis.call_count == 2
+        assert payload["analysis"] == analysis
+
+    def test_legacy_job_kinds_stay_registered(self):
+        queue = MagicMock()
+        post_turn.register_post_turn_handlers(queue)
+        kinds = {c.args[0] for c in queue.register.call_args_list}
+        assert kinds == {post_turn.ANALYZE_TURN_JOB, post_turn.EXTRACT_MEMORIES_JOB, post_turn.AI_JOURNAL_JOB}
+
+
+class TestGeminiAnalyzeTurn:
+    def test_uses_json_schema_and_normalizes(self):
+        service = GeminiService.__new__(GeminiService)
+        body = {"memories": [{"content": "x"}], "reflection": "ok", "learnings": "not a list"}
+        service._generate_content_with_retry = MagicMock(
+            return_value=SimpleNamespace(text=json.dumps(body))
+        )
+
+        result = service.analyze_turn("context", "hi", "hello")
+
+        _, kwargs = service._generate_content_with_retry.call_args
+        config = kwargs["generation_config"]
+        assert config.response_mime_type == "application/json"
+        assert config.response_schema is TURN_ANALYSIS_SCHEMA
+        assert result == {
+            "memories": [{"content": "x"}],
+            "reflection": "ok",
+            "learnings": [],
+            "questions_raised": []
+        }
@@ -0,0 +1,90 @@
+"""Tests for app.models.records."""
+from datetime import datetime, timezone
+from typing import List
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.models.journal import AIJournalRecord, UserJournal, UserJournalRecord
+from app.models.memory import Memory, MemoryRecord, MemoryRetrieval
+from app.utils.memory_filter import decay_feature_matrix
+
+
+def _memory_row(**overrides):
+    row = {
+        "id": "m1",
+        "user_id": "u1",
+        "content": "likes hiking",
+        "importance_score": 0.7,
+        "category": "preference",
+        "created_at": "2026-01-02T03:04:05Z",
+        "last_accessed": None,
+    }
+    row.update(overrides)
+    return row
+
+
+def test_datetime_fields_are_parsed_lazily_and_cached():
+    row = _memory_row()
+    record = MemoryRecord(row)
+
+    assert row["created_at"] == "2026-01-02T03:04:05Z"
+    assert record.created_at == datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    assert row["created_at"] is record.created_at
+    assert record.last_accessed is None
+
+
+def test_missing_fields_read_as_model_defaults():
+    record = MemoryRecord(_memory_row())
+
+    assert record.access_count == 0
+    assert record.stability is None
+    with pytest.raises(AttributeError):
+        record.not_a_field
+
+
+def test_only_known_fields_can_be_set():
+    record = MemoryRecord(_memory_row())
+    record.decay_score = 0.5
+
+    assert record.decay_score == 0.5
+    with pytest.raises(AttributeError):
+        record.unknown = 1
+
+
+def test_records_validate_at_the_api_boundary():
+    record = MemoryRecord(_memory_row())
+
+    validated = TypeAdapter(List[Memory]).validate_python([record], from_attributes=True)
+    assert validated[0] == Memory(**_memory_row())
+    assert record.to_model() == validated[0]
+    assert MemoryRetrieval(memories=[record], count=1).memories[0].content == "likes hiking"
+
+
+def test_jsonable_encoder_and_dict_see_all_fields():
+    record = UserJournalRecord({"id": "j1", "user_id": "u1", "content": "day one", "created_at": "2026-01-02T03:04:05+00:00"})
+
+    assert dict(record) == UserJournal(**dict(record)).model_dump()
+    assert jsonable_encoder(record) == {
+        "id": "j1",
+        "user_id": "u1",
+        "content": "day one",
+        "created_at": "2026-01-02T03:04:05+00:00",
+        "tags": None,
+        "extraction_status": None,
+        "paragraph_hashes": None,
+    }
+
+
+def test_required_fields_still_fail_validation():
+    record = AIJournalRecord({"id": "a1", "user_id": "u1", "reflection": "r"})
+
+    with pytest.raises(Exception):
+        record.to_model()
+
+
+def test_decay_features_read_records_without_model_dump():
+    row = _memory_row(last_accessed="2026-01-05T00:00:00+00:00")
+
+    assert (decay_feature_matrix([MemoryRecord(row)]) == decay_feature_matrix([dict(row)])).all()
@@ -0,0 +1,76 @@
+"""Tests for app.utils.sse."""
+import asyncio
+import json
+import threading
+
+import pytest
+
+from app.utils.sse import format_sse, iterate_in_thread
+
+
+class FakeStream:
+    def __init__(self, items, block_after=None):
+        self.items = items
+        self.block_after = block_after
+        self.cancelled = threading.Event()
+        self.thread_ids = set()
+
+    def __iter__(self):
+        for i, item in enumerate(self.items):
+            self.thread_ids.add(threading.get_ident())
+            if self.block_after is not None and i >= self.block_after:
+                # Simulates a blocking upstream read that only cancel() can end
+                self.cancelled.wait(timeout=5)
+                return
+            yield item
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class TestFormatSse:
+    def test_event_and_json_data(self):
+        frame = format_sse({"text": "xin chào"}, event="token")
+        assert frame.startswith("event: token\n")
+        assert frame.endswith("\n\n")
+        assert json.loads(frame.split("data: ", 1)[1]) == {"text": "xin chào"}
+
+    def test_without_event(self):
+        assert format_sse({"a": 1}) == 'data: {"a": 1}\n\n'
+
+
+class TestIterateInThread:
+    def test_yields_all_items_off_loop_thread(self):
+        stream = FakeStream(["a", "b", "c"])
+
+        async def scenario():
+            loop_thread = threading.get_ident()
+            items = [item async for item in iterate_in_thread(lambda: stream)]
+            return items, loop_thread
+
+        items, loop_thread = asyncio.run(scenario())
+        assert items == ["a", "b", "c"]
+        assert loop_thread not in stream.thread_ids
+        assert not stream.cancelled.is_set()
+
+    def test_early_close_cancels_source(self):
+        stream = FakeStream(["a", "b", "c"], block_after=1)
+
+        async def scenario():
+            agen = iterate_in_thread(lambda: stream)
+            first = await agen.__anext__()
+            await agen.aclose()
+            return first
+
+        assert asyncio.run(scenario()) == "a"
+        assert stream.cancelled.wait(timeout=1)
+
+    def test_source_error_propagates(self):
+        def broken():
+            raise RuntimeError("upstream failed")
+
+        async def scenario():
+            return [item async for item in iterate_in_thread(broken)]
+
+        with pytest.raises(RuntimeError, match="upstream failed"):
+            asyncio.run(scenario())
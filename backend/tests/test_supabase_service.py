@@ -0,0 +1,73 @@
+"""Tests for ensure_user_exists in app.services.supabase_service."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services import supabase_service
+from app.services.supabase_service import ensure_user_exists, ensure_user_exists_async
+
+
+@pytest.fixture(autouse=True)
+def clear_known_users():
+    supabase_service._known_users.clear()
+    yield
+    supabase_service._known_users.clear()
+
+
+class TestEnsureUserExists:
+    def test_upserts_once_then_uses_cache(self):
+        client = MagicMock()
+        with patch.object(supabase_service, "get_supabase_client", return_value=client):
+            assert ensure_user_exists("user-1")
+            assert ensure_user_exists("user-1")
+
+        table = client.table.return_value
+        assert table.upsert.call_count == 1
+        _, kwargs = table.upsert.call_args
+        assert kwargs == {"on_conflict": "id", "ignore_duplicates": True}
+        table.select.assert_not_called()
+
+    def test_username_conflict_retries_with_suffix(self):
+        client = MagicMock()
+        upsert = client.table.return_value.upsert
+        upsert.return_value.execute.side_effect = [
+            Exception('duplicate key value violates unique constraint "users_username_key"'),
+            MagicMock(data=[]),
+        ]
+        with patch.object(supabase_service, "get_supabase_client", return_value=client):
+            assert ensure_user_exists("user-2")
+
+        first, second = [c.args[0]["username"] for c in upsert.call_args_list]
+        assert first == "user_user2"
+        assert second.startswith("user_user2_") and second != first
+
+    def test_error_returns_false_and_is_not_cached(self):
+        client = MagicMock()
+        client.table.return_value.upsert.return_value.execute.side_effect = Exception("connection refused")
+        with patch.object(supabase_service, "get_supabase_client", return_value=client):
+            assert ensure_user_exists("user-3") is False
+        assert not supabase_service._is_known_user("user-3")
+
+
+class TestEnsureUserExistsAsync:
+    def test_concurrent_first_requests_share_one_upsert(self):
+        calls = []
+
+        async def slow_upsert(user_data):
+            calls.append(user_data["id"])
+            await asyncio.sleep(0.01)
+
+        repository = MagicMock()
+        repository.upsert = AsyncMock(side_effect=slow_upsert)
+
+        async def scenario():
+            return await asyncio.gather(*[ensure_user_exists_async("user-4") for _ in range(5)])
+
+        with patch("app.repositories.user_repository.UserRepository", return_value=repository):
+            assert asyncio.run(scenario()) == [True] * 5
+            # Returning user: served from the cache
+            assert asyncio.run(ensure_user_exists_async("user-4"))
+
+        assert calls == ["user-4"]
+        assert supabase_service._creation_tasks == {}
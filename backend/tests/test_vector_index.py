@@ -0,0 +1,116 @@
+"""Tests for app.utils.vector_index and app.services.memory_index."""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.services.memory_index import MemoryIndexRegistry, UserMemoryIndex
+from app.utils.vector_index import HashingEmbedder, VectorIndex
+
+
+def _row(memory_id, content, importance=0.5, **fields):
+    return {"id": memory_id, "user_id": "u", "content": content, "importance_score": importance, **fields}
+
+
+def _days_ago(days):
+    return (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+
+class TestHashingEmbedder:
+    def test_unit_norm_and_deterministic(self):
+        embedder = HashingEmbedder(dim=256)
+        a = embedder.embed("User loves hiking")
+        assert np.isclose(np.linalg.norm(a), 1.0)
+        assert np.array_equal(a, embedder.embed("User loves hiking"))
+
+    def test_related_text_scores_higher(self):
+        embedder = HashingEmbedder()
+        query = embedder.embed("going hiking this weekend")
+        assert query @ embedder.embed("User loves hiking") > query @ embedder.embed("Works as a nurse")
+
+    def test_empty_text_is_zero_vector(self):
+        assert not HashingEmbedder(dim=64).embed("").any()
+
+
+class TestVectorIndex:
+    def test_grows_and_removes_keep_rows_contiguous(self):
+        index = VectorIndex(dim=4, capacity=2)
+        for i in range(5):
+            vector = np.zeros(4, dtype=np.float32)
+            vector[i % 4] = 1.0
+            index.upsert(f"v{i}", vector)
+        index.remove("v0")
+        assert len(index) == 4 and "v0" not in index
+        query = np.array([1, 0, 0, 0], dtype=np.float32)
+        assert [hit[0] for hit in index.search(query, k=2, min_similarity=0.5)] == ["v4"]
+
+    def test_boost_blends_into_ranking(self):
+        index = VectorIndex(dim=2)
+        index.upsert("close", np.array([1.0, 0.0], dtype=np.float32), boost=0.0)
+        index.upsert("boosted", np.array([0.8, 0.6], dtype=np.float32), boost=1.0)
+        query = np.array([1.0, 0.0], dtype=np.float32)
+        assert index.search(query, k=1)[0][0] == "close"
+        assert index.search(query, k=1, relevance_weight=0.5)[0][0] == "boosted"
+
+
+class TestUserMemoryIndex:
+    def test_incremental_updates(self):
+        index = UserMemoryIndex("u", [_row("m1", "User loves hiking"), _row("m2", "Works as a nurse")])
+        assert [row["id"] for row, _ in index.search("hiking trip", 5)] == ["m1"]
+
+        index.upsert(_row("m3", "User goes hiking with their sister", importance=0.9))
+        index.upsert({"id": "m1", "last_accessed": _days_ago(400)})
+        assert [row["id"] for row, _ in index.search("hiking", 5)] == ["m3", "m1"]
+        assert index.rows["m1"]["content"] == "User loves hiking"
+
+        index.remove(["m3"])
+        assert [row["id"] for row, _ in index.search("hiking", 5)] == ["m1"]
+
+    def test_decay_and_expiry_computed_at_query_time(self):
+        index = UserMemoryIndex("u", [
+            _row("fresh", "User loves hiking", importance=0.6, last_accessed=_days_ago(0), decay_score=0.01),
+            _row("stale", "User went hiking once", importance=0.6, last_accessed=_days_ago(60), decay_score=0.6),
+            _row("expired", "User hiking club", importance=0.6, created_at=_days_ago(40), ttl_days=30),
+        ])
+        results = {row["id"]: row for row, _ in index.search("hiking", 5)}
+        assert set(results) == {"fresh", "stale"}
+        assert results["fresh"]["decay_score"] == 0.6
+        assert results["stale"]["decay_score"] < 0.6
+
+    def test_registry_ttl_and_lru(self):
+        registry = MemoryIndexRegistry(max_users=1, ttl_s=60)
+        registry.build("a", [_row("m1", "tea")])
+        registry.build("b", [_row("m2", "coffee")])
+        assert registry.get("a") is None
+        assert registry.get("b") is not None
+        registry.upsert("a", _row("m3", "ignored until loaded"))
+        assert registry.get("a") is None
+        registry.ttl_s = -1
+        assert registry.get("b") is None
+        stats = registry.stats()
+        assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (1, 3, 1, 1)
+
+    def test_registry_evicts_lru_past_byte_budget(self):
+        one_user = MemoryIndexRegistry().build("x", [_row("m0", "tea")]).nbytes()
+        registry = MemoryIndexRegistry(ttl_s=60, max_bytes=2 * one_user)
+        for user in "abc":
+            registry.build(user, [_row(f"{user}1", "tea")])
+        assert registry.get("a") is None
+        assert registry.get("b") is not None and registry.get("c") is not None
+
+        registry.upsert("c", _row("c2", "coffee"))
+        assert registry.get("b") is None
+        assert registry.stats()["bytes"] <= registry.max_bytes
+
+    def test_registry_skips_caching_a_build_raced_by_a_write(self):
+        registry = MemoryIndexRegistry()
+        version = registry.version("a")
+        registry.upsert("a", _row("m1", "written while the fetch was in flight"))
+        index = registry.build("a", [], version=version)
+        assert len(index) == 0
+        assert registry.get("a") is None
+        assert registry.stats()["stale_builds"] == 1
+
+        registry.build("a", [_row("m1", "tea")], version=registry.version("a"))
+        registry.invalidate("a")
+        assert registry.get("a") is None
+        assert registry.stats()["invalidations"] == 1
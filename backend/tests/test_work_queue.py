@@ -0,0 +1,137 @@
+"""Tests for app.services.work_queue."""
+import asyncio
+import json
+import os
+
+import pytest
+
+from app.services.work_queue import Job, WorkQueue
+
+
+@pytest.fixture
+def spool_dir(tmp_path):
+    return str(tmp_path / "spool")
+
+
+def _make_queue(spool_dir, **kwargs):
+    kwargs.setdefault("num_workers", 2)
+    kwargs.setdefault("max_attempts", 3)
+    kwargs.setdefault("base_backoff_s", 0.001)
+    return WorkQueue(spool_dir=spool_dir, **kwargs)
+
+
+class TestWorkQueue:
+    def test_runs_jobs_in_order_per_user(self, spool_dir):
+        seen = []
+
+        async def handler(payload):
+            await asyncio.sleep(0.001 * (5 - payload["n"]))
+            seen.append((payload["user"], payload["n"]))
+
+        async def scenario():
+            queue = _make_queue(spool_dir)
+            queue.register("test", handler)
+            for n in range(5):
+                await queue.enqueue("test", "user-a", {"user": "user-a", "n": n})
+                await queue.enqueue("test", "user-b", {"user": "user-b", "n": n})
+            await queue.stop()
+            return queue.stats()
+
+        stats = asyncio.run(scenario())
+        assert [n for user, n in seen if user == "user-a"] == list(range(5))
+        assert [n for user, n in seen if user == "user-b"] == list(range(5))
+        assert stats["completed"] == 10
+        assert stats["depth"] == 0
+        assert stats["latency"]["count"] == 10
+        assert os.listdir(spool_dir) == []
+
+    def test_sync_handler_runs_off_loop(self, spool_dir):
+        calls = []
+
+        def handler(payload):
+            calls.append(payload["x"])
+
+        async def scenario():
+            queue = _make_queue(spool_dir)
+            queue.register("sync", handler)
+            await queue.enqueue("sync", "u", {"x": 1})
+            await queue.stop()
+
+        asyncio.run(scenario())
+        assert calls == [1]
+
+    def test_retries_then_succeeds(self, spool_dir):
+        attempts = []
+
+        def flaky(payload):
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise RuntimeError("transient")
+
+        async def scenario():
+            queue = _make_queue(spool_dir)
+            queue.register("flaky", flaky)
+            await queue.enqueue("flaky", "u", {})
+            await queue.stop()
+            return queue.stats()
+
+        stats = asyncio.run(scenario())
+        assert len(attempts) == 3
+        assert stats["retried"] == 2
+        assert stats["completed"] == 1
+
+    def test_exhausted_job_moved_to_failed(self, spool_dir):
+        def always_fails(payload):
+            raise RuntimeError("boom")
+
+        async def scenario():
+            queue = _make_queue(spool_dir, max_attempts=2)
+            queue.register("bad", always_fails)
+            await queue.enqueue("bad", "u", {})
+            await queue.stop()
+            return queue.stats()
+
+        stats = asyncio.run(scenario())
+        assert stats["failed"] == 1
+        assert len(os.listdir(os.path.join(spool_dir, "failed"))) == 1
+
+    def test_spooled_jobs_recovered_on_start(self, spool_dir):
+        seen = []
+        writer = _make_queue(spool_dir)
+        writer._spool_write(Job(id="job-1", kind="test", user_id="u", payload={"n": 1}, enqueued_at=1.0))
+        writer._spool_write(Job(id="job-2", kind="test", user_id="u", payload={"n": 2}, enqueued_at=2.0))
+
+        async def scenario():
+            queue = _make_queue(spool_dir)
+            queue.register("test", lambda payload: seen.append(payload["n"]))
+            await queue.start()
+            await queue.stop()
+            return queue.stats()
+
+        stats = asyncio.run(scenario())
+        assert seen == [1, 2]
+        assert stats["recovered"] == 2
+        assert os.listdir(spool_dir) == []
+
+    def test_only_unowned_spool_files_are_replayed(self, spool_dir):
+        os.makedirs(spool_dir)
+        files = {
+            "00000000000001000000-legacy.json": 1,
+            "00000000000002000000-dead.99999999.json": 2,
+            f"00000000000003000000-live.{os.getppid()}.json": 3,
+        }
+        for name, n in files.items():
+            job_id = name.split("-", 1)[1].split(".")[0]
+            with open(os.path.join(spool_dir, name), "w", encoding="utf-8") as f:
+                json.dump({"id": job_id, "kind": "test", "user_id": "u", "payload": {"n": n}, "enqueued_at": n}, f)
+        seen = []
+
+        async def scenario():
+            queue = _make_queue(spool_dir)
+            queue.register("test", lambda payload: seen.append(payload["n"]))
+            await queue.start()
+            await queue.stop()
+
+        asyncio.run(scenario())
+        assert seen == [1, 2]
+        assert os.listdir(spool_dir) == [f"00000000000003000000-live.{os.getppid()}.json"]
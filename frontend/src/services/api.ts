@@ -69,6 +69,19 @@ export interface UserJournal {
   tags?: string[]
 }
 
+export interface JournalSearchHit {
+  id: string
+  created_at: string
+  tags?: string[]
+  rank: number
+  headline: string  // excerpt with matches wrapped in <mark></mark>
+}
+
+export interface JournalSearchPage {
+  items: JournalSearchHit[]
+  next_cursor: string | null
+}
+
 export interface AIJournal {
   id: string
   user_id: string
@@ -175,9 +188,9 @@ export const journalAPI = {
     return response.data
   },
   
-  searchUserJournals: async (userId: string, query: string): Promise<UserJournal[]> => {
-    const response = await api.get<UserJournal[]>(`/api/journal/user/${userId}/search`, {
-      params: { q: query },
+  searchUserJournals: async (userId: string, query: string, cursor?: string): Promise<JournalSearchPage> => {
+    const response = await api.get<JournalSearchPage>(`/api/journal/user/${userId}/search`, {
+      params: { q: query, cursor },
     })
     return response.data
   },